@@ -0,0 +1,32 @@
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+BASELINES_DIR = os.path.join(BENCH_DIR, 'baselines')
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, 'bench.db')
+
+# Volumes de referência: (casos, documentos por caso)
+PROFILES = {
+    'small': (1000, 10),
+    'medium': (10000, 10),
+    'large': (100000, 10)
+}
+
+def configure_environment(db_path, **overrides):
+    """Apontar o app para o banco de benchmark (antes de importar src.main)"""
+    work_dir = os.path.splitext(db_path)[0] + '_work'
+    os.makedirs(work_dir, exist_ok=True)
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{os.path.abspath(db_path)}',
+        'VECTOR_INDEX_DIR': os.path.join(work_dir, 'vectors'),
+        'JOB_QUEUE_PATH': os.path.join(work_dir, 'jobs.db'),
+        'LLM_CACHE_PATH': os.path.join(work_dir, 'llm_cache.db'),
+        'JOB_WORKERS': '0',
+        # Indexar milhões de documentos no vetor levaria horas e competiria com a medição
+        'VECTOR_INDEX_BACKFILL': '0',
+        **{key: str(value) for key, value in overrides.items()}
+    })
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
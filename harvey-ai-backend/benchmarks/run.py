@@ -0,0 +1,212 @@
+"""Carga sobre a API Flask com o servidor simulado da OpenAI e comparação com baselines.
+
+Uso: python benchmarks/run.py --requests 300 --concurrency 8 --llm-latency-ms 300
+     python benchmarks/run.py --save-baseline v3.0      (grava benchmarks/baselines/v3.0.json)
+     python benchmarks/run.py --compare v3.0            (sai com código 1 se houver regressão)
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from common import BASELINES_DIR, DEFAULT_DB_PATH, configure_environment
+
+SEARCH_TERMS = ['pavimentação', 'medicamentos', 'vigilância', 'merenda', 'informática', 'Curitiba', 'saúde', 'limpeza']
+
+EDITAL_SAMPLE = '\n\n'.join(
+    f'CLÁUSULA {n} - DA HABILITAÇÃO\nA licitante deverá apresentar {n + 2} atestados de capacidade técnica '
+    'com quantitativos mínimos de 80% do objeto, além de balanço patrimonial dos três últimos exercícios.'
+    for n in range(1, 25)
+)
+
+def build_scenarios(ids):
+    """Cenários: nome -> função (rng) que devolve (método, caminho, corpo JSON)"""
+    case_id = lambda rng: rng.randint(ids['min_case'], ids['max_case'])
+    return {
+        'cases.list': lambda rng: ('GET', f'/api/cases?page={rng.randint(1, 50)}&per_page=20', None),
+        'cases.cursor': lambda rng: ('GET', '/api/cases?pagination=cursor&per_page=50', None),
+        'cases.get': lambda rng: ('GET', f'/api/cases/{case_id(rng)}', None),
+        'cases.stats': lambda rng: ('GET', '/api/cases/stats', None),
+        'cases.search': lambda rng: ('GET', f'/api/cases/search?q={rng.choice(SEARCH_TERMS)}', None),
+        'documents.list': lambda rng: ('GET', '/api/documents?per_page=50', None),
+        'documents.by_case': lambda rng: ('GET', f'/api/documents?case_id={case_id(rng)}', None),
+        'search': lambda rng: ('GET', f'/api/search?q={rng.choice(SEARCH_TERMS)}&limit=10', None),
+        'analysis.edital': lambda rng: ('POST', '/api/analysis/edital', {
+            'edital_content': EDITAL_SAMPLE, 'company_data': f'Empresa {rng.randint(1, 10 ** 6)}', 'use_cache': False
+        }),
+        'analysis.recurso': lambda rng: ('POST', '/api/analysis/recurso', {
+            'case_id': case_id(rng), 'motivo': 'Exigência excessiva de atestados',
+            'fundamentacao': 'Art. 67 da Lei 14.133/2021', 'use_cache': False, 'use_context': False
+        }),
+        'chat': lambda rng: ('POST', '/api/chat', {
+            'message': f'Qual o prazo de recurso no pregão? ({rng.randint(1, 10 ** 6)})', 'use_cache': False
+        })
+    }
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run_scenario(client, make_request, requests, concurrency, seed):
+    """Disparar as requisições com N threads e medir latência de cada uma"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(n):
+        nonlocal errors
+        if not hasattr(local, 'rng'):
+            local.rng = random.Random(seed * 1000 + n)
+        method, path, body = make_request(local.rng)
+        started = time.perf_counter()
+        response = client.request(method, path, json=body)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+def compare(results, baseline, tolerance):
+    """Regressões: p95 acima ou vazão abaixo do baseline além da tolerância"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: vazão {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=BASELINES_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da API com servidor simulado da OpenAI')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='banco gerado por benchmarks/seed.py')
+    parser.add_argument('--scenarios', help='lista separada por vírgula (padrão: todos)')
+    parser.add_argument('--requests', type=int, default=200, help='requisições por cenário')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--llm-latency-ms', type=float, default=200, help='latência do servidor simulado')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='gravar o resultado em JSON')
+    parser.add_argument('--save-baseline', metavar='NOME')
+    parser.add_argument('--compare', metavar='NOME')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='variação aceita ao comparar (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f'{args.db} não existe; rode benchmarks/seed.py antes')
+
+    configure_environment(args.db, OPENAI_API_KEY='stub', LLM_CACHE_ENABLED='0')
+    from src.services.llm_stub import StubConfig, start_stub_server
+    stub = start_stub_server(config=StubConfig(latency={'default': args.llm_latency_ms}))
+    os.environ['OPENAI_BASE_URL'] = f'http://127.0.0.1:{stub.server_port}/v1'
+
+    import httpx
+    from werkzeug.serving import make_server
+    from src.main import app
+    from src.models.user import db
+
+    with app.app_context():
+        row = db.session.execute(db.text('SELECT MIN(id), MAX(id), (SELECT COUNT(*) FROM documents) FROM cases')).one()
+    if row[0] is None:
+        parser.error(f'{args.db} não tem casos; rode benchmarks/seed.py antes')
+    ids = {'min_case': row[0], 'max_case': row[1]}
+
+    # Servidor WSGI real com threads: mede também serialização e I/O de rede local
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = httpx.Client(
+        base_url=f'http://127.0.0.1:{server.server_port}', timeout=300,
+        limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    )
+
+    scenarios = build_scenarios(ids)
+    selected = args.scenarios.split(',') if args.scenarios else list(scenarios)
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        parser.error(f"Cenários desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(scenarios)})")
+
+    results = {
+        'meta': {
+            'date': datetime.utcnow().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'cases': ids['max_case'] - ids['min_case'] + 1,
+            'documents': row[2],
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'llm_latency_ms': args.llm_latency_ms
+        },
+        'scenarios': {}
+    }
+
+    print(f"{'cenário':<20} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>6}")
+    for name in selected:
+        run_scenario(client, scenarios[name], args.warmup, min(args.concurrency, args.warmup or 1), args.seed)
+        result = run_scenario(client, scenarios[name], args.requests, args.concurrency, args.seed)
+        results['scenarios'][name] = result
+        print(f"{name:<20} {result['throughput_rps']:>8} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>6}")
+
+    client.close()
+    server.shutdown()
+    stub.shutdown()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f'{args.save_baseline}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f'Baseline gravado em {path}')
+
+    if args.compare:
+        with open(os.path.join(BASELINES_DIR, f'{args.compare}.json'), encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'Regressões em relação a {args.compare}:')
+            for line in regressions:
+                print(f'  {line}')
+            sys.exit(1)
+        print(f'Sem regressões em relação a {args.compare} (tolerância {args.tolerance:.0%})')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Popular um banco SQLite com volumes realistas de casos e documentos.
+
+Uso: python benchmarks/seed.py --profile large   (100 mil casos, 1 milhão de documentos)
+     python benchmarks/seed.py --cases 5000 --docs-per-case 20 --db /tmp/bench.db
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import DEFAULT_DB_PATH, PROFILES, configure_environment
+
+BATCH_SIZE = 5000
+
+ORGANS = [
+    'Prefeitura Municipal de São Paulo', 'Governo do Estado de Minas Gerais', 'Ministério da Saúde',
+    'Tribunal de Justiça do Rio de Janeiro', 'Universidade Federal do Paraná', 'Secretaria de Educação da Bahia',
+    'Companhia de Saneamento do Paraná', 'DNIT', 'Prefeitura Municipal de Curitiba', 'Câmara Municipal de Porto Alegre'
+]
+MODALITIES = ['Pregão Eletrônico', 'Concorrência', 'Tomada de Preços', 'Convite', 'Concurso', 'Leilão', 'Diálogo Competitivo']
+STATUSES = ['Em Andamento', 'Em Análise', 'Concluído', 'Suspenso', 'Cancelado']
+PRIORITIES = ['Alta', 'Média', 'Baixa']
+OBJECTS = [
+    'aquisição de equipamentos de informática', 'contratação de serviços de limpeza e conservação',
+    'execução de obras de pavimentação asfáltica', 'fornecimento de merenda escolar',
+    'serviços de vigilância patrimonial armada', 'locação de veículos com motorista',
+    'manutenção predial preventiva e corretiva', 'aquisição de medicamentos da farmácia básica',
+    'implantação de sistema de gestão hospitalar', 'fornecimento de combustível para a frota'
+]
+DOCUMENT_TYPES = ['edital', 'analise', 'recurso', 'contrarrazao', 'relatorio']
+DOCUMENT_STATUSES = ['Rascunho', 'Em Revisão', 'Finalizado']
+CLAUSE_TOPICS = [
+    'HABILITAÇÃO', 'QUALIFICAÇÃO TÉCNICA', 'QUALIFICAÇÃO ECONÔMICO-FINANCEIRA', 'PROPOSTA DE PREÇOS',
+    'JULGAMENTO', 'RECURSOS', 'SANÇÕES ADMINISTRATIVAS', 'GARANTIA CONTRATUAL', 'PAGAMENTO', 'REAJUSTE'
+]
+SENTENCES = [
+    'A licitante deverá comprovar aptidão para o desempenho de atividade pertinente e compatível com o objeto.',
+    'Será exigido balanço patrimonial do último exercício social, vedada a substituição por balancetes.',
+    'O prazo para interposição de recurso é de três dias úteis, contados da lavratura da ata.',
+    'Nos termos do art. 67 da Lei 14.133/2021, a qualificação técnica limita-se às parcelas de maior relevância.',
+    'A exigência de atestados em quantidade superior a 50% do objeto restringe o caráter competitivo do certame.',
+    'O pagamento será efetuado em até trinta dias após o atesto da nota fiscal pelo fiscal do contrato.',
+    'A garantia de execução corresponderá a cinco por cento do valor inicial do contrato.',
+    'As microempresas e empresas de pequeno porte terão tratamento diferenciado na forma da LC 123/2006.'
+]
+
+def document_text(rng, chars):
+    parts = []
+    size = 0
+    clause = 1
+    while size < chars:
+        heading = f'CLÁUSULA {clause} - DA {rng.choice(CLAUSE_TOPICS)}'
+        body = ' '.join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 5)))
+        parts.append(f'{heading}\n{body}')
+        size += len(heading) + len(body) + 2
+        clause += 1
+    return '\n\n'.join(parts)[:chars]
+
+def case_rows(rng, start_id, count, now):
+    for case_id in range(start_id, start_id + count):
+        created_at = now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+        # Cauda longa de órgãos, como na base real (o dashboard mostra só os principais)
+        organ = rng.choice(ORGANS) if rng.random() < 0.7 else f'Prefeitura Municipal de Cidade {rng.randint(1, 5000)}'
+        obj = rng.choice(OBJECTS)
+        yield {
+            'id': case_id,
+            'number': f'BENCH-{case_id:07d}/{created_at.year}',
+            'title': f'{rng.choice(MODALITIES)} - {obj.capitalize()}',
+            'description': f'Acompanhamento da licitação para {obj} junto a {organ}.',
+            'status': rng.choice(STATUSES),
+            'priority': rng.choice(PRIORITIES),
+            'organ': organ,
+            'modality': rng.choice(MODALITIES),
+            'object_description': obj,
+            'estimated_value': round(rng.lognormvariate(12, 1.5), 2),
+            'deadline': created_at + timedelta(days=rng.randint(10, 120)),
+            'created_at': created_at,
+            'updated_at': created_at,
+            'user_id': 1
+        }
+
+def document_rows(rng, case, per_case, doc_chars, content_metadata):
+    for n in range(per_case):
+        document_type = rng.choice(DOCUMENT_TYPES)
+        content = document_text(rng, rng.randint(doc_chars // 2, doc_chars * 3 // 2))
+        content_size, content_hash = content_metadata(content)
+        created_at = case['created_at'] + timedelta(hours=rng.randint(1, 24 * 60))
+        yield {
+            'title': f'{document_type.capitalize()} {n + 1} - {case["number"]}',
+            'content': content,
+            'content_size': content_size,
+            'content_hash': content_hash,
+            'document_type': document_type,
+            'status': rng.choice(DOCUMENT_STATUSES),
+            'created_at': created_at,
+            'updated_at': created_at,
+            'case_id': case['id'],
+            'user_id': 1
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Popular o banco de benchmark')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='small')
+    parser.add_argument('--cases', type=int, help='substitui o número de casos do perfil')
+    parser.add_argument('--docs-per-case', type=int, help='substitui os documentos por caso do perfil')
+    parser.add_argument('--doc-chars', type=int, default=1200, help='tamanho médio do texto de cada documento')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='apagar o banco existente')
+    args = parser.parse_args()
+
+    cases, per_case = PROFILES[args.profile]
+    cases = args.cases or cases
+    per_case = args.docs_per_case if args.docs_per_case is not None else per_case
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f'{args.db} já existe (use --force para recriar)')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+
+    configure_environment(args.db)
+    from src.main import app
+    from src.models.user import db
+    from src.models.case import Case
+    from src.models.document import Document, content_metadata
+    from src.models.case_counter import rebuild_case_counters
+
+    rng = random.Random(args.seed)
+    # Data fixa: o mesmo seed gera o mesmo banco em qualquer dia
+    now = datetime(2025, 1, 1)
+    started = time.perf_counter()
+
+    with app.app_context():
+        # Inserção direta na tabela (sem ORM); os gatilhos FTS5 continuam atualizando a busca
+        inserted_docs = 0
+        for start in range(1, cases + 1, BATCH_SIZE):
+            batch = list(case_rows(rng, start, min(BATCH_SIZE, cases - start + 1), now))
+            db.session.execute(Case.__table__.insert(), batch)
+            documents = []
+            for case in batch:
+                documents.extend(document_rows(rng, case, per_case, args.doc_chars, content_metadata))
+                if len(documents) >= BATCH_SIZE:
+                    db.session.execute(Document.__table__.insert(), documents)
+                    inserted_docs += len(documents)
+                    documents = []
+            if documents:
+                db.session.execute(Document.__table__.insert(), documents)
+                inserted_docs += len(documents)
+            db.session.commit()
+            print(f'{start + len(batch) - 1}/{cases} casos, {inserted_docs} documentos ({time.perf_counter() - started:.0f}s)')
+
+        rebuild_case_counters()
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+
+    print(f'Banco pronto em {args.db}: {cases} casos, {inserted_docs} documentos, {time.perf_counter() - started:.1f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+from contextlib import asynccontextmanager
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount
+from src.main import app as flask_app
+from src.routes.async_ai import ASYNC_ROUTES
+from src.services.async_llm import close_async_openai_clients
+from src.utils.async_database import dispose_async_engine
+
+# Threads para as rotas Flask (CRUD, relatórios, bulk) servidas dentro do processo ASGI
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 20))
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await close_async_openai_clients()
+    await dispose_async_engine()
+
+flask = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+# Chat e análise rodam no event loop (AsyncOpenAI + SQLAlchemy assíncrono);
+# todo o resto é o mesmo app Flask, com os mesmos modelos e o mesmo banco.
+# Produção: uvicorn src.asgi:app --host 0.0.0.0 --port 5000 (a partir de harvey-ai-backend/)
+app = Starlette(
+    routes=[*ASYNC_ROUTES, Mount('/', app=flask)],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+app.state.flask = flask
@@ -7,12 +7,26 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db
 from src.models.case import Case
-from src.models.document import Document
+from src.models.document import Document, backfill_content_metadata
+from src.models.case_counter import ensure_case_counters
+from src.models.conversation import Conversation
+from src.models.edital_analysis import EditalAnalysis
 from src.routes.user import user_bp
 from src.routes.chat import chat_bp
 from src.routes.cases import cases_bp
 from src.routes.documents import documents_bp
 from src.routes.analysis import analysis_bp
+from src.routes.jobs import jobs_bp
+from src.routes.search import search_bp
+from src.routes.bulk import bulk_bp
+from src.routes.conversations import conversations_bp
+from src.routes.metrics import metrics_bp
+from src.services.search_index import init_search_index
+from src.services.vector_index import init_semantic_index
+from src.services.job_queue import start_job_workers
+from src.utils.schema import ensure_columns, ensure_indexes
+from src.utils.database import configure_database, init_engines
+from src.utils.metrics import init_metrics
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'harvey-ai-secret-key-2024'
@@ -26,15 +40,37 @@ app.register_blueprint(chat_bp, url_prefix='/api')
 app.register_blueprint(cases_bp, url_prefix='/api')
 app.register_blueprint(documents_bp, url_prefix='/api')
 app.register_blueprint(analysis_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(search_bp, url_prefix='/api')
+app.register_blueprint(bulk_bp, url_prefix='/api')
+app.register_blueprint(conversations_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp, url_prefix='/api')
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# Latência, consultas SQL e tamanhos por endpoint (GET /api/metrics); SLOW_REQUEST_MS liga o log de lentas
+init_metrics(app)
+
+# Database configuration (DATABASE_URL, réplicas e pool: src/utils/database.py)
+configure_database(app)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
 
 # Create tables
 with app.app_context():
+    # Pragmas do SQLite (WAL, synchronous=NORMAL, busy_timeout, mmap) em cada conexão nova
+    init_engines(db)
     db.create_all()
+    ensure_columns(db)
+    ensure_indexes(db)
+    backfill_content_metadata()
+    # Contadores do dashboard (/api/cases/stats)
+    ensure_case_counters()
+    # Índice de busca textual (FTS5) mantido por gatilhos no SQLite
+    init_search_index(db)
+    # Índice vetorial dos documentos, atualizado a cada commit
+    init_semantic_index(app, db)
+
+# Workers da fila de jobs (análises e recursos assíncronos)
+start_job_workers(app)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
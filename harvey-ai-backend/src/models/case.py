@@ -1,9 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import func
 from src.models.user import db
 
 class Case(db.Model):
     __tablename__ = 'cases'
+    __table_args__ = (
+        # Paginação por cursor e ordenação padrão (created_at desc, id desc)
+        db.Index('ix_cases_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     number = db.Column(db.String(50), unique=True, nullable=False)
@@ -23,24 +28,31 @@ class Case(db.Model):
     # Relacionamentos
     documents = db.relationship('Document', backref='case', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'number': self.number,
-            'title': self.title,
-            'description': self.description,
-            'status': self.status,
-            'priority': self.priority,
-            'organ': self.organ,
-            'modality': self.modality,
-            'object_description': self.object_description,
-            'estimated_value': self.estimated_value,
-            'deadline': self.deadline.isoformat() if self.deadline else None,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'user_id': self.user_id,
-            'documents_count': len(self.documents) if self.documents else 0
-        }
+    # Campos aceitos em to_dict(fields=...) e em ?fields= nas listagens
+    SERIALIZABLE_FIELDS = [
+        'id', 'number', 'title', 'description', 'status', 'priority', 'organ', 'modality',
+        'object_description', 'estimated_value', 'deadline', 'created_at', 'updated_at',
+        'user_id', 'documents_count'
+    ]
+    
+    def count_documents(self):
+        """Quantidade de documentos sem carregar as linhas (e o conteúdo) de cada um"""
+        if 'documents' in self.__dict__:
+            return len(self.documents)
+        from src.models.document import Document
+        return db.session.query(func.count(Document.id)).filter(Document.case_id == self.id).scalar()
+    
+    def to_dict(self, fields=None, documents_count=None):
+        data = {}
+        for field in fields or self.SERIALIZABLE_FIELDS:
+            if field == 'documents_count':
+                data[field] = documents_count if documents_count is not None else self.count_documents()
+            elif field in ('deadline', 'created_at', 'updated_at'):
+                value = getattr(self, field)
+                data[field] = value.isoformat() if value else None
+            else:
+                data[field] = getattr(self, field)
+        return data
     
     @staticmethod
     def get_status_options():
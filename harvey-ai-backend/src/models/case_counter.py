@@ -0,0 +1,202 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import case, event, func, inspect
+from src.models.user import db
+from src.models.case import Case
+
+# Faixas de valor estimado (limite superior exclusivo, em R$)
+VALUE_BUCKETS = [
+    ('ate_80k', 80_000),
+    ('80k_1m', 1_000_000),
+    ('1m_10m', 10_000_000),
+    ('acima_10m', None)
+]
+VALUE_NOT_INFORMED = 'nao_informado'
+
+# Dimensões mantidas na tabela de contadores e a coluna de origem de cada uma
+COUNTER_DIMENSIONS = {
+    'status': 'status',
+    'priority': 'priority',
+    'organ': 'organ',
+    'modality': 'modality',
+    'value_range': 'estimated_value',
+    'created_day': 'created_at'
+}
+
+# Dias (created_day) somados na contagem de casos recentes
+RECENT_DAYS = 30
+
+class CaseCounter(db.Model):
+    """Contadores materializados de casos por dimensão, mantidos por eventos do ORM"""
+    __tablename__ = 'case_counters'
+    
+    dimension = db.Column(db.String(30), primary_key=True)  # total, status, priority, organ, modality, value_range, created_day
+    value = db.Column(db.String(200), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CaseCounter {self.dimension}={self.value}: {self.count}>'
+
+def value_bucket(estimated_value):
+    """Faixa de valor estimado de um caso"""
+    if estimated_value is None:
+        return VALUE_NOT_INFORMED
+    for bucket, upper in VALUE_BUCKETS:
+        if upper is None or estimated_value < upper:
+            return bucket
+    return VALUE_NOT_INFORMED
+
+def _dimension_value(dimension, raw):
+    if dimension == 'value_range':
+        return value_bucket(raw)
+    if dimension == 'created_day':
+        # Dia de criação em ISO (AAAA-MM-DD): a ordem do texto é a ordem das datas
+        return raw.date().isoformat() if raw else ''
+    return raw or ''
+
+def case_dimensions(values):
+    """Valores de cada dimensão para um caso (dict coluna -> valor)"""
+    return {dimension: _dimension_value(dimension, values.get(column)) for dimension, column in COUNTER_DIMENSIONS.items()}
+
+def bump_counter(connection, dimension, value, delta):
+    """Somar delta ao contador, criando a linha se ainda não existir"""
+    table = CaseCounter.__table__
+    result = connection.execute(
+        table.update()
+        .where(table.c.dimension == dimension, table.c.value == value)
+        .values(count=table.c.count + delta)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(dimension=dimension, value=value, count=delta))
+
+def apply_case_delta(connection, values, delta):
+    """Contabilizar (delta=1) ou descontar (delta=-1) um caso em todas as dimensões"""
+    bump_counter(connection, 'total', '', delta)
+    for dimension, value in case_dimensions(values).items():
+        bump_counter(connection, dimension, value, delta)
+
+def apply_case_deltas(connection, rows, delta=1):
+    """Contabilizar vários casos de uma vez (importação em lote, que não passa pelos eventos do ORM)"""
+    totals = Counter()
+    for values in rows:
+        totals[('total', '')] += delta
+        for dimension, value in case_dimensions(values).items():
+            totals[(dimension, value)] += delta
+    for (dimension, value), count in totals.items():
+        bump_counter(connection, dimension, value, count)
+
+def _current_values(target):
+    return {column: getattr(target, column) for column in COUNTER_DIMENSIONS.values()}
+
+@event.listens_for(Case, 'after_insert')
+def count_inserted_case(mapper, connection, target):
+    apply_case_delta(connection, _current_values(target), 1)
+
+@event.listens_for(Case, 'after_delete')
+def count_deleted_case(mapper, connection, target):
+    apply_case_delta(connection, _current_values(target), -1)
+
+@event.listens_for(Case, 'after_update')
+def count_updated_case(mapper, connection, target):
+    state = inspect(target)
+    for dimension, column in COUNTER_DIMENSIONS.items():
+        history = state.attrs[column].history
+        if not history.has_changes():
+            continue
+        old_raw = history.deleted[0] if history.deleted else None
+        old_value = _dimension_value(dimension, old_raw)
+        new_value = _dimension_value(dimension, getattr(target, column))
+        if old_value != new_value:
+            bump_counter(connection, dimension, old_value, -1)
+            bump_counter(connection, dimension, new_value, 1)
+
+def value_bucket_expression():
+    """Expressão SQL equivalente a value_bucket(), para agregações no banco"""
+    whens = [(Case.estimated_value.is_(None), VALUE_NOT_INFORMED)]
+    whens += [(Case.estimated_value < upper, bucket) for bucket, upper in VALUE_BUCKETS if upper is not None]
+    return case(*whens, else_=VALUE_BUCKETS[-1][0])
+
+def _grouped_counts(column):
+    rows = db.session.query(column, func.count(Case.id)).group_by(column).all()
+    counts = {}
+    for raw, count in rows:
+        # NULL e string vazia contam como "não informado"
+        counts[raw or ''] = counts.get(raw or '', 0) + count
+    return counts
+
+def live_case_breakdown(since):
+    """Agregar casos direto da tabela: uma passada GROUP BY status, priority com a janela recente"""
+    rows = db.session.query(
+        Case.status,
+        Case.priority,
+        func.count(Case.id),
+        func.sum(case((Case.created_at >= since, 1), else_=0))
+    ).group_by(Case.status, Case.priority).all()
+    
+    breakdown = {'total': {'': 0}, 'status': {}, 'priority': {}}
+    recent = 0
+    for status, priority, count, recent_count in rows:
+        breakdown['total'][''] += count
+        breakdown['status'][status or ''] = breakdown['status'].get(status or '', 0) + count
+        breakdown['priority'][priority or ''] = breakdown['priority'].get(priority or '', 0) + count
+        recent += recent_count or 0
+    
+    breakdown['organ'] = _grouped_counts(Case.organ)
+    breakdown['modality'] = _grouped_counts(Case.modality)
+    breakdown['value_range'] = _grouped_counts(value_bucket_expression())
+    return breakdown, recent
+
+def recent_days_start(now=None):
+    """Primeiro dia (ISO) da janela de casos recentes: os últimos RECENT_DAYS dias, incluindo hoje"""
+    return ((now or datetime.utcnow()) - timedelta(days=RECENT_DAYS - 1)).date().isoformat()
+
+def _created_day_counts():
+    # func.date devolve texto no SQLite e date no PostgreSQL: str() normaliza para AAAA-MM-DD
+    rows = db.session.query(func.date(Case.created_at), func.count(Case.id)).group_by(func.date(Case.created_at)).all()
+    return {(str(day) if day else ''): count for day, count in rows}
+
+def read_case_counters(top_organs=10):
+    """Ler os contadores materializados (poucas linhas, independente do número de casos).
+    
+    Retorna (breakdown, casos recentes); os recentes somam no máximo RECENT_DAYS
+    linhas de created_day.
+    """
+    breakdown = {'total': {}, 'status': {}, 'priority': {}, 'organ': {}, 'modality': {}, 'value_range': {}}
+    rows = CaseCounter.query.filter(CaseCounter.dimension.notin_(('organ', 'created_day')), CaseCounter.count > 0).all()
+    organs = (
+        CaseCounter.query
+        .filter(CaseCounter.dimension == 'organ', CaseCounter.count > 0)
+        .order_by(CaseCounter.count.desc())
+        .limit(top_organs)
+        .all()
+    )
+    for row in rows + organs:
+        breakdown[row.dimension][row.value] = row.count
+    
+    recent = db.session.query(func.coalesce(func.sum(CaseCounter.count), 0)).filter(
+        CaseCounter.dimension == 'created_day',
+        CaseCounter.value >= recent_days_start()
+    ).scalar()
+    return breakdown, recent
+
+def rebuild_case_counters():
+    """Recalcular todos os contadores a partir da tabela de casos"""
+    table = CaseCounter.__table__
+    db.session.execute(table.delete())
+    
+    breakdown, _ = live_case_breakdown(since=datetime.utcnow())
+    breakdown['created_day'] = _created_day_counts()
+    rows = [
+        {'dimension': dimension, 'value': value, 'count': count}
+        for dimension, counts in breakdown.items()
+        for value, count in counts.items()
+    ]
+    if rows:
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+
+def ensure_case_counters():
+    """Popular os contadores na primeira execução (tabela recém-criada ou sem a dimensão created_day)"""
+    total = CaseCounter.query.filter_by(dimension='total').first()
+    if total is None or (total.count > 0 and CaseCounter.query.filter_by(dimension='created_day').first() is None):
+        rebuild_case_counters()
@@ -0,0 +1,69 @@
+from datetime import datetime
+from src.models.user import db
+
+class Conversation(db.Model):
+    """Sessão de chat com memória: janela de mensagens recentes + resumo das anteriores"""
+    __tablename__ = 'conversations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    model = db.Column(db.String(50), default='gpt-3.5-turbo')
+    system_prompt = db.Column(db.Text)  # Vazio = prompt padrão do Harvey
+    summary = db.Column(db.Text)  # Resumo acumulado das mensagens fora da janela
+    summarized_until = db.Column(db.Integer, default=0)  # Id da última mensagem incorporada ao resumo
+    message_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    
+    case = db.relationship('Case')
+    messages = db.relationship(
+        'ConversationMessage', backref='conversation', lazy='dynamic',
+        cascade='all, delete-orphan', order_by='ConversationMessage.id'
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'model': self.model,
+            'system_prompt': self.system_prompt,
+            'summary': self.summary,
+            'summarized_until': self.summarized_until,
+            'message_count': self.message_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'case_id': self.case_id,
+            'user_id': self.user_id
+        }
+    
+    def __repr__(self):
+        return f'<Conversation {self.id}: {self.title}>'
+
+class ConversationMessage(db.Model):
+    __tablename__ = 'conversation_messages'
+    __table_args__ = (
+        # Janela recente: últimas mensagens de uma conversa
+        db.Index('ix_conversation_messages_conversation_id_id', 'conversation_id', 'id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
+    role = db.Column(db.String(20), nullable=False)  # user, assistant
+    content = db.Column(db.Text, nullable=False)
+    tokens = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'conversation_id': self.conversation_id,
+            'role': self.role,
+            'content': self.content,
+            'tokens': self.tokens,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ConversationMessage {self.id} ({self.role})>'
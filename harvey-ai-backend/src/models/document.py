@@ -1,13 +1,24 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import hashlib
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import deferred
 from src.models.user import db
 
 class Document(db.Model):
     __tablename__ = 'documents'
+    __table_args__ = (
+        # Paginação por cursor, com e sem filtro por caso
+        db.Index('ix_documents_created_at_id', 'created_at', 'id'),
+        db.Index('ix_documents_case_id_created_at_id', 'case_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    content = db.Column(db.Text)
+    # Texto só é lido do banco quando acessado (listagens trazem apenas tamanho e hash)
+    content = deferred(db.Column(db.Text))
+    content_size = db.Column(db.Integer)  # Tamanho do conteúdo em bytes (UTF-8)
+    content_hash = db.Column(db.String(64))  # SHA-256 do conteúdo
     document_type = db.Column(db.String(50), nullable=False)  # recurso, contrarrazao, analise, relatorio
     file_path = db.Column(db.String(500))  # Caminho para arquivo físico
     google_docs_id = db.Column(db.String(100))  # ID do documento no Google Docs
@@ -18,21 +29,25 @@ class Document(db.Model):
     case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'content': self.content,
-            'document_type': self.document_type,
-            'file_path': self.file_path,
-            'google_docs_id': self.google_docs_id,
-            'google_docs_url': self.google_docs_url,
-            'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
-            'case_id': self.case_id,
-            'user_id': self.user_id
-        }
+    # Campos aceitos em to_dict(fields=...) e em ?fields= nas listagens
+    SERIALIZABLE_FIELDS = [
+        'id', 'title', 'content', 'content_size', 'content_hash', 'document_type', 'file_path',
+        'google_docs_id', 'google_docs_url', 'status', 'created_at', 'updated_at', 'case_id', 'user_id'
+    ]
+    # Campos padrão de to_dict: metadados, sem o texto
+    SUMMARY_FIELDS = [field for field in SERIALIZABLE_FIELDS if field != 'content']
+    
+    def to_dict(self, fields=None, include_content=False):
+        if fields is None:
+            fields = self.SERIALIZABLE_FIELDS if include_content else self.SUMMARY_FIELDS
+        data = {}
+        for field in fields:
+            if field in ('created_at', 'updated_at'):
+                value = getattr(self, field)
+                data[field] = value.isoformat() if value else None
+            else:
+                data[field] = getattr(self, field)
+        return data
     
     @staticmethod
     def get_document_types():
@@ -45,3 +60,33 @@ class Document(db.Model):
     def __repr__(self):
         return f'<Document {self.title} ({self.document_type})>'
 
+def content_metadata(content):
+    """Tamanho em bytes e SHA-256 do conteúdo"""
+    if content is None:
+        return None, None
+    raw = content.encode('utf-8')
+    return len(raw), hashlib.sha256(raw).hexdigest()
+
+@event.listens_for(Document, 'before_insert')
+@event.listens_for(Document, 'before_update')
+def _update_content_metadata(mapper, connection, target):
+    # Conteúdo não carregado (deferred) não tem histórico e mantém os metadados atuais
+    if inspect(target).attrs.content.history.has_changes():
+        target.content_size, target.content_hash = content_metadata(target.content)
+
+def backfill_content_metadata(batch_size=200):
+    """Preencher tamanho e hash de documentos gravados antes dessas colunas existirem"""
+    table = Document.__table__
+    pending = table.select().with_only_columns(table.c.id, table.c.content).where(
+        table.c.content_hash.is_(None), table.c.content.isnot(None)
+    )
+    with db.engine.begin() as connection:
+        rows = connection.execute(pending).fetchmany(batch_size)
+        while rows:
+            for document_id, content in rows:
+                size, digest = content_metadata(content)
+                connection.execute(
+                    table.update().where(table.c.id == document_id).values(content_size=size, content_hash=digest)
+                )
+            rows = connection.execute(pending).fetchmany(batch_size)
+
@@ -0,0 +1,45 @@
+import json
+from datetime import datetime
+from src.models.user import db
+
+class EditalAnalysis(db.Model):
+    """Análise em trechos de um edital, com hashes e achados por seção para reanálises incrementais"""
+    __tablename__ = 'edital_analyses'
+    __table_args__ = (
+        # Base da reanálise: última análise do caso
+        db.Index('ix_edital_analyses_case_id_id', 'case_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'))
+    edital_document_id = db.Column(db.Integer, db.ForeignKey('documents.id'))
+    fingerprint = db.Column(db.String(64), nullable=False)  # Dados da empresa + prompt/modelo dos achados
+    content_hash = db.Column(db.String(64))  # SHA-256 da sequência de hashes das seções
+    sections = db.Column(db.Text, nullable=False)  # JSON: [{key, title, hash}]
+    units = db.Column(db.Text, nullable=False)  # JSON: trechos analisados [{title, section_hashes, findings}]
+    analysis = db.Column(db.Text)
+    tokens_used = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def snapshot(self):
+        """Dados usados pelo pipeline como base da próxima análise"""
+        return {
+            'id': self.id,
+            'content_hash': self.content_hash,
+            'sections': json.loads(self.sections),
+            'units': json.loads(self.units),
+            'analysis': self.analysis
+        }
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'case_id': self.case_id,
+            'edital_document_id': self.edital_document_id,
+            'sections_count': len(json.loads(self.sections)),
+            'tokens_used': self.tokens_used,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<EditalAnalysis {self.id} (case {self.case_id})>'
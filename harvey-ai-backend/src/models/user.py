@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from src.utils.database import RoutingSession
 
-db = SQLAlchemy()
+# Sessão com roteamento de leituras para réplicas (src/utils/database.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -1,10 +1,29 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify, Response, stream_with_context
+import json
 import openai
 import os
 from datetime import datetime
+from types import SimpleNamespace
+from sqlalchemy.orm import undefer
 from src.models.case import Case
 from src.models.document import Document
 from src.models.user import db
+from src.utils.sse import SSE_HEADERS, format_sse, wants_event_stream
+from src.services.openai_client import get_openai_client
+from src.services.model_router import open_routed_stream, primary_model, select_models
+from src.services.llm_cache import cache_enabled_for, cached_chat_completion, get_llm_cache, make_cache_key, usage_to_dict
+from src.services.edital_pipeline import CHUNK_MAX_CONCURRENCY, MAX_CONCURRENCY, estimate_chunked_usage, run_chunked_analysis
+from src.services.edital_batch import BATCH_MAX_EDITAIS, BATCH_MAX_WORKERS, BATCH_WORKERS, run_batch
+from src.services.edital_history import find_base_analysis, record_edital_analysis, without_history_fields
+from src.services.edital_chunker import compact_edital_text
+from src.services.edital_screener import (
+    LABEL_NAMES, focus_edital_text, format_brl, format_screening_hints, screen_edital
+)
+from src.services.rate_limiter import get_rate_limiter
+from src.services.tokens import count_message_tokens, fits_in_context, prepare_chat_request, record_usage
+from src.services.job_queue import PermanentJobError, register_job_handler
+from src.routes.jobs import enqueue_job
+from src.services.vector_index import MIN_GROUNDING_SCORE, format_context, retrieve_context
 
 analysis_bp = Blueprint('analysis', __name__)
 
@@ -35,12 +54,58 @@ Analise o edital fornecido e identifique:
 Forneça uma análise detalhada, fundamentada na legislação brasileira.
 """
 
+def parse_concurrency(data, default, maximum):
+    """max_concurrency do corpo limitado a 1..maximum; ValueError se não for inteiro"""
+    value = data.get('max_concurrency')
+    if value is None:
+        return default
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        raise ValueError('max_concurrency deve ser um número inteiro')
+
+def load_edital_document(document_id):
+    """Document do tipo edital com o texto carregado, ou None"""
+    document = Document.query.options(undefer(Document.content)).get(document_id)
+    if document is None or document.document_type != 'edital':
+        return None
+    return document
+
+def prepare_edital(edital_content):
+    """Texto compactado e triagem por regras do edital, calculados uma vez por análise"""
+    compacted = compact_edital_text(edital_content)
+    return {
+        'content': compacted,
+        'compaction': {'original_chars': len(edital_content), 'compacted_chars': len(compacted)},
+        'screening': screen_edital(compacted)
+    }
+
+def build_analysis_messages(edital_content, company_data, screening=None, focused=False):
+    """Montar as mensagens enviadas ao modelo para análise de edital, com os pontos da triagem por regras"""
+    hints = format_screening_hints(screening or screen_edital(edital_content))
+    label = 'Seções do edital selecionadas pela triagem' if focused else 'Edital'
+    parts = [f"Dados da empresa: {company_data}", hints, f"{label}: {edital_content}"]
+    return [
+        {"role": "system", "content": ANALYSIS_PROMPT},
+        {"role": "user", "content": '\n\n'.join(part for part in parts if part)}
+    ]
+
 @analysis_bp.route('/analysis/edital', methods=['POST'])
 def analyze_edital():
     """Analisar edital de licitação com IA"""
     try:
         data = request.get_json()
         
+        # Edital enviado por upload: o texto vem do banco, não do corpo da requisição
+        edital_document_id = data.get('edital_document_id')
+        if edital_document_id:
+            edital_document = load_edital_document(edital_document_id)
+            if edital_document is None:
+                return jsonify({'error': 'Edital não encontrado'}), 404
+            data['edital_content'] = edital_document.content
+        
         # Validações
         required_fields = ['edital_content', 'company_data']
         for field in required_fields:
@@ -50,6 +115,11 @@ def analyze_edital():
         edital_content = data['edital_content']
         company_data = data['company_data']
         case_id = data.get('case_id')
+        use_cache = data.get('use_cache', True)
+        try:
+            max_concurrency = parse_concurrency(data, MAX_CONCURRENCY, CHUNK_MAX_CONCURRENCY)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Verificar API key
         api_key = os.getenv('OPENAI_API_KEY')
@@ -59,53 +129,56 @@ def analyze_edital():
                 'fallback_analysis': generate_fallback_analysis(edital_content, company_data)
             }), 500
         
-        # Preparar prompt personalizado
-        analysis_prompt = f"""
-{ANALYSIS_PROMPT}
-
-**Dados da Empresa:**
-{company_data}
-
-**Conteúdo do Edital:**
-{edital_content}
-"""
+        # Modo assíncrono: a análise roda na fila de jobs
+        if data.get('async'):
+            payload = {
+                'company_data': company_data,
+                'case_id': case_id,
+                'mode': data.get('mode'),
+                'incremental': data.get('incremental', False),
+                'base_analysis_id': data.get('base_analysis_id'),
+                'use_cache': use_cache
+            }
+            # Com upload, a fila guarda só o id; o texto é lido do banco pelo worker
+            if edital_document_id:
+                payload['edital_document_id'] = edital_document_id
+            else:
+                payload['edital_content'] = edital_content
+            return enqueue_job('analysis.edital', payload)
         
-        # Configurar cliente OpenAI
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Fazer análise com IA
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": ANALYSIS_PROMPT},
-                {"role": "user", "content": f"Dados da empresa: {company_data}\n\nEdital: {edital_content}"}
-            ],
-            max_tokens=2000,
-            temperature=0.3
-        )
+        # Editais que não cabem no contexto do modelo são analisados em trechos (map-reduce);
+        # incremental força os trechos para que reenvios (erratas) reaproveitem os achados
+        prepared = prepare_edital(edital_content)
+        mode = resolve_analysis_mode(analysis_mode(data), prepared['content'], company_data, prepared['screening'])
+        
+        # Modo streaming: tokens enviados via Server-Sent Events
+        if mode == 'single' and wants_event_stream(request, data):
+            return stream_edital_analysis(api_key, edital_content, company_data, case_id, use_cache, prepared)
         
-        analysis_result = response.choices[0].message.content
+        base = None
+        if mode == 'chunked':
+            base = find_base_analysis(company_data, case_id, data.get('base_analysis_id'))
+        
+        result = run_edital_analysis(
+            api_key,
+            edital_content,
+            company_data,
+            mode=mode,
+            use_cache=use_cache,
+            max_concurrency=max_concurrency,
+            base=base,
+            prepared=prepared
+        )
+        if result['mode'] == 'chunked':
+            result['analysis_id'] = record_edital_analysis(result, company_data, case_id, edital_document_id)
         
         # Salvar análise no banco se case_id foi fornecido
         if case_id:
-            case = Case.query.get(case_id)
-            if case:
-                analysis_doc = Document(
-                    title=f'Análise de Edital - {case.title}',
-                    content=analysis_result,
-                    document_type='analise',
-                    status='Finalizado',
-                    case_id=case_id,
-                    user_id=1
-                )
-                
-                db.session.add(analysis_doc)
-                db.session.commit()
+            save_analysis_document(case_id, result['analysis'])
         
         return jsonify({
-            'analysis': analysis_result,
+            **without_history_fields(result),
             'timestamp': datetime.utcnow().isoformat(),
-            'tokens_used': response.usage.total_tokens if response.usage else 0,
             'saved_to_case': case_id is not None
         })
         
@@ -121,44 +194,447 @@ def analyze_edital():
             'fallback_analysis': generate_fallback_analysis(data.get('edital_content', ''), data.get('company_data', ''))
         }), 500
 
-def generate_fallback_analysis(edital_content, company_data):
-    """Gerar análise básica quando a IA não está disponível"""
-    return f"""
-# Análise Básica do Edital
-
-## Resumo
-Esta é uma análise básica gerada automaticamente. Para uma análise completa com IA, configure a API key do OpenAI.
-
-## Pontos de Atenção Gerais
-1. **Verificar Habilitação Jurídica:**
-   - Certidão de regularidade fiscal
-   - Certidão trabalhista
-   - Certidão municipal
-
-2. **Qualificação Técnica:**
-   - Atestados de capacidade técnica
-   - Registro no órgão competente
-   - Experiência mínima exigida
-
-3. **Qualificação Econômico-Financeira:**
-   - Balanço patrimonial
-   - Certidão negativa de falência
-   - Índices de liquidez
-
-## Recomendações
-- Revisar todos os anexos do edital
-- Verificar prazos de entrega
-- Analisar critérios de julgamento
-- Confirmar local de entrega das propostas
-
-## Próximos Passos
-1. Configure a API key do OpenAI para análise detalhada
-2. Revise manualmente o edital
-3. Consulte especialista jurídico se necessário
-
-**Dados da empresa considerados:** {company_data[:200]}...
-**Conteúdo do edital:** {len(edital_content)} caracteres analisados.
-"""
+@analysis_bp.route('/analysis/edital/screen', methods=['POST'])
+def screen_edital_clauses():
+    """Triagem do edital por regras locais, sem IA: cláusulas restritivas, prazos, valores e citações"""
+    try:
+        data = request.get_json()
+        
+        edital_content = data.get('edital_content')
+        if data.get('edital_document_id'):
+            edital_document = load_edital_document(data['edital_document_id'])
+            if edital_document is None:
+                return jsonify({'error': 'Edital não encontrado'}), 404
+            edital_content = edital_document.content
+        if not edital_content:
+            return jsonify({'error': 'Campo edital_content é obrigatório'}), 400
+        
+        screening = screen_edital(compact_edital_text(edital_content))
+        if data.get('report'):
+            screening['report'] = generate_fallback_analysis(edital_content, data.get('company_data', ''), screening)
+        return jsonify(screening)
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro na triagem do edital: {str(e)}'}), 500
+
+@analysis_bp.route('/analysis/edital/batch', methods=['POST'])
+def analyze_edital_batch():
+    """Analisar um lote de editais em paralelo, por prazo e prioridade, com os resultados transmitidos ao terminar"""
+    try:
+        data = request.get_json()
+        
+        # Editais avulsos (texto, upload ou caso) e casos cujo último edital será analisado
+        entries = list(data.get('editais') or []) + [{'case_id': case_id} for case_id in data.get('case_ids') or []]
+        if not entries:
+            return jsonify({'error': 'Informe editais ou case_ids'}), 400
+        if len(entries) > BATCH_MAX_EDITAIS:
+            return jsonify({'error': f'Lote excede o limite de {BATCH_MAX_EDITAIS} editais'}), 400
+        
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            return jsonify({'error': 'API key não configurada'}), 500
+        
+        try:
+            workers = parse_concurrency(data, BATCH_WORKERS, BATCH_MAX_WORKERS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        items = load_batch_items(entries, data.get('company_data'), data.get('mode'))
+        use_cache = data.get('use_cache', True)
+        app = current_app._get_current_object()
+        event_stream = wants_event_stream(request, data)
+        # Textos já carregados: nenhuma sessão fica aberta enquanto o lote roda
+        db.session.remove()
+        
+        def generate():
+            batch = run_batch(
+                items,
+                lambda item: analyze_batch_item(app, api_key, item, use_cache),
+                estimate_batch_item,
+                get_rate_limiter(),
+                workers
+            )
+            for event, payload in batch:
+                if event_stream:
+                    yield format_sse(payload, event=event)
+                else:
+                    yield json.dumps({'event': event, 'data': payload}, ensure_ascii=False) + '\n'
+        
+        mimetype = 'text/event-stream' if event_stream else 'application/x-ndjson'
+        return Response(stream_with_context(generate()), mimetype=mimetype, headers=SSE_HEADERS)
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro no lote de análises: {str(e)}'}), 500
+
+def load_batch_items(entries, company_data, mode=None):
+    """Itens do lote com o texto do edital e o prazo/prioridade do caso; problemas ficam em item['error']"""
+    entries = [entry if isinstance(entry, dict) else {'edital_content': entry} for entry in entries]
+    case_ids = {entry['case_id'] for entry in entries if entry.get('case_id')}
+    cases = {case.id: case for case in Case.query.filter(Case.id.in_(case_ids))} if case_ids else {}
+    
+    items = []
+    for index, entry in enumerate(entries):
+        case = cases.get(entry.get('case_id'))
+        item = {
+            'index': index,
+            'case_id': entry.get('case_id'),
+            'edital_document_id': entry.get('edital_document_id'),
+            'edital_content': entry.get('edital_content'),
+            'company_data': entry.get('company_data') or company_data,
+            'mode': analysis_mode(entry) or mode,
+            'base_analysis_id': entry.get('base_analysis_id'),
+            'deadline': case.deadline if case else None,
+            'priority': case.priority if case else entry.get('priority')
+        }
+        items.append(item)
+        
+        if item['case_id'] and case is None:
+            item['error'] = 'Caso não encontrado'
+        elif not item['company_data']:
+            item['error'] = 'Campo company_data é obrigatório'
+        elif not item['edital_content']:
+            # Sem texto: o edital enviado por upload ou, só com o caso, o último edital do caso
+            if item['edital_document_id']:
+                document = load_edital_document(item['edital_document_id'])
+            elif case is not None:
+                document = (
+                    Document.query.options(undefer(Document.content))
+                    .filter_by(case_id=case.id, document_type='edital')
+                    .order_by(Document.id.desc())
+                    .first()
+                )
+            else:
+                document = None
+            if document is None or not document.content:
+                item['error'] = 'Edital não encontrado'
+            else:
+                item.update(edital_document_id=document.id, edital_content=document.content)
+    return items
+
+def estimate_batch_item(item):
+    """Requisições e tokens (entrada + saída máxima) a reservar no limite de taxa antes da análise"""
+    # Texto compactado e triagem guardados no item para a análise
+    item['prepared'] = prepared = prepare_edital(item['edital_content'])
+    edital_content, screening = prepared['content'], prepared['screening']
+    item['mode'] = resolve_analysis_mode(item['mode'], edital_content, item['company_data'], screening)
+    if item['mode'] == 'chunked':
+        return estimate_chunked_usage(edital_content, item['company_data'])
+    
+    if item['mode'] == 'focused':
+        edital_content = focus_edital_text(edital_content, screening)
+    messages = build_analysis_messages(edital_content, item['company_data'], screening, focused=item['mode'] == 'focused')
+    return 1, count_message_tokens(messages, primary_model(ANALYSIS_TASK)) + ANALYSIS_MAX_TOKENS
+
+def analyze_batch_item(app, api_key, item, use_cache=True):
+    """Analisar um edital do lote e gravar o resultado como em POST /analysis/edital (banco só fora da chamada ao modelo)"""
+    base = None
+    if item['mode'] == 'chunked':
+        with app.app_context():
+            base = find_base_analysis(item['company_data'], item['case_id'], item['base_analysis_id'])
+    
+    result = run_edital_analysis(
+        api_key, item['edital_content'], item['company_data'], mode=item['mode'], use_cache=use_cache, base=base,
+        prepared=item.pop('prepared', None)
+    )
+    
+    with app.app_context():
+        if result['mode'] == 'chunked':
+            result['analysis_id'] = record_edital_analysis(result, item['company_data'], item['case_id'], item['edital_document_id'])
+        analysis_doc = save_analysis_document(item['case_id'], result['analysis']) if item['case_id'] else None
+        document_id = analysis_doc.id if analysis_doc else None
+    
+    return {
+        **without_history_fields(result),
+        'document_id': document_id,
+        'saved_to_case': document_id is not None
+    }
+
+# Tarefa de roteamento e limite de resposta da análise em chamada única
+ANALYSIS_TASK = 'analysis'
+ANALYSIS_MAX_TOKENS = 2000
+
+def analysis_mode(data):
+    """Modo pedido na requisição; incremental exige a análise em trechos"""
+    return 'chunked' if data.get('incremental') else data.get('mode')
+
+def resolve_analysis_mode(mode, edital_content, company_data='', screening=None):
+    """Usar o modo pedido ou, por padrão, trechos quando o edital não cabe no contexto do modelo"""
+    if mode in ('single', 'chunked', 'focused'):
+        return mode
+    messages = build_analysis_messages(edital_content, company_data, screening)
+    return 'single' if fits_in_context(messages, primary_model(ANALYSIS_TASK), ANALYSIS_MAX_TOKENS) else 'chunked'
+
+def run_edital_analysis(api_key, edital_content, company_data, mode=None, use_cache=True, max_concurrency=MAX_CONCURRENCY,
+                        base=None, prepared=None):
+    """Executar a análise do edital (chamada única ou map-reduce), sem acessar o banco.
+    
+    base é o snapshot da análise anterior do mesmo edital (find_base_analysis):
+    no modo em trechos, só as seções alteradas voltam ao modelo. prepared é o
+    resultado de prepare_edital, quando já calculado para escolher o modo.
+    """
+    client = get_openai_client(api_key)
+    prepared = prepared or prepare_edital(edital_content)
+    edital_content, screening = prepared['content'], prepared['screening']
+    compaction = dict(prepared['compaction'])
+    mode = resolve_analysis_mode(mode, edital_content, company_data, screening)
+    
+    if mode == 'chunked':
+        result = run_chunked_analysis(
+            client,
+            edital_content,
+            company_data,
+            ANALYSIS_PROMPT,
+            max_concurrency=max_concurrency,
+            use_cache=use_cache,
+            previous=base
+        )
+        return {'mode': 'chunked', 'compaction': compaction, 'screening': screening, **result}
+    
+    # Modo focused: só as seções sinalizadas pela triagem vão ao modelo
+    if mode == 'focused':
+        edital_content = focus_edital_text(edital_content, screening)
+        compaction['focused_chars'] = len(edital_content)
+    
+    # Reenvios do mesmo edital vêm do cache
+    analysis_result, usage, cache_info = cached_chat_completion(
+        client,
+        'analysis.edital',
+        use_cache=use_cache,
+        task=ANALYSIS_TASK,
+        messages=build_analysis_messages(edital_content, company_data, screening, focused=mode == 'focused'),
+        max_tokens=ANALYSIS_MAX_TOKENS,
+        temperature=0.3
+    )
+    
+    return single_analysis_result(mode, analysis_result, usage, cache_info, compaction, screening)
+
+def single_analysis_result(mode, analysis_result, usage, cache_info, compaction, screening):
+    """Resultado da análise em chamada única, o mesmo nas rotas Flask e ASGI"""
+    return {
+        'mode': mode,
+        'analysis': analysis_result,
+        'model_used': usage['model'],
+        'tokens_used': usage['total_tokens'],
+        'prompt_tokens': usage['prompt_tokens'],
+        'completion_tokens': usage['completion_tokens'],
+        'truncated_tokens': usage['truncated_tokens'],
+        'compaction': compaction,
+        'screening': screening,
+        'cache': cache_info
+    }
+
+def save_analysis_document(case_id, analysis_result):
+    """Salvar a análise como documento do caso, se o caso existir"""
+    case = Case.query.get(case_id)
+    if not case:
+        return None
+    
+    analysis_doc = Document(
+        title=f'Análise de Edital - {case.title}',
+        content=analysis_result,
+        document_type='analise',
+        status='Finalizado',
+        case_id=case_id,
+        user_id=1
+    )
+    
+    db.session.add(analysis_doc)
+    db.session.commit()
+    return analysis_doc
+
+def stream_edital_analysis(api_key, edital_content, company_data, case_id, use_cache=True, prepared=None):
+    """Transmitir a análise do edital token a token via Server-Sent Events"""
+    prepared = prepared or prepare_edital(edital_content)
+    # Resolver o caso antes de iniciar o stream para não segurar a sessão durante a geração
+    case_title = None
+    if case_id:
+        case = Case.query.get(case_id)
+        case_title = case.title if case else None
+    db.session.remove()
+    
+    client = get_openai_client(api_key)
+    request_params = {
+        'messages': build_analysis_messages(prepared['content'], company_data, prepared['screening']),
+        'max_tokens': ANALYSIS_MAX_TOKENS,
+        'temperature': 0.3
+    }
+    # Cache consultado com o modelo que o roteamento chamaria primeiro
+    model = select_models(ANALYSIS_TASK, request_params['messages'], ANALYSIS_MAX_TOKENS)[0]
+    params, budget = prepare_chat_request('analysis.edital', {**request_params, 'model': model})
+    cache = get_llm_cache() if cache_enabled_for('analysis.edital', use_cache) else None
+    cache_key = make_cache_key(params['model'], params['messages'], params['temperature'], params['max_tokens'])
+    
+    def generate():
+        # Primeiro evento enviado imediatamente, antes da chamada ao modelo
+        yield format_sse({'status': 'started'}, event='start')
+        
+        nonlocal params, budget
+        parts = []
+        usage = usage_to_dict(None)
+        stream = None
+        cache_info = {'enabled': cache is not None, 'hit': False}
+        cached = cache.get(cache_key) if cache else None
+        try:
+            if cached is not None:
+                # Resposta em cache enviada de uma vez, sem chamar o modelo
+                cache_info.update(cache.record('analysis.edital', hit=True), hit=True)
+                parts.append(cached['content'])
+                yield format_sse({'content': cached['content']}, event='token')
+            else:
+                # Failover para outro modelo se a abertura do stream falhar (limite de taxa, timeout)
+                stream, params, budget, _ = open_routed_stream(
+                    client, 'analysis.edital', ANALYSIS_TASK, **request_params
+                )
+            
+            for chunk in stream or []:
+                if chunk.usage:
+                    usage = usage_to_dict(chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield format_sse({'content': delta}, event='token')
+        
+        except GeneratorExit:
+            # Cliente desconectou: a análise parcial é descartada, nada é gravado
+            raise
+        
+        except openai.AuthenticationError:
+            yield format_sse({
+                'error': 'Erro de autenticação com OpenAI',
+                'fallback_analysis': generate_fallback_analysis(edital_content, company_data, prepared['screening'])
+            }, event='error')
+            return
+        
+        except Exception as e:
+            yield format_sse({
+                'error': f'Erro na análise: {str(e)}',
+                'fallback_analysis': generate_fallback_analysis(edital_content, company_data, prepared['screening'])
+            }, event='error')
+            return
+        
+        finally:
+            if stream is not None:
+                stream.close()
+        
+        analysis_result = ''.join(parts)
+        document_id = None
+        tokens_used = usage['total_tokens']
+        record_usage('analysis.edital', budget, usage, cached=cached is not None)
+        
+        if cache is not None and cached is None:
+            cache_key_used = make_cache_key(params['model'], params['messages'], params['temperature'], params['max_tokens'])
+            cache.set(cache_key_used, 'analysis.edital', params['model'], analysis_result, tokens_used)
+            cache_info.update(cache.record('analysis.edital', hit=False))
+        
+        # Salvar somente a análise completa, em uma única transação
+        if case_title is not None:
+            try:
+                analysis_doc = Document(
+                    title=f'Análise de Edital - {case_title}',
+                    content=analysis_result,
+                    document_type='analise',
+                    status='Finalizado',
+                    case_id=case_id,
+                    user_id=1
+                )
+                
+                db.session.add(analysis_doc)
+                db.session.commit()
+                document_id = analysis_doc.id
+            except Exception as e:
+                db.session.rollback()
+                yield format_sse({'error': f'Erro ao salvar análise: {str(e)}'}, event='error')
+                return
+        
+        yield format_sse({
+            'analysis': analysis_result,
+            'model_used': params['model'],
+            'timestamp': datetime.utcnow().isoformat(),
+            'tokens_used': tokens_used,
+            'saved_to_case': case_id is not None,
+            'document_id': document_id,
+            'cache': cache_info
+        }, event='done')
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+def _format_finding(finding):
+    detail = f": {finding['detail']}" if finding['detail'] else ''
+    return (
+        f"- **[{finding['severity']}] {finding['title']}** ({finding['section']}){detail}\n"
+        f"  > {finding['excerpt']}\n"
+        f"  Fundamento: {finding['basis']}"
+    )
+
+def generate_fallback_analysis(edital_content, company_data, screening=None):
+    """Gerar análise básica quando a IA não está disponível, a partir da triagem por regras"""
+    screening = screening or screen_edital(edital_content or '')
+    findings = screening['findings']
+    vicios = [finding for finding in findings if finding['category'] == 'vicio']
+    riscos = [finding for finding in findings if finding['category'] == 'risco']
+    dates = [item for item in screening['deadlines']['dates'] if item['label']]
+    periods = [item for item in screening['deadlines']['periods'] if item['label']]
+    opening = next((item for item in dates if item['label'] == 'abertura'), None)
+    articles = ', '.join(str(item['article']) for item in screening['citations']['lei_14133'])
+    
+    lines = [
+        '# Análise Básica do Edital',
+        '',
+        '## Resumo',
+        f"Análise gerada automaticamente por regras locais, sem IA: {len(findings)} ponto(s) sinalizado(s), "
+        f"{screening['stats']['high_severity']} de severidade alta. Para uma análise completa com IA, configure a API key do OpenAI.",
+        '',
+        '## 1. Vícios e Irregularidades'
+    ]
+    lines += [_format_finding(finding) for finding in vicios] or ['- Nenhuma cláusula restritiva identificada pelas regras automáticas.']
+    
+    lines += ['', '## 2. Oportunidades de Impugnação']
+    lines += [
+        f"- {finding['title']} ({finding['section']}) — {finding['basis']}"
+        for finding in vicios if finding['severity'] in ('alta', 'media')
+    ] or ['- Nenhuma oportunidade identificada pelas regras automáticas; revise o edital manualmente.']
+    if opening and vicios:
+        lines.append(f"- Impugnações até 3 dias úteis antes da abertura ({opening['date']}), art. 164 da Lei 14.133/2021")
+    
+    lines += [
+        '', '## 3. Estratégias Recomendadas',
+        '- Revisar todos os anexos do edital e confirmar local e forma de envio das propostas',
+        '- Conferir habilitação jurídica, fiscal, técnica e econômico-financeira com antecedência'
+    ]
+    if vicios:
+        lines.append('- Pedir esclarecimentos ou impugnar os pontos acima antes da sessão pública')
+    
+    lines += ['', '## 4. Riscos Identificados']
+    lines += [_format_finding(finding) for finding in riscos] or ['- Nenhum risco identificado pelas regras automáticas.']
+    
+    lines += ['', '## Prazos e Datas']
+    lines += [
+        f"- {LABEL_NAMES[item['label']]}: {item['date']}{' às ' + item['time'] if item['time'] else ''} ({item['section']})"
+        for item in dates
+    ] + [f"- {LABEL_NAMES[item['label']]}: {item['amount']} {item['unit']} ({item['section']})" for item in periods] \
+        or ['- Nenhuma data identificada.']
+    
+    lines += ['', '## Valores']
+    if screening['estimated_value']:
+        lines.append(f"- Valor estimado: {format_brl(screening['estimated_value'])}")
+    lines += [
+        f"- {format_brl(item['amount'])} ({item['label'] or 'sem rótulo'}, {item['section']})"
+        for item in screening['values'][:10]
+    ] or ['- Nenhum valor identificado.']
+    
+    lines += ['', '## Legislação Citada']
+    lines.append(f'- Lei 14.133/2021: arts. {articles}' if articles else '- Nenhum artigo da Lei 14.133/2021 citado.')
+    if screening['citations']['revoked_law_mentions']:
+        lines.append(f"- Leis revogadas (8.666/1993, 10.520/2002, 12.462/2011): {screening['citations']['revoked_law_mentions']} menção(ões)")
+    
+    lines += [
+        '',
+        f"**Dados da empresa considerados:** {(company_data or '')[:200]}...",
+        f"**Conteúdo do edital:** {len(edital_content or '')} caracteres analisados em {screening['stats']['elapsed_ms']} ms."
+    ]
+    return '\n'.join(lines) + '\n'
 
 @analysis_bp.route('/analysis/recurso', methods=['POST'])
 def generate_recurso():
@@ -180,13 +656,52 @@ def generate_recurso():
         if not case:
             return jsonify({'error': 'Caso não encontrado'}), 404
         
-        # Verificar API key
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            recurso_content = generate_fallback_recurso(motivo, fundamentacao, case)
-        else:
-            # Gerar recurso com IA
-            recurso_prompt = f"""
+        # Modo assíncrono: a minuta é gerada na fila de jobs
+        if data.get('async'):
+            return enqueue_job('analysis.recurso', {
+                'motivo': motivo,
+                'fundamentacao': fundamentacao,
+                'case_id': case_id,
+                'use_cache': data.get('use_cache', True)
+            })
+        
+        # Trechos de recursos e análises anteriores para fundamentar a minuta
+        context = retrieve_grounding_context(f'{motivo}\n{fundamentacao}') if data.get('use_context', True) else []
+        
+        recurso_content, cache_info = draft_recurso(case, motivo, fundamentacao, data.get('use_cache', True), context)
+        
+        # Salvar recurso como documento
+        recurso_doc = save_recurso_document(case_id, case.title, recurso_content)
+        
+        return jsonify({
+            'message': 'Recurso gerado com sucesso',
+            'recurso': recurso_doc.to_dict(),
+            'content': recurso_content,
+            'cache': cache_info,
+            'references': summarize_references(context)
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao gerar recurso: {str(e)}'}), 500
+
+def retrieve_grounding_context(query, document_types=('recurso', 'analise', 'contrarrazao'), k=4):
+    """Buscar trechos semelhantes em documentos já gravados (falhas no índice não impedem a geração)"""
+    try:
+        return retrieve_context(query, k=k, document_types=document_types, min_score=MIN_GROUNDING_SCORE)
+    except Exception:
+        return []
+
+def summarize_references(context):
+    """Referências usadas na fundamentação, sem o texto dos trechos"""
+    return [
+        {'document_id': item['document_id'], 'title': item['title'], 'document_type': item['document_type'], 'score': item['score']}
+        for item in context
+    ]
+
+def build_recurso_prompt(case, motivo, fundamentacao, context=None):
+    """Montar o prompt da minuta de recurso administrativo"""
+    prompt = f"""
 Elabore um recurso administrativo formal para licitação pública brasileira com base nos seguintes dados:
 
 **Caso:** {case.title}
@@ -210,40 +725,46 @@ Estruture o documento com:
 - Dos pedidos
 - Fecho
 """
-            
-            client = openai.OpenAI(api_key=api_key)
-            
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": recurso_prompt}],
-                max_tokens=2000,
-                temperature=0.3
-            )
-            
-            recurso_content = response.choices[0].message.content
-        
-        # Salvar recurso como documento
-        recurso_doc = Document(
-            title=f'Recurso Administrativo - {case.title}',
-            content=recurso_content,
-            document_type='recurso',
-            status='Rascunho',
-            case_id=case_id,
-            user_id=1
-        )
-        
-        db.session.add(recurso_doc)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Recurso gerado com sucesso',
-            'recurso': recurso_doc.to_dict(),
-            'content': recurso_content
-        })
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'Erro ao gerar recurso: {str(e)}'}), 500
+    if context:
+        prompt += f"""
+**Trechos de documentos anteriores do escritório (use como referência de argumentação e estilo, sem copiar literalmente):**
+
+{format_context(context)}
+"""
+    return prompt
+
+def draft_recurso(case, motivo, fundamentacao, use_cache=True, context=None):
+    """Gerar o texto do recurso com IA ou, sem API key, pelo modelo básico"""
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        return generate_fallback_recurso(motivo, fundamentacao, case), {'enabled': False, 'hit': False}
+    
+    client = get_openai_client(api_key)
+    recurso_content, _, cache_info = cached_chat_completion(
+        client,
+        'analysis.recurso',
+        use_cache=use_cache,
+        task='recurso',
+        messages=[{"role": "user", "content": build_recurso_prompt(case, motivo, fundamentacao, context)}],
+        max_tokens=2000,
+        temperature=0.3
+    )
+    return recurso_content, cache_info
+
+def save_recurso_document(case_id, case_title, recurso_content):
+    """Salvar a minuta de recurso como documento do caso"""
+    recurso_doc = Document(
+        title=f'Recurso Administrativo - {case_title}',
+        content=recurso_content,
+        document_type='recurso',
+        status='Rascunho',
+        case_id=case_id,
+        user_id=1
+    )
+    
+    db.session.add(recurso_doc)
+    db.session.commit()
+    return recurso_doc
 
 def generate_fallback_recurso(motivo, fundamentacao, case):
     """Gerar recurso básico quando a IA não está disponível"""
@@ -337,6 +858,11 @@ Requer-se a manutenção da decisão recorrida, por estar em consonância com a
 [EMPRESA]
 """
         
+        # Contrarrazões e recursos anteriores semelhantes, para consulta do advogado
+        references = retrieve_grounding_context(
+            f'{recurso_adverso}\n{argumentos_defesa}', document_types=('contrarrazao', 'recurso')
+        )
+        
         # Salvar contrarrazões como documento
         contrarrazao_doc = Document(
             title=f'Contrarrazões - {case.title}',
@@ -353,10 +879,91 @@ Requer-se a manutenção da decisão recorrida, por estar em consonância com a
         return jsonify({
             'message': 'Contrarrazões geradas com sucesso',
             'contrarrazao': contrarrazao_doc.to_dict(),
-            'content': contrarrazao_content
+            'content': contrarrazao_content,
+            'references': summarize_references(references)
         })
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Erro ao gerar contrarrazões: {str(e)}'}), 500
 
+def run_edital_job(app, payload, report_progress):
+    """Job de análise de edital: nenhuma sessão de banco fica aberta durante a chamada ao modelo"""
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        raise PermanentJobError('API key não configurada')
+    
+    edital_content = payload.get('edital_content')
+    if payload.get('edital_document_id'):
+        with app.app_context():
+            edital_document = load_edital_document(payload['edital_document_id'])
+            if edital_document is None:
+                raise PermanentJobError('Edital não encontrado')
+            edital_content = edital_document.content
+    
+    prepared = prepare_edital(edital_content)
+    mode = resolve_analysis_mode(analysis_mode(payload), prepared['content'], payload['company_data'], prepared['screening'])
+    base = None
+    if mode == 'chunked':
+        with app.app_context():
+            base = find_base_analysis(payload['company_data'], payload.get('case_id'), payload.get('base_analysis_id'))
+    
+    report_progress(10, 'Analisando edital')
+    try:
+        result = run_edital_analysis(
+            api_key,
+            edital_content,
+            payload['company_data'],
+            mode=mode,
+            use_cache=payload.get('use_cache', True),
+            base=base,
+            prepared=prepared
+        )
+    except openai.AuthenticationError:
+        raise PermanentJobError('Erro de autenticação com OpenAI')
+    
+    document_id = analysis_id = None
+    report_progress(90, 'Salvando análise')
+    with app.app_context():
+        if result['mode'] == 'chunked':
+            analysis_id = record_edital_analysis(
+                result, payload['company_data'], payload.get('case_id'), payload.get('edital_document_id')
+            )
+        if payload.get('case_id'):
+            analysis_doc = save_analysis_document(payload['case_id'], result['analysis'])
+            document_id = analysis_doc.id if analysis_doc else None
+    
+    return {
+        'document_id': document_id,
+        'analysis_id': analysis_id,
+        'analysis': result['analysis'],
+        'tokens_used': result['tokens_used'],
+        'mode': result['mode'],
+        'incremental': result.get('incremental'),
+        'failed_sections': result.get('failed_sections', [])
+    }
+
+def run_recurso_job(app, payload, report_progress):
+    """Job de minuta de recurso: lê o caso, libera a sessão, chama o modelo e grava o documento"""
+    with app.app_context():
+        case = Case.query.get(payload['case_id'])
+        if not case:
+            raise PermanentJobError('Caso não encontrado')
+        case_snapshot = SimpleNamespace(id=case.id, title=case.title, number=case.number, organ=case.organ)
+        context = retrieve_grounding_context(f"{payload['motivo']}\n{payload['fundamentacao']}")
+    
+    report_progress(10, 'Gerando minuta do recurso')
+    try:
+        recurso_content, _ = draft_recurso(
+            case_snapshot, payload['motivo'], payload['fundamentacao'], payload.get('use_cache', True), context
+        )
+    except openai.AuthenticationError:
+        raise PermanentJobError('Erro de autenticação com OpenAI')
+    
+    report_progress(90, 'Salvando recurso')
+    with app.app_context():
+        recurso_doc = save_recurso_document(case_snapshot.id, case_snapshot.title, recurso_content)
+        return {'document_id': recurso_doc.id, 'references': summarize_references(context)}
+
+register_job_handler('analysis.edital', run_edital_job)
+register_job_handler('analysis.recurso', run_recurso_job)
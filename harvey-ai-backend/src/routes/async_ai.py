@@ -0,0 +1,366 @@
+import functools
+import json
+import os
+import time
+from datetime import datetime
+
+import anyio
+import openai
+from sqlalchemy.orm import undefer
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from src.models.case import Case
+from src.models.document import Document
+from src.routes.analysis import (
+    ANALYSIS_MAX_TOKENS, ANALYSIS_TASK, analysis_mode, build_analysis_messages, build_recurso_prompt,
+    generate_fallback_analysis, generate_fallback_recurso, prepare_edital, resolve_analysis_mode, retrieve_grounding_context,
+    single_analysis_result, summarize_references
+)
+from src.routes.chat import DEFAULT_HARVEY_PROMPT
+from src.services.async_llm import async_cached_chat_completion, async_open_routed_stream, get_async_openai_client
+from src.services.llm_cache import cache_enabled_for, get_llm_cache, make_cache_key, usage_to_dict
+from src.services.model_router import select_models
+from src.services.tokens import TokenBudgetError, prepare_chat_request, record_usage
+from src.services.vector_index import get_semantic_index
+from src.utils.async_database import async_session
+from src.utils.metrics import REQUEST_LATENCY, REQUEST_SIZE, RESPONSE_SIZE
+from src.utils.sse import SSE_HEADERS, format_sse
+
+class ForwardToFlask(Response):
+    """Repassar a requisição (corpo já lido) ao app Flask montado no ASGI.
+
+    Usado pelos recursos que só existem no modo WSGI: conversas com memória,
+    análise em trechos e jobs assíncronos.
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.background = None
+
+    async def __call__(self, scope, receive, send):
+        body = self.body
+
+        async def replay():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        await scope['app'].state.flask(scope, replay, send)
+
+def instrumented(rule):
+    """Mesmas métricas de latência e tamanho que o middleware do Flask registra"""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            started = time.perf_counter()
+            response = await handler(request)
+            if not isinstance(response, ForwardToFlask):
+                REQUEST_LATENCY.observe(
+                    time.perf_counter() - started, method=request.method, endpoint=rule, status=response.status_code
+                )
+                if request.headers.get('content-length'):
+                    REQUEST_SIZE.observe(int(request.headers['content-length']), method=request.method, endpoint=rule)
+                if response.headers.get('content-length'):
+                    RESPONSE_SIZE.observe(int(response.headers['content-length']), method=request.method, endpoint=rule)
+            return response
+        return wrapper
+    return decorator
+
+async def _read_json(request):
+    body = await request.body()
+    try:
+        return body, json.loads(body or b'{}')
+    except ValueError:
+        return body, None
+
+def _wants_event_stream(request, data):
+    return bool(data.get('stream')) or request.headers.get('accept', '').split(',')[0].strip() == 'text/event-stream'
+
+def _run_in_app_context(function, *args):
+    # Serviços síncronos (índice vetorial) precisam do app Flask e de uma sessão própria
+    from src.main import app
+    from src.models.user import db
+
+    def call():
+        with app.app_context():
+            try:
+                return function(*args)
+            finally:
+                db.session.remove()
+    return anyio.to_thread.run_sync(call)
+
+async def _save_document(**fields):
+    """Gravar um Document pela sessão assíncrona e enviá-lo ao índice vetorial"""
+    async with async_session() as session:
+        document = Document(status=fields.pop('status', 'Rascunho'), user_id=1, **fields)
+        session.add(document)
+        await session.commit()
+    # Os ouvintes do índice vetorial ficam na sessão do Flask; aqui o envio é explícito
+    get_semantic_index().submit([(document.id, document.case_id, document.document_type, document.content or '')], [])
+    return document
+
+@instrumented('/api/chat')
+async def chat(request):
+    body, data = await _read_json(request)
+    if data is None:
+        return JSONResponse({'error': 'JSON inválido'}, status_code=400)
+    if data.get('conversation_id'):
+        return ForwardToFlask(body)
+
+    message = data.get('message', '')
+    if not message:
+        return JSONResponse({'error': 'Mensagem é obrigatória'}, status_code=400)
+
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        return JSONResponse({
+            'error': 'API key não configurada',
+            'fallback_response': 'Desculpe, não consigo processar sua solicitação no momento. Por favor, configure a API key do OpenAI.'
+        }, status_code=500)
+
+    try:
+        ai_response, usage, cache_info = await async_cached_chat_completion(
+            get_async_openai_client(api_key),
+            'chat',
+            use_cache=data.get('use_cache', True),
+            task='chat',
+            model=data.get('model'),
+            messages=[
+                {"role": "system", "content": data.get('custom_prompt', DEFAULT_HARVEY_PROMPT)},
+                {"role": "user", "content": message}
+            ],
+            max_tokens=1500,
+            temperature=0.7
+        )
+    except TokenBudgetError as e:
+        return JSONResponse({
+            'error': str(e),
+            'fallback_response': 'A mensagem é longa demais para o modelo escolhido. Reduza o texto ou escolha um modelo com contexto maior.'
+        }, status_code=400)
+    except openai.AuthenticationError:
+        return JSONResponse({
+            'error': 'Erro de autenticação com OpenAI',
+            'fallback_response': 'Verifique se sua API key está correta e ativa.'
+        }, status_code=401)
+    except openai.RateLimitError:
+        return JSONResponse({
+            'error': 'Limite de requisições excedido',
+            'fallback_response': 'Muitas requisições. Tente novamente em alguns minutos.'
+        }, status_code=429)
+    except Exception as e:
+        return JSONResponse({
+            'error': f'Erro interno: {str(e)}',
+            'fallback_response': 'Ocorreu um erro inesperado. Tente novamente mais tarde.'
+        }, status_code=500)
+
+    return JSONResponse({
+        'response': ai_response,
+        'model_used': usage['model'],
+        'routing': usage.get('routing'),
+        'timestamp': datetime.utcnow().isoformat(),
+        'tokens_used': usage['total_tokens'],
+        'truncated_tokens': usage['truncated_tokens'],
+        'cache': cache_info
+    })
+
+@instrumented('/api/analysis/edital')
+async def analyze_edital(request):
+    body, data = await _read_json(request)
+    if data is None:
+        return JSONResponse({'error': 'JSON inválido'}, status_code=400)
+    if data.get('edital_document_id'):
+        async with async_session() as session:
+            edital_document = await session.get(
+                Document, data['edital_document_id'], options=[undefer(Document.content)]
+            )
+        if edital_document is None or edital_document.document_type != 'edital':
+            return JSONResponse({'error': 'Edital não encontrado'}, status_code=404)
+        data['edital_content'] = edital_document.content
+    for field in ('edital_content', 'company_data'):
+        if not data.get(field):
+            return JSONResponse({'error': f'Campo {field} é obrigatório'}, status_code=400)
+
+    company_data = data['company_data']
+    # Jobs e map-reduce em trechos (inclusive incremental) seguem pelo Flask (fila e pool de threads próprios)
+    if data.get('async'):
+        return ForwardToFlask(body)
+    # Compactação e triagem por regras fora do event loop, uma vez por requisição
+    prepared = await anyio.to_thread.run_sync(prepare_edital, data['edital_content'])
+    edital_content, screening = prepared['content'], prepared['screening']
+    if resolve_analysis_mode(analysis_mode(data), edital_content, company_data, screening) != 'single':
+        return ForwardToFlask(body)
+
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        return JSONResponse({
+            'error': 'API key não configurada',
+            'fallback_analysis': generate_fallback_analysis(data['edital_content'], company_data, screening)
+        }, status_code=500)
+
+    case_id = data.get('case_id')
+    case = None
+    if case_id:
+        async with async_session() as session:
+            case = await session.get(Case, case_id)
+
+    client = get_async_openai_client(api_key)
+    params = {
+        'messages': build_analysis_messages(edital_content, company_data, screening),
+        'max_tokens': ANALYSIS_MAX_TOKENS,
+        'temperature': 0.3
+    }
+    if _wants_event_stream(request, data):
+        return StreamingResponse(
+            _stream_edital_analysis(client, params, data, case, screening), media_type='text/event-stream', headers=SSE_HEADERS
+        )
+
+    try:
+        analysis_result, usage, cache_info = await async_cached_chat_completion(
+            client, 'analysis.edital', use_cache=data.get('use_cache', True), task=ANALYSIS_TASK, **params
+        )
+        if case is not None:
+            await _save_document(
+                title=f'Análise de Edital - {case.title}', content=analysis_result,
+                document_type='analise', status='Finalizado', case_id=case.id
+            )
+    except openai.AuthenticationError:
+        return JSONResponse({
+            'error': 'Erro de autenticação com OpenAI',
+            'fallback_analysis': generate_fallback_analysis(data['edital_content'], company_data, screening)
+        }, status_code=401)
+    except Exception as e:
+        return JSONResponse({
+            'error': f'Erro na análise: {str(e)}',
+            'fallback_analysis': generate_fallback_analysis(data['edital_content'], company_data, screening)
+        }, status_code=500)
+
+    return JSONResponse({
+        **single_analysis_result('single', analysis_result, usage, cache_info, prepared['compaction'], screening),
+        'timestamp': datetime.utcnow().isoformat(),
+        'saved_to_case': case_id is not None
+    })
+
+async def _stream_edital_analysis(client, request_params, data, case, screening=None):
+    """Eventos SSE da análise, no mesmo formato da rota Flask"""
+    yield format_sse({'status': 'started'}, event='start')
+
+    # Cache consultado com o modelo que o roteamento chamaria primeiro
+    model = select_models(ANALYSIS_TASK, request_params['messages'], ANALYSIS_MAX_TOKENS)[0]
+    params, budget = prepare_chat_request('analysis.edital', {**request_params, 'model': model})
+    cache = get_llm_cache() if cache_enabled_for('analysis.edital', data.get('use_cache', True)) else None
+    cached = cache.get(make_cache_key(params['model'], params['messages'], params['temperature'], params['max_tokens'])) if cache else None
+    cache_info = {'enabled': cache is not None, 'hit': cached is not None}
+
+    parts = []
+    usage = usage_to_dict(None)
+    try:
+        if cached is not None:
+            cache_info.update(cache.record('analysis.edital', hit=True))
+            parts.append(cached['content'])
+            yield format_sse({'content': cached['content']}, event='token')
+        else:
+            stream, params, budget = await async_open_routed_stream(client, 'analysis.edital', ANALYSIS_TASK, **request_params)
+            async with stream:
+                async for chunk in stream:
+                    if chunk.usage:
+                        usage = usage_to_dict(chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield format_sse({'content': chunk.choices[0].delta.content}, event='token')
+    except Exception as e:
+        error = 'Erro de autenticação com OpenAI' if isinstance(e, openai.AuthenticationError) else f'Erro na análise: {str(e)}'
+        yield format_sse({
+            'error': error,
+            'fallback_analysis': generate_fallback_analysis(data['edital_content'], data['company_data'], screening)
+        }, event='error')
+        return
+
+    analysis_result = ''.join(parts)
+    record_usage('analysis.edital', budget, usage, cached=cached is not None)
+    if cache is not None and cached is None:
+        cache.set(
+            make_cache_key(params['model'], params['messages'], params['temperature'], params['max_tokens']),
+            'analysis.edital', params['model'], analysis_result, usage['total_tokens']
+        )
+        cache_info.update(cache.record('analysis.edital', hit=False))
+
+    document_id = None
+    if case is not None:
+        try:
+            document = await _save_document(
+                title=f'Análise de Edital - {case.title}', content=analysis_result,
+                document_type='analise', status='Finalizado', case_id=case.id
+            )
+            document_id = document.id
+        except Exception as e:
+            yield format_sse({'error': f'Erro ao salvar análise: {str(e)}'}, event='error')
+            return
+
+    yield format_sse({
+        'analysis': analysis_result,
+        'model_used': params['model'],
+        'timestamp': datetime.utcnow().isoformat(),
+        'tokens_used': usage['total_tokens'],
+        'saved_to_case': data.get('case_id') is not None,
+        'document_id': document_id,
+        'cache': cache_info
+    }, event='done')
+
+@instrumented('/api/analysis/recurso')
+async def generate_recurso(request):
+    body, data = await _read_json(request)
+    if data is None:
+        return JSONResponse({'error': 'JSON inválido'}, status_code=400)
+    for field in ('motivo', 'fundamentacao', 'case_id'):
+        if not data.get(field):
+            return JSONResponse({'error': f'Campo {field} é obrigatório'}, status_code=400)
+    if data.get('async'):
+        return ForwardToFlask(body)
+
+    motivo = data['motivo']
+    fundamentacao = data['fundamentacao']
+    try:
+        async with async_session() as session:
+            case = await session.get(Case, data['case_id'])
+        if not case:
+            return JSONResponse({'error': 'Caso não encontrado'}, status_code=404)
+
+        # Busca vetorial é síncrona (numpy + banco): roda no pool de threads
+        context = []
+        if data.get('use_context', True):
+            context = await _run_in_app_context(retrieve_grounding_context, f'{motivo}\n{fundamentacao}')
+
+        api_key = os.getenv('OPENAI_API_KEY')
+        if api_key:
+            recurso_content, _, cache_info = await async_cached_chat_completion(
+                get_async_openai_client(api_key),
+                'analysis.recurso',
+                use_cache=data.get('use_cache', True),
+                task='recurso',
+                messages=[{"role": "user", "content": build_recurso_prompt(case, motivo, fundamentacao, context)}],
+                max_tokens=2000,
+                temperature=0.3
+            )
+        else:
+            recurso_content, cache_info = generate_fallback_recurso(motivo, fundamentacao, case), {'enabled': False, 'hit': False}
+
+        recurso_doc = await _save_document(
+            title=f'Recurso Administrativo - {case.title}', content=recurso_content,
+            document_type='recurso', case_id=case.id
+        )
+    except Exception as e:
+        return JSONResponse({'error': f'Erro ao gerar recurso: {str(e)}'}, status_code=500)
+
+    return JSONResponse({
+        'message': 'Recurso gerado com sucesso',
+        'recurso': recurso_doc.to_dict(),
+        'content': recurso_content,
+        'cache': cache_info,
+        'references': summarize_references(context)
+    })
+
+# Rotas atendidas diretamente pelo event loop; as demais vão para o Flask
+ASYNC_ROUTES = [
+    Route('/api/chat', chat, methods=['POST']),
+    Route('/api/analysis/edital', analyze_edital, methods=['POST']),
+    Route('/api/analysis/recurso', generate_recurso, methods=['POST'])
+]
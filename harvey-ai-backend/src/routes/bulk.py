@@ -0,0 +1,90 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from src.models.user import db
+from src.services.bulk import (
+    BATCH_SIZE, CONFLICT_MODES, FORMATS, MAX_BATCH_SIZE,
+    export_cases, import_cases, import_documents, read_records
+)
+
+bulk_bp = Blueprint('bulk', __name__)
+
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+def _request_format():
+    """Formato do corpo: ?format= ou Content-Type (text/csv); NDJSON por padrão"""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt
+    return 'csv' if request.mimetype == 'text/csv' else 'ndjson'
+
+def _import_options():
+    fmt = _request_format()
+    if fmt not in FORMATS:
+        raise ValueError(f"format deve ser um de: {', '.join(FORMATS)}")
+    batch_size = int(request.args.get('batch_size', BATCH_SIZE))
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise ValueError(f'batch_size deve estar entre 1 e {MAX_BATCH_SIZE}')
+    return fmt, batch_size, request.args.get('dry_run', 'false').lower() == 'true'
+
+@bulk_bp.route('/bulk/cases', methods=['POST'])
+def bulk_import_cases():
+    """Importar casos em lote a partir de NDJSON (com documentos aninhados) ou CSV"""
+    try:
+        try:
+            fmt, batch_size, dry_run = _import_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        on_conflict = request.args.get('on_conflict', 'error')
+        if on_conflict not in CONFLICT_MODES:
+            return jsonify({'error': f"on_conflict deve ser um de: {', '.join(CONFLICT_MODES)}"}), 400
+        
+        report = import_cases(
+            read_records(request.stream, fmt),
+            batch_size=batch_size,
+            on_conflict=on_conflict,
+            dry_run=dry_run
+        )
+        return jsonify({'message': 'Importação de casos concluída', 'report': report})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro na importação de casos: {str(e)}'}), 500
+
+@bulk_bp.route('/bulk/documents', methods=['POST'])
+def bulk_import_documents():
+    """Importar documentos em lote (cada linha com case_id ou case_number)"""
+    try:
+        try:
+            fmt, batch_size, dry_run = _import_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        report = import_documents(read_records(request.stream, fmt), batch_size=batch_size, dry_run=dry_run)
+        return jsonify({'message': 'Importação de documentos concluída', 'report': report})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro na importação de documentos: {str(e)}'}), 500
+
+@bulk_bp.route('/bulk/cases/export', methods=['GET'])
+def bulk_export_cases():
+    """Exportar casos em streaming: NDJSON com documentos ou CSV só com os casos"""
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in FORMATS:
+            return jsonify({'error': f"format deve ser um de: {', '.join(FORMATS)}"}), 400
+        
+        generator = export_cases(
+            fmt=fmt,
+            include_documents=request.args.get('include_documents', 'true').lower() == 'true',
+            include_content=request.args.get('include_content', 'true').lower() == 'true',
+            status=request.args.get('status')
+        )
+        return Response(
+            stream_with_context(generator),
+            mimetype=MIMETYPES[fmt],
+            headers={'Content-Disposition': f'attachment; filename=casos.{fmt}'}
+        )
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro na exportação de casos: {str(e)}'}), 500
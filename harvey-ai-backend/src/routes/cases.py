@@ -1,12 +1,18 @@
 from flask import Blueprint, request, jsonify
 from src.models.case import Case
 from src.models.user import db
+from src.models.case_counter import live_case_breakdown, read_case_counters, rebuild_case_counters, recent_days_start
 from datetime import datetime
 from sqlalchemy import or_
+from src.services import search_index
+from src.utils.serialization import load_only_fields, parse_fields, serialize_cases
+from src.utils.pagination import COUNT_MODES, encode_cursor, keyset_paginate, wants_keyset
+from src.utils.http_cache import cached_json
 
 cases_bp = Blueprint('cases', __name__)
 
 @cases_bp.route('/cases', methods=['GET'])
+@cached_json(tables=('cases', 'documents'))
 def get_cases():
     """Listar todos os casos com filtros opcionais"""
     try:
@@ -17,8 +23,16 @@ def get_cases():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
         
+        try:
+            fields = parse_fields(request.args.get('fields'), Case.SERIALIZABLE_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Construir query
         query = Case.query
+        if fields:
+            # created_at sempre carregado: compõe o cursor da próxima página
+            query = query.options(load_only_fields(Case, fields + ['created_at']))
         
         if status:
             query = query.filter(Case.status == status)
@@ -27,17 +41,31 @@ def get_cases():
             query = query.filter(Case.priority == priority)
         
         if search:
-            query = query.filter(
-                or_(
-                    Case.title.contains(search),
-                    Case.number.contains(search),
-                    Case.organ.contains(search),
-                    Case.description.contains(search)
+            query = filter_by_search_term(query, search)
+        
+        if wants_keyset(request.args):
+            # Paginação por cursor (created_at, id): custo constante em qualquer página
+            count = request.args.get('count', 'none')
+            if count not in COUNT_MODES:
+                return jsonify({'error': f"count deve ser um de: {', '.join(COUNT_MODES)}"}), 400
+            try:
+                items, pagination = keyset_paginate(
+                    query, Case,
+                    cursor=request.args.get('cursor') or None,
+                    per_page=per_page,
+                    count=count,
+                    filtered=bool(status or priority or search)
                 )
-            )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'cases': serialize_cases(items, fields),
+                'pagination': pagination
+            })
         
         # Ordenar por data de criação (mais recentes primeiro)
-        query = query.order_by(Case.created_at.desc())
+        query = query.order_by(Case.created_at.desc(), Case.id.desc())
         
         # Paginação
         paginated = query.paginate(
@@ -46,7 +74,8 @@ def get_cases():
             error_out=False
         )
         
-        cases = [case.to_dict() for case in paginated.items]
+        # Contagem de documentos da página inteira em uma só consulta
+        cases = serialize_cases(paginated.items, fields)
         
         return jsonify({
             'cases': cases,
@@ -56,7 +85,9 @@ def get_cases():
                 'total': paginated.total,
                 'pages': paginated.pages,
                 'has_next': paginated.has_next,
-                'has_prev': paginated.has_prev
+                'has_prev': paginated.has_prev,
+                # Permite seguir as próximas páginas por cursor a partir desta
+                'next_cursor': encode_cursor(paginated.items[-1]) if paginated.has_next else None
             }
         })
         
@@ -108,6 +139,7 @@ def create_case():
         return jsonify({'error': f'Erro ao criar caso: {str(e)}'}), 500
 
 @cases_bp.route('/cases/<int:case_id>', methods=['GET'])
+@cached_json(entity=('cases', 'case_id'))
 def get_case(case_id):
     """Obter um caso específico"""
     try:
@@ -167,36 +199,52 @@ def delete_case(case_id):
 def get_cases_stats():
     """Obter estatísticas dos casos"""
     try:
-        total_cases = Case.query.count()
-        active_cases = Case.query.filter_by(status='Em Andamento').count()
-        completed_cases = Case.query.filter_by(status='Concluído').count()
-        analysis_cases = Case.query.filter_by(status='Em Análise').count()
-        
-        # Estatísticas por prioridade
-        high_priority = Case.query.filter_by(priority='Alta').count()
-        medium_priority = Case.query.filter_by(priority='Média').count()
-        low_priority = Case.query.filter_by(priority='Baixa').count()
+        if request.args.get('source') == 'live':
+            # Agregação direto na tabela de casos (conferência dos contadores)
+            breakdown, recent_cases = live_case_breakdown(datetime.fromisoformat(recent_days_start()))
+        else:
+            # Contadores materializados: leitura de poucas linhas por requisição, recentes por dia de criação
+            breakdown, recent_cases = read_case_counters()
         
-        # Casos recentes (últimos 30 dias)
-        from datetime import timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_cases = Case.query.filter(Case.created_at >= thirty_days_ago).count()
+        by_status = breakdown['status']
+        by_priority = breakdown['priority']
+        total_cases = breakdown['total'].get('', 0)
+        completed_cases = by_status.get('Concluído', 0)
         
         return jsonify({
             'total_cases': total_cases,
-            'active_cases': active_cases,
+            'active_cases': by_status.get('Em Andamento', 0),
             'completed_cases': completed_cases,
-            'analysis_cases': analysis_cases,
-            'high_priority': high_priority,
-            'medium_priority': medium_priority,
-            'low_priority': low_priority,
+            'analysis_cases': by_status.get('Em Análise', 0),
+            'high_priority': by_priority.get('Alta', 0),
+            'medium_priority': by_priority.get('Média', 0),
+            'low_priority': by_priority.get('Baixa', 0),
             'recent_cases': recent_cases,
-            'success_rate': round((completed_cases / total_cases * 100) if total_cases > 0 else 0, 1)
+            'success_rate': round((completed_cases / total_cases * 100) if total_cases > 0 else 0, 1),
+            'by_status': by_status,
+            'by_priority': by_priority,
+            'by_organ': _labelled(breakdown['organ']),
+            'by_modality': _labelled(breakdown['modality']),
+            'by_value_range': breakdown['value_range']
         })
         
     except Exception as e:
         return jsonify({'error': f'Erro ao obter estatísticas: {str(e)}'}), 500
 
+@cases_bp.route('/cases/stats/rebuild', methods=['POST'])
+def rebuild_cases_stats():
+    """Recalcular os contadores materializados a partir da tabela de casos"""
+    try:
+        rebuild_case_counters()
+        return jsonify({'message': 'Estatísticas recalculadas com sucesso'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao recalcular estatísticas: {str(e)}'}), 500
+
+def _labelled(counts):
+    # Órgão/modalidade em branco aparecem como "Não informado"
+    return {(value or 'Não informado'): count for value, count in counts.items()}
+
 @cases_bp.route('/cases/search', methods=['GET'])
 def search_cases():
     """Buscar casos por termo"""
@@ -205,24 +253,43 @@ def search_cases():
         if not query_term:
             return jsonify({'error': 'Termo de busca é obrigatório'}), 400
         
-        cases = Case.query.filter(
-            or_(
-                Case.title.contains(query_term),
-                Case.number.contains(query_term),
-                Case.organ.contains(query_term),
-                Case.description.contains(query_term)
-            )
-        ).order_by(Case.created_at.desc()).limit(20).all()
+        limit = min(int(request.args.get('limit', 20)), 100)
+        
+        if search_index.is_available():
+            # Índice FTS5: resultados ordenados por relevância (BM25)
+            hits = search_index.search_cases(db, query_term, limit=limit)
+            cases_by_id = {case.id: case for case in Case.query.filter(Case.id.in_([hit['id'] for hit in hits])).all()}
+            cases = [cases_by_id[hit['id']] for hit in hits if hit['id'] in cases_by_id]
+        else:
+            cases = filter_by_search_term(Case.query, query_term).order_by(Case.created_at.desc()).limit(limit).all()
         
         return jsonify({
-            'cases': [case.to_dict() for case in cases],
+            'cases': serialize_cases(cases),
             'count': len(cases)
         })
         
     except Exception as e:
         return jsonify({'error': f'Erro na busca: {str(e)}'}), 500
 
+def filter_by_search_term(query, term):
+    """Filtrar casos pelo termo usando o índice FTS5 ou, sem ele, LIKE nas colunas de texto"""
+    if search_index.is_available():
+        matching_ids = search_index.matching_case_ids(term)
+        if matching_ids is None:
+            return query
+        return query.filter(Case.id.in_(matching_ids))
+    
+    return query.filter(
+        or_(
+            Case.title.contains(term),
+            Case.number.contains(term),
+            Case.organ.contains(term),
+            Case.description.contains(term)
+        )
+    )
+
 @cases_bp.route('/cases/options', methods=['GET'])
+@cached_json(cache_control='public, max-age=3600')
 def get_case_options():
     """Obter opções para formulários de casos"""
     return jsonify({
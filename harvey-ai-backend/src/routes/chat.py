@@ -2,6 +2,13 @@ from flask import Blueprint, request, jsonify
 import openai
 import os
 from datetime import datetime
+from src.models.conversation import Conversation
+from src.services.conversation_memory import prepare_conversation_turn, save_conversation_turn
+from src.services.llm_cache import cached_chat_completion
+from src.services.openai_client import create_chat_completion, get_client_metrics, get_openai_client, temporary_openai_client
+from src.services.model_catalog import AVAILABLE_MODELS
+from src.services.model_router import get_routing_stats
+from src.services.tokens import TokenBudgetError, get_token_stats
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -29,12 +36,25 @@ def chat_with_ai():
     try:
         data = request.get_json()
         message = data.get('message', '')
-        model = data.get('model', 'gpt-3.5-turbo')
-        custom_prompt = data.get('custom_prompt', DEFAULT_HARVEY_PROMPT)
         
         if not message:
             return jsonify({'error': 'Mensagem é obrigatória'}), 400
         
+        # Com conversation_id, o histórico fica no servidor (janela recente + resumo)
+        conversation = None
+        if data.get('conversation_id'):
+            conversation = Conversation.query.get(data['conversation_id'])
+            if not conversation:
+                return jsonify({'error': 'Conversa não encontrada'}), 404
+        
+        # Modelo informado é a preferência; sem ele, o roteamento escolhe pelo tamanho da entrada
+        if conversation:
+            model = data.get('model', conversation.model)
+            custom_prompt = data.get('custom_prompt', conversation.system_prompt or DEFAULT_HARVEY_PROMPT)
+        else:
+            model = data.get('model')
+            custom_prompt = data.get('custom_prompt', DEFAULT_HARVEY_PROMPT)
+        
         # Verificar se a API key está configurada
         api_key = os.getenv('OPENAI_API_KEY')
         if not api_key:
@@ -43,31 +63,54 @@ def chat_with_ai():
                 'fallback_response': 'Desculpe, não consigo processar sua solicitação no momento. Por favor, configure a API key do OpenAI.'
             }), 500
         
-        # Configurar cliente OpenAI
-        client = openai.OpenAI(api_key=api_key)
+        # Cliente compartilhado (pool de conexões keep-alive)
+        client = get_openai_client(api_key)
         
         # Preparar mensagens para a API
-        messages = [
-            {"role": "system", "content": custom_prompt},
-            {"role": "user", "content": message}
-        ]
-        
-        # Fazer chamada para a API
-        response = client.chat.completions.create(
+        memory = None
+        if conversation:
+            messages, memory = prepare_conversation_turn(
+                client, conversation, custom_prompt, message, use_cache=data.get('use_cache', True)
+            )
+        else:
+            messages = [
+                {"role": "system", "content": custom_prompt},
+                {"role": "user", "content": message}
+            ]
+        
+        # Fazer chamada para a API (respostas repetidas vêm do cache)
+        ai_response, usage, cache_info = cached_chat_completion(
+            client,
+            'chat',
+            use_cache=data.get('use_cache', True),
+            task='chat',
             model=model,
             messages=messages,
             max_tokens=1500,
             temperature=0.7
         )
         
-        ai_response = response.choices[0].message.content
-        
-        return jsonify({
+        result = {
             'response': ai_response,
-            'model_used': model,
+            'model_used': usage['model'],
+            'routing': usage.get('routing'),
             'timestamp': datetime.utcnow().isoformat(),
-            'tokens_used': response.usage.total_tokens if response.usage else 0
-        })
+            'tokens_used': usage['total_tokens'],
+            'truncated_tokens': usage['truncated_tokens'],
+            'cache': cache_info
+        }
+        if conversation:
+            save_conversation_turn(conversation, message, ai_response, usage['model'])
+            result['conversation_id'] = conversation.id
+            result['memory'] = memory
+        
+        return jsonify(result)
+        
+    except TokenBudgetError as e:
+        return jsonify({
+            'error': str(e),
+            'fallback_response': 'A mensagem é longa demais para o modelo escolhido. Reduza o texto ou escolha um modelo com contexto maior.'
+        }), 400
         
     except openai.AuthenticationError:
         return jsonify({
@@ -90,25 +133,7 @@ def chat_with_ai():
 @chat_bp.route('/chat/models', methods=['GET'])
 def get_available_models():
     """Retorna lista de modelos disponíveis"""
-    models = [
-        {
-            'id': 'gpt-4',
-            'name': 'GPT-4',
-            'description': 'Modelo mais avançado, melhor para análises complexas'
-        },
-        {
-            'id': 'gpt-4-turbo',
-            'name': 'GPT-4 Turbo',
-            'description': 'Versão otimizada do GPT-4, mais rápida'
-        },
-        {
-            'id': 'gpt-3.5-turbo',
-            'name': 'GPT-3.5 Turbo',
-            'description': 'Modelo rápido e eficiente para uso geral'
-        }
-    ]
-    
-    return jsonify({'models': models})
+    return jsonify({'models': AVAILABLE_MODELS})
 
 @chat_bp.route('/chat/validate-key', methods=['POST'])
 def validate_api_key():
@@ -120,14 +145,16 @@ def validate_api_key():
         if not api_key:
             return jsonify({'valid': False, 'error': 'API key não fornecida'}), 400
         
-        # Testar a API key fazendo uma requisição simples
-        client = openai.OpenAI(api_key=api_key)
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": "Teste"}],
-            max_tokens=5
-        )
+        # Testar a API key fazendo uma requisição simples, com um cliente que não entra no registro
+        # compartilhado (chaves de teste não podem tirar de lá o cliente do servidor)
+        with temporary_openai_client(api_key) as client:
+            create_chat_completion(
+                client,
+                max_retries=0,
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": "Teste"}],
+                max_tokens=5
+            )
         
         return jsonify({'valid': True, 'message': 'API key válida'})
         
@@ -136,6 +163,21 @@ def validate_api_key():
     except Exception as e:
         return jsonify({'valid': False, 'error': f'Erro ao validar: {str(e)}'}), 500
 
+@chat_bp.route('/chat/client-stats', methods=['GET'])
+def get_openai_client_stats():
+    """Métricas de reutilização do pool de conexões com a OpenAI"""
+    return jsonify(get_client_metrics())
+
+@chat_bp.route('/chat/token-stats', methods=['GET'])
+def get_chat_token_stats():
+    """Tokens de entrada e saída por rota, com cortes e recusas do orçamento"""
+    return jsonify(get_token_stats())
+
+@chat_bp.route('/chat/routing-stats', methods=['GET'])
+def get_chat_routing_stats():
+    """Roteamento de modelos: candidatos por tarefa, failovers, hedges e latência p50/p95"""
+    return jsonify(get_routing_stats())
+
 @chat_bp.route('/chat/prompt', methods=['GET', 'POST'])
 def manage_prompt():
     """Gerenciar prompt personalizado do Harvey"""
@@ -0,0 +1,78 @@
+from flask import Blueprint, request, jsonify
+from src.models.case import Case
+from src.models.conversation import Conversation, ConversationMessage
+from src.models.user import db
+
+conversations_bp = Blueprint('conversations', __name__)
+
+@conversations_bp.route('/conversations', methods=['GET'])
+def list_conversations():
+    """Listar conversas, mais recentes primeiro (opcionalmente de um caso)"""
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+        query = Conversation.query
+        if request.args.get('case_id'):
+            query = query.filter(Conversation.case_id == int(request.args['case_id']))
+        
+        conversations = query.order_by(Conversation.updated_at.desc()).limit(limit).all()
+        return jsonify({'conversations': [conversation.to_dict() for conversation in conversations]})
+    except Exception as e:
+        return jsonify({'error': f'Erro ao listar conversas: {str(e)}'}), 500
+
+@conversations_bp.route('/conversations', methods=['POST'])
+def create_conversation():
+    """Criar uma conversa com memória; as mensagens são enviadas por POST /chat com conversation_id"""
+    try:
+        data = request.get_json() or {}
+        
+        case_id = data.get('case_id')
+        if case_id and not Case.query.get(case_id):
+            return jsonify({'error': 'Caso não encontrado'}), 404
+        
+        conversation = Conversation(
+            title=data.get('title') or 'Nova conversa',
+            model=data.get('model', 'gpt-3.5-turbo'),
+            system_prompt=data.get('system_prompt'),
+            case_id=case_id,
+            user_id=data.get('user_id', 1)  # Por enquanto, usuário padrão
+        )
+        db.session.add(conversation)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Conversa criada com sucesso',
+            'conversation': conversation.to_dict()
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao criar conversa: {str(e)}'}), 500
+
+@conversations_bp.route('/conversations/<int:conversation_id>', methods=['GET'])
+def get_conversation(conversation_id):
+    """Obter a conversa com as mensagens mais recentes (?limit=, padrão 50)"""
+    try:
+        conversation = Conversation.query.get_or_404(conversation_id)
+        limit = min(int(request.args.get('limit', 50)), 500)
+        
+        messages = (
+            conversation.messages.order_by(None).order_by(ConversationMessage.id.desc())
+            .limit(limit).all()[::-1]
+        )
+        return jsonify({
+            'conversation': conversation.to_dict(),
+            'messages': [message.to_dict() for message in messages]
+        })
+    except Exception as e:
+        return jsonify({'error': f'Erro ao buscar conversa: {str(e)}'}), 500
+
+@conversations_bp.route('/conversations/<int:conversation_id>', methods=['DELETE'])
+def delete_conversation(conversation_id):
+    """Deletar uma conversa e suas mensagens"""
+    try:
+        conversation = Conversation.query.get_or_404(conversation_id)
+        db.session.delete(conversation)
+        db.session.commit()
+        return jsonify({'message': 'Conversa deletada com sucesso'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao deletar conversa: {str(e)}'}), 500
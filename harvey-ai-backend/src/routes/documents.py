@@ -1,14 +1,29 @@
-from flask import Blueprint, request, jsonify
-from src.models.document import Document
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from werkzeug.formparser import parse_form_data
+from src.models.document import Document, content_metadata
 from src.models.case import Case
 from src.models.user import db
 from datetime import datetime
 import os
 import json
+from sqlalchemy.orm import load_only
+from src.services.edital_ingest import (
+    UPLOAD_MAX_BYTES, ExtractionError, discard_upload, file_kind, run_extraction, store_upload, upload_stream_factory
+)
+from src.utils.serialization import load_only_fields, parse_fields
+from src.utils.pagination import COUNT_MODES, encode_cursor, keyset_paginate, wants_keyset
+from src.utils.http_cache import cached_json
+from src.services.job_queue import PermanentJobError, register_job_handler
+from src.services.reports import REPORT_FORMATS, REPORT_TEMPLATES, TEXT_FORMATS, build_report, render_report
+from src.routes.jobs import enqueue_job
 
 documents_bp = Blueprint('documents', __name__)
 
+# Bytes por bloco em /documents/<id>/content
+CONTENT_CHUNK_BYTES = 64 * 1024
+
 @documents_bp.route('/documents', methods=['GET'])
+@cached_json(tables=('documents',))
 def get_documents():
     """Listar documentos com filtros opcionais"""
     try:
@@ -18,7 +33,17 @@ def get_documents():
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
         
-        query = Document.query
+        try:
+            fields = parse_fields(request.args.get('fields'), Document.SERIALIZABLE_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Listagens trazem só metadados (com content_size/content_hash); o texto
+        # vem de /documents/<id>/content ou de ?fields=...,content explícito
+        fields = fields or Document.SUMMARY_FIELDS
+        
+        # created_at sempre carregado: compõe o cursor da próxima página
+        query = Document.query.options(load_only_fields(Document, fields + ['created_at']))
         
         if case_id:
             query = query.filter(Document.case_id == case_id)
@@ -29,7 +54,28 @@ def get_documents():
         if status:
             query = query.filter(Document.status == status)
         
-        query = query.order_by(Document.created_at.desc())
+        if wants_keyset(request.args):
+            # Paginação por cursor (created_at, id): custo constante em qualquer página
+            count = request.args.get('count', 'none')
+            if count not in COUNT_MODES:
+                return jsonify({'error': f"count deve ser um de: {', '.join(COUNT_MODES)}"}), 400
+            try:
+                items, pagination = keyset_paginate(
+                    query, Document,
+                    cursor=request.args.get('cursor') or None,
+                    per_page=per_page,
+                    count=count,
+                    filtered=bool(case_id or document_type or status)
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            return jsonify({
+                'documents': [doc.to_dict(fields=fields) for doc in items],
+                'pagination': pagination
+            })
+        
+        query = query.order_by(Document.created_at.desc(), Document.id.desc())
         
         paginated = query.paginate(
             page=page,
@@ -37,7 +83,7 @@ def get_documents():
             error_out=False
         )
         
-        documents = [doc.to_dict() for doc in paginated.items]
+        documents = [doc.to_dict(fields=fields) for doc in paginated.items]
         
         return jsonify({
             'documents': documents,
@@ -47,7 +93,9 @@ def get_documents():
                 'total': paginated.total,
                 'pages': paginated.pages,
                 'has_next': paginated.has_next,
-                'has_prev': paginated.has_prev
+                'has_prev': paginated.has_prev,
+                # Permite seguir as próximas páginas por cursor a partir desta
+                'next_cursor': encode_cursor(paginated.items[-1]) if paginated.has_next else None
             }
         })
         
@@ -86,22 +134,109 @@ def create_document():
         
         return jsonify({
             'message': 'Documento criado com sucesso',
-            'document': new_document.to_dict()
+            'document': new_document.to_dict(include_content=True)
         }), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Erro ao criar documento: {str(e)}'}), 500
 
+@documents_bp.route('/documents/upload', methods=['POST'])
+def upload_document():
+    """Receber um edital (PDF, DOCX ou TXT) em multipart e extrair o texto na fila de jobs"""
+    try:
+        if request.content_length and request.content_length > UPLOAD_MAX_BYTES:
+            return jsonify({'error': f'Arquivo excede {UPLOAD_MAX_BYTES // (1024 * 1024)} MB'}), 413
+        
+        # O corpo é lido em blocos e cada arquivo vai direto para o disco
+        _, form, files = parse_form_data(
+            request.environ, stream_factory=upload_stream_factory, max_content_length=UPLOAD_MAX_BYTES
+        )
+        upload = files.get('file')
+        for _, storage in files.items(multi=True):
+            if storage is not upload:
+                discard_upload(storage.stream)
+        
+        def reject(message, status):
+            if upload is not None:
+                discard_upload(upload.stream)
+            return jsonify({'error': message}), status
+        
+        if upload is None or not upload.filename:
+            return reject('Arquivo é obrigatório (campo file)', 400)
+        
+        kind = file_kind(upload.filename)
+        if kind is None:
+            return reject('Formato não suportado. Envie PDF, DOCX ou TXT', 400)
+        
+        case_id = form.get('case_id') or request.args.get('case_id')
+        if not case_id:
+            return reject('Campo case_id é obrigatório', 400)
+        if not Case.query.get(case_id):
+            return reject('Caso não encontrado', 404)
+        
+        # Mesmo arquivo no mesmo caso cai no mesmo job (chave de idempotência do payload)
+        return enqueue_job('documents.ingest', {
+            'path': store_upload(upload.stream, kind),
+            'kind': kind,
+            'case_id': int(case_id),
+            'title': form.get('title') or os.path.splitext(os.path.basename(upload.filename))[0]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro ao receber arquivo: {str(e)}'}), 500
+
 @documents_bp.route('/documents/<int:document_id>', methods=['GET'])
+@cached_json(entity=('documents', 'document_id'))
 def get_document(document_id):
     """Obter um documento específico"""
     try:
         document = Document.query.get_or_404(document_id)
-        return jsonify({'document': document.to_dict()})
+        return jsonify({'document': document.to_dict(include_content=True)})
     except Exception as e:
         return jsonify({'error': f'Erro ao buscar documento: {str(e)}'}), 500
 
+@documents_bp.route('/documents/<int:document_id>/content', methods=['GET'])
+def get_document_content(document_id):
+    """Transmitir o texto de um documento em blocos, sem montá-lo inteiro na resposta"""
+    try:
+        document = Document.query.options(
+            load_only(Document.id, Document.title, Document.content_size, Document.content_hash)
+        ).get_or_404(document_id)
+        
+        etag = document.content_hash
+        if etag and etag in request.if_none_match:
+            return Response(status=304, headers={'ETag': f'"{etag}"'})
+        
+        def generate():
+            if not document.content_size:
+                return
+            if db.engine.dialect.name == 'sqlite':
+                # Leitura incremental do BLOB: um bloco por vez, sem reler o início a cada bloco
+                connection = db.session.connection().connection.driver_connection
+                with connection.blobopen('documents', 'content', document_id, readonly=True) as blob:
+                    while chunk := blob.read(CONTENT_CHUNK_BYTES):
+                        yield chunk
+                return
+            content = db.session.query(Document.content).filter(Document.id == document_id).scalar() or ''
+            raw = content.encode('utf-8')
+            for start in range(0, len(raw), CONTENT_CHUNK_BYTES):
+                yield raw[start:start + CONTENT_CHUNK_BYTES]
+        
+        headers = {}
+        if etag:
+            headers['ETag'] = f'"{etag}"'
+        if document.content_size is not None:
+            headers['Content-Length'] = str(document.content_size)
+        
+        return Response(
+            stream_with_context(generate()),
+            content_type='text/plain; charset=utf-8',
+            headers=headers
+        )
+    except Exception as e:
+        return jsonify({'error': f'Erro ao buscar conteúdo do documento: {str(e)}'}), 500
+
 @documents_bp.route('/documents/<int:document_id>', methods=['PUT'])
 def update_document(document_id):
     """Atualizar um documento"""
@@ -121,7 +256,7 @@ def update_document(document_id):
         
         return jsonify({
             'message': 'Documento atualizado com sucesso',
-            'document': document.to_dict()
+            'document': document.to_dict(include_content=True)
         })
         
     except Exception as e:
@@ -217,67 +352,155 @@ def generate_report():
     try:
         data = request.get_json()
         case_id = data.get('case_id')
-        report_type = data.get('report_type', 'summary')
+        report_type = data.get('template', data.get('report_type', 'summary'))
+        report_format = data.get('format', 'markdown')
         
-        if case_id:
-            case = Case.query.get(case_id)
-            if not case:
-                return jsonify({'error': 'Caso não encontrado'}), 404
-            
-            documents = Document.query.filter_by(case_id=case_id).all()
-            
-            # Gerar conteúdo do relatório
-            report_content = f"""
-# Relatório do Caso: {case.title}
+        if not case_id:
+            return jsonify({'error': 'case_id é obrigatório'}), 400
+        
+        if report_type not in REPORT_TEMPLATES:
+            return jsonify({'error': f"Modelo de relatório inválido. Use: {', '.join(REPORT_TEMPLATES)}"}), 400
+        
+        if report_format not in TEXT_FORMATS:
+            return jsonify({'error': f"Formato inválido. Use: {', '.join(TEXT_FORMATS)} (DOCX em GET /documents/report/<case_id>)"}), 400
+        
+        case = Case.query.get(case_id)
+        if not case:
+            return jsonify({'error': 'Caso não encontrado'}), 404
+        
+        # Casos com muitos documentos: o relatório é gerado na fila de jobs
+        if data.get('async'):
+            return enqueue_job('reports.generate', {
+                'case_id': case_id,
+                'template': report_type,
+                'format': report_format
+            })
+        
+        report_doc = save_report_document(case, report_type, report_format)
+        
+        return jsonify({
+            'message': 'Relatório gerado com sucesso',
+            'report': report_doc.to_dict()
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao gerar relatório: {str(e)}'}), 500
 
-## Informações Gerais
-- **Número:** {case.number}
-- **Status:** {case.status}
-- **Prioridade:** {case.priority}
-- **Órgão:** {case.organ or 'Não informado'}
-- **Modalidade:** {case.modality or 'Não informada'}
+@documents_bp.route('/documents/report/<int:case_id>', methods=['GET'])
+def download_report(case_id):
+    """Baixar o relatório do caso (markdown, html ou docx) sem salvá-lo como documento"""
+    try:
+        report_type = request.args.get('template', 'summary')
+        report_format = request.args.get('format', 'markdown')
+        
+        case = Case.query.get(case_id)
+        if not case:
+            return jsonify({'error': 'Caso não encontrado'}), 404
+        
+        try:
+            parts = render_report(case, report_type, report_format)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        renderer = REPORT_FORMATS[report_format]
+        headers = {'Content-Disposition': f'attachment; filename=relatorio-caso-{case_id}.{renderer.extension}'}
+        
+        if report_format not in TEXT_FORMATS:
+            try:
+                body = b''.join(parts)
+            except RuntimeError as e:
+                return jsonify({'error': str(e)}), 501
+            return Response(body, mimetype=renderer.mimetype, headers=headers)
+        
+        # Markdown/HTML saem em partes enquanto os documentos são lidos em lotes
+        return Response(
+            stream_with_context(parts),
+            content_type=f'{renderer.mimetype}; charset=utf-8',
+            headers=headers
+        )
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro ao gerar relatório: {str(e)}'}), 500
 
-## Documentos Associados
-Total de documentos: {len(documents)}
+def save_report_document(case, report_type, report_format):
+    """Gerar o relatório e gravá-lo como documento do caso"""
+    report_doc = Document(
+        title=f'Relatório - {case.title}',
+        content=build_report(case, report_type, report_format),
+        document_type='relatorio',
+        status='Finalizado',
+        case_id=case.id,
+        user_id=1
+    )
+    
+    db.session.add(report_doc)
+    db.session.commit()
+    return report_doc
 
-"""
-            
-            for doc in documents:
-                report_content += f"""
-### {doc.title}
-- **Tipo:** {doc.document_type}
-- **Status:** {doc.status}
-- **Criado em:** {doc.created_at.strftime('%d/%m/%Y %H:%M')}
-- **Atualizado em:** {doc.updated_at.strftime('%d/%m/%Y %H:%M')}
+def run_report_job(app, payload, report_progress):
+    """Job de relatório: gera e grava o documento fora do ciclo da requisição"""
+    with app.app_context():
+        case = Case.query.get(payload['case_id'])
+        if not case:
+            raise PermanentJobError('Caso não encontrado')
+        
+        report_progress(10, 'Gerando relatório')
+        report_doc = save_report_document(case, payload.get('template', 'summary'), payload.get('format', 'markdown'))
+        return {'document_id': report_doc.id}
 
-"""
-            
-            # Criar documento de relatório
-            report_doc = Document(
-                title=f'Relatório - {case.title}',
-                content=report_content,
-                document_type='relatorio',
+register_job_handler('reports.generate', run_report_job)
+
+def run_ingest_job(app, payload, report_progress):
+    """Job de upload: extrai o texto em outro processo e grava um Document do tipo edital"""
+    if not os.path.exists(payload['path']):
+        raise PermanentJobError('Arquivo enviado não encontrado')
+    
+    report_progress(10, 'Extraindo texto')
+    output = f"{payload['path']}.txt"
+    try:
+        try:
+            stats = run_extraction(payload['path'], payload['kind'], output)
+        except ExtractionError as e:
+            raise PermanentJobError(f'Não foi possível ler o arquivo: {e}')
+        with open(output, encoding='utf-8') as extracted:
+            content = extracted.read()
+    finally:
+        if os.path.exists(output):
+            os.remove(output)
+    
+    if not content.strip():
+        raise PermanentJobError('Nenhum texto encontrado no arquivo (PDF digitalizado sem OCR?)')
+    
+    report_progress(80, 'Salvando edital')
+    with app.app_context():
+        if not Case.query.get(payload['case_id']):
+            raise PermanentJobError('Caso não encontrado')
+        
+        # O texto é gravado uma única vez por caso, mesmo que o arquivo seja reenviado
+        _, content_hash = content_metadata(content)
+        document = Document.query.filter_by(
+            case_id=payload['case_id'], document_type='edital', content_hash=content_hash
+        ).first()
+        deduplicated = document is not None
+        if document is None:
+            document = Document(
+                title=payload['title'],
+                content=content,
+                document_type='edital',
                 status='Finalizado',
-                case_id=case_id,
+                file_path=payload['path'],
+                case_id=payload['case_id'],
                 user_id=1
             )
-            
-            db.session.add(report_doc)
+            db.session.add(document)
             db.session.commit()
-            
-            return jsonify({
-                'message': 'Relatório gerado com sucesso',
-                'report': report_doc.to_dict()
-            })
-        
-        else:
-            return jsonify({'error': 'case_id é obrigatório'}), 400
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'error': f'Erro ao gerar relatório: {str(e)}'}), 500
+        return {'document_id': document.id, 'deduplicated': deduplicated, **stats}
+
+register_job_handler('documents.ingest', run_ingest_job)
 
 @documents_bp.route('/documents/options', methods=['GET'])
+@cached_json(cache_control='public, max-age=3600')
 def get_document_options():
     """Obter opções para formulários de documentos"""
     return jsonify({
@@ -0,0 +1,62 @@
+from flask import Blueprint, request, jsonify
+from src.models.document import Document
+from src.services.job_queue import JOB_STATUSES, get_job_queue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def enqueue_job(kind, payload):
+    """Enfileirar a geração e responder 202 com o job para acompanhamento"""
+    job, created = get_job_queue().enqueue(kind, payload, idempotency_key=request.headers.get('Idempotency-Key'))
+    return jsonify({
+        'message': 'Job enfileirado' if created else 'Job já existente para esta solicitação',
+        'job': job,
+        'status_url': f"/api/jobs/{job['id']}",
+        'result_url': f"/api/jobs/{job['id']}/result"
+    }), 202
+
+@jobs_bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Listar jobs recentes, opcionalmente filtrados por status"""
+    try:
+        status = request.args.get('status')
+        if status and status not in JOB_STATUSES:
+            return jsonify({'error': f'Status inválido: {status}'}), 400
+        
+        limit = min(int(request.args.get('limit', 50)), 200)
+        jobs = get_job_queue().list(status=status, limit=limit)
+        return jsonify({'jobs': jobs, 'count': len(jobs)})
+    except Exception as e:
+        return jsonify({'error': f'Erro ao listar jobs: {str(e)}'}), 500
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Obter status e progresso de um job"""
+    job = get_job_queue().get(job_id)
+    if not job:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify({'job': job})
+
+@jobs_bp.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Obter o resultado de um job concluído (o Document gerado, quando houver)"""
+    try:
+        job = get_job_queue().get(job_id)
+        if not job:
+            return jsonify({'error': 'Job não encontrado'}), 404
+        
+        if job['status'] == 'failed':
+            return jsonify({'error': f"Job falhou: {job['error']}", 'job': job}), 500
+        
+        if job['status'] != 'succeeded':
+            return jsonify({'message': 'Job ainda em processamento', 'job': job}), 202
+        
+        result = job['result'] or {}
+        document = Document.query.get(result['document_id']) if result.get('document_id') else None
+        
+        return jsonify({
+            'job': job,
+            'result': result,
+            'document': document.to_dict(include_content=True) if document else None
+        })
+    except Exception as e:
+        return jsonify({'error': f'Erro ao buscar resultado: {str(e)}'}), 500
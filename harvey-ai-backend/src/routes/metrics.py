@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from src.utils.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas no formato de exposição do Prometheus"""
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
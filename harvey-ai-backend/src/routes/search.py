@@ -0,0 +1,107 @@
+import time
+from flask import Blueprint, request, jsonify
+from src.models.case import Case
+from src.models.document import Document
+from src.models.user import db
+from src.services import search_index
+from src.services.vector_index import get_semantic_index, retrieve_context
+from src.utils.serialization import load_only_fields, serialize_cases
+
+search_bp = Blueprint('search', __name__)
+
+SEARCH_SCOPES = ['all', 'cases', 'documents']
+
+@search_bp.route('/search', methods=['GET'])
+def search():
+    """Busca textual em casos e documentos com ranking BM25, trechos e destaques"""
+    try:
+        query_term = request.args.get('q', '').strip()
+        if not query_term:
+            return jsonify({'error': 'Termo de busca é obrigatório'}), 400
+        
+        if not search_index.is_available():
+            return jsonify({'error': 'Índice de busca indisponível para este banco de dados'}), 503
+        
+        scope = request.args.get('scope', 'all')
+        if scope not in SEARCH_SCOPES:
+            return jsonify({'error': f'Escopo inválido: {scope}'}), 400
+        
+        limit = min(int(request.args.get('limit', 20)), 100)
+        offset = int(request.args.get('offset', 0))
+        started = time.perf_counter()
+        results = {}
+        
+        if scope in ('all', 'cases'):
+            hits = search_index.search_cases(db, query_term, limit=limit, offset=offset)
+            found = Case.query.filter(Case.id.in_([hit['id'] for hit in hits])).all()
+            cases = {data['id']: data for data in serialize_cases(found)}
+            results['cases'] = [
+                {
+                    'case': cases[hit['id']],
+                    'score': round(-hit['rank'], 4),
+                    'title_highlight': hit['title_highlight'],
+                    'snippet': hit['snippet']
+                }
+                for hit in hits if hit['id'] in cases
+            ]
+        
+        if scope in ('all', 'documents'):
+            hits = search_index.search_documents(
+                db,
+                query_term,
+                limit=limit,
+                offset=offset,
+                case_id=request.args.get('case_id', type=int),
+                document_type=request.args.get('type')
+            )
+            documents = {
+                doc.id: doc
+                for doc in Document.query
+                # O texto completo fica de fora; o trecho destacado já mostra o contexto
+                .options(load_only_fields(Document, Document.SUMMARY_FIELDS))
+                .filter(Document.id.in_([hit['id'] for hit in hits]))
+                .all()
+            }
+            results['documents'] = [
+                {
+                    'document': documents[hit['id']].to_dict(fields=Document.SUMMARY_FIELDS),
+                    'score': round(-hit['rank'], 4),
+                    'title_highlight': hit['title_highlight'],
+                    'snippet': hit['snippet']
+                }
+                for hit in hits if hit['id'] in documents
+            ]
+        
+        return jsonify({
+            'query': query_term,
+            'scope': scope,
+            **results,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro na busca: {str(e)}'}), 500
+
+@search_bp.route('/search/semantic', methods=['GET'])
+def semantic_search():
+    """Recuperar trechos de documentos semanticamente próximos do texto informado"""
+    try:
+        query_term = request.args.get('q', '').strip()
+        if not query_term:
+            return jsonify({'error': 'Termo de busca é obrigatório'}), 400
+        
+        k = min(int(request.args.get('k', 5)), 50)
+        document_types = request.args.getlist('type') or None
+        started = time.perf_counter()
+        
+        results = retrieve_context(query_term, k=k, document_types=document_types)
+        
+        return jsonify({
+            'query': query_term,
+            'results': results,
+            'index': get_semantic_index().index.stats(),
+            'took_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Erro na busca semântica: {str(e)}'}), 500
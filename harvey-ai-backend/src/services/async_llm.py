@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+import httpx
+import openai
+
+from src.services.llm_cache import begin_cached_request, finish_cached_request
+from src.services.model_router import (
+    HEDGING_ENABLED, hedge_delay, log_failover, prepare_for_model, record_error, record_event,
+    record_success, select_models
+)
+from src.services.openai_client import CONNECT_TIMEOUT, MAX_RETRIES, REQUEST_TIMEOUT, RETRYABLE_ERRORS, backoff_delay
+from src.utils.metrics import observe_llm_call
+
+logger = logging.getLogger(__name__)
+
+# No modo ASGI uma única conexão de processo atende centenas de chamadas simultâneas
+ASYNC_POOL_MAX_CONNECTIONS = int(os.getenv('ASYNC_OPENAI_MAX_CONNECTIONS', 500))
+ASYNC_POOL_MAX_KEEPALIVE = int(os.getenv('ASYNC_OPENAI_MAX_KEEPALIVE', 100))
+
+_clients = {}
+
+def get_async_openai_client(api_key):
+    """Cliente AsyncOpenAI compartilhado por API key (usar sempre no mesmo event loop)"""
+    key = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+    client = _clients.get(key)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_POOL_MAX_KEEPALIVE
+            ),
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+        )
+        client = _clients[key] = openai.AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+    return client
+
+async def close_async_openai_clients():
+    while _clients:
+        _, client = _clients.popitem()
+        await client.close()
+
+async def async_create_chat_completion(client, max_retries=MAX_RETRIES, **params):
+    """Versão assíncrona de create_chat_completion (mesmo backoff com jitter)"""
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(**params)
+            observe_llm_call(params.get('model'), time.perf_counter() - started)
+            return response
+        except RETRYABLE_ERRORS as e:
+            observe_llm_call(
+                params.get('model'), time.perf_counter() - started,
+                'rate_limited' if isinstance(e, openai.RateLimitError) else 'error'
+            )
+            if attempt >= max_retries:
+                raise
+            await asyncio.sleep(backoff_delay(attempt, e))
+            attempt += 1
+        except Exception:
+            observe_llm_call(params.get('model'), time.perf_counter() - started, 'error')
+            raise
+
+async def _timed_call(client, model, params, max_retries):
+    started = time.perf_counter()
+    try:
+        response = await async_create_chat_completion(client, max_retries=max_retries, **params)
+    except Exception as e:
+        record_error(model, e)
+        raise
+    record_success(model, time.perf_counter() - started)
+    return response
+
+async def async_routed_chat_completion(client, route, task, **params):
+    """Roteamento com failover e hedging, como routed_chat_completion, sem ocupar threads"""
+    candidates = select_models(task, params.get('messages') or [], params.get('max_tokens'), params.get('model'))
+    routing = {'task': task, 'candidates': candidates, 'attempts': 0, 'failover': False, 'hedged': False}
+    last_error = None
+
+    index = 0
+    while index < len(candidates):
+        model = candidates[index]
+        is_last = index == len(candidates) - 1
+        attempt_params, budget = prepare_for_model(route, model, params)
+        routing['attempts'] += 1
+        primary = asyncio.ensure_future(_timed_call(client, model, attempt_params, MAX_RETRIES if is_last else 0))
+
+        hedge = None
+        if not is_last and HEDGING_ENABLED:
+            done, _ = await asyncio.wait([primary], timeout=hedge_delay(model))
+            if not done:
+                hedge_model = candidates[index + 1]
+                hedge_params, hedge_budget = prepare_for_model(route, hedge_model, params)
+                hedge = asyncio.ensure_future(_timed_call(
+                    client, hedge_model, hedge_params, MAX_RETRIES if index + 1 == len(candidates) - 1 else 0
+                ))
+                routing.update(hedged=True, attempts=routing['attempts'] + 1)
+                record_event(model, hedges=1)
+                logger.info('%s: %s sem resposta após %.1fs, hedge com %s', route, model, hedge_delay(model), hedge_model)
+
+        pending = {primary: (model, attempt_params, budget)}
+        if hedge is not None:
+            pending[hedge] = (hedge_model, hedge_params, hedge_budget)
+
+        while pending:
+            done, _ = await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                winner, winner_params, winner_budget = pending.pop(future)
+                if future.exception() is None:
+                    # A chamada perdedora é cancelada: a conexão volta ao pool
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge:
+                        record_event(winner, hedge_wins=1)
+                    routing.update(model=winner, failover=winner != candidates[0])
+                    return future.result(), winner_params, winner_budget, routing
+                last_error = future.exception()
+
+        if not isinstance(last_error, RETRYABLE_ERRORS) or index + (2 if hedge else 1) >= len(candidates):
+            raise last_error
+        log_failover(route, model, last_error, candidates[index + (2 if hedge else 1)])
+        index += 2 if hedge else 1
+
+    raise last_error
+
+async def async_cached_chat_completion(client, route, use_cache=True, task=None, **params):
+    """Versão assíncrona de cached_chat_completion (mesmo cache e orçamento de tokens)"""
+    state, cached = begin_cached_request(route, use_cache, task, params)
+    if cached is not None:
+        return cached
+
+    if task is None:
+        response = await async_create_chat_completion(client, **state['params'])
+        return finish_cached_request(state, route, response, state['params'], state['budget'])
+    response, sent_params, budget, routing = await async_routed_chat_completion(client, route, task, **params)
+    return finish_cached_request(state, route, response, sent_params, budget, routing)
+
+async def async_open_routed_stream(client, route, task, **params):
+    """Abrir um stream com failover até o primeiro byte; retorna (stream, params, orçamento)"""
+    candidates = select_models(task, params.get('messages') or [], params.get('max_tokens'), params.get('model'))
+    for index, model in enumerate(candidates):
+        is_last = index == len(candidates) - 1
+        attempt_params, budget = prepare_for_model(route, model, params)
+        started = time.perf_counter()
+        try:
+            stream = await async_create_chat_completion(
+                client,
+                max_retries=MAX_RETRIES if is_last else 0,
+                **attempt_params,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+        except RETRYABLE_ERRORS as e:
+            record_error(model, e)
+            if is_last:
+                raise
+            log_failover(route, model, e, candidates[index + 1])
+            continue
+        except Exception as e:
+            record_error(model, e)
+            raise
+        # Tempo até o primeiro byte entra na latência do modelo (base do atraso do hedge)
+        record_success(model, time.perf_counter() - started)
+        return stream, attempt_params, budget
@@ -0,0 +1,387 @@
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import undefer
+from src.models.user import db
+from src.models.case import Case
+from src.models.document import Document, content_metadata
+from src.models.case_counter import apply_case_deltas
+from src.utils.http_cache import invalidate
+
+BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ['ndjson', 'csv']
+CONFLICT_MODES = ['error', 'skip']
+
+# Campos exportados (e aceitos de volta na importação)
+CASE_EXPORT_FIELDS = [field for field in Case.SERIALIZABLE_FIELDS if field != 'documents_count']
+DOCUMENT_EXPORT_FIELDS = [field for field in Document.SERIALIZABLE_FIELDS if field != 'case_id']
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def read_records(stream, fmt):
+    """Gerar (linha, registro) a partir de um corpo NDJSON ou CSV, lido aos poucos.
+
+    Linhas inválidas viram (linha, ValueError) para entrar no relatório de erros.
+    """
+    text_stream = io.TextIOWrapper(io.BufferedReader(stream), encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            # Células vazias equivalem a campos ausentes
+            yield reader.line_num, {key: value for key, value in record.items() if key and value not in (None, '')}
+        return
+
+    for line_no, line in enumerate(text_stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, ValueError(f'JSON inválido: {e.msg}')
+            continue
+        if not isinstance(record, dict):
+            yield line_no, ValueError('Cada linha deve ser um objeto JSON')
+            continue
+        yield line_no, record
+
+def _text(record, field, max_length=None, default=''):
+    value = record.get(field)
+    if value is None:
+        return default
+    value = str(value).strip()
+    if max_length and len(value) > max_length:
+        raise ValueError(f'Campo {field} excede {max_length} caracteres')
+    return value
+
+def _float(record, field):
+    value = record.get(field)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Campo {field} deve ser numérico')
+
+def _int(record, field, default=None):
+    value = record.get(field)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Campo {field} deve ser inteiro')
+
+def _datetime(record, field):
+    value = record.get(field)
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f'Campo {field} deve estar no formato ISO 8601')
+
+def validate_case(record):
+    """Converter um registro em valores de Case (mesmas regras de POST /cases). Retorna (valores, documentos)"""
+    for field in ('number', 'title'):
+        if not record.get(field):
+            raise ValueError(f'Campo {field} é obrigatório')
+
+    values = {
+        'number': _text(record, 'number', 50),
+        'title': _text(record, 'title', 200),
+        'description': _text(record, 'description'),
+        'status': _text(record, 'status', 50) or 'Em Andamento',
+        'priority': _text(record, 'priority', 20) or 'Média',
+        'organ': _text(record, 'organ', 200),
+        'modality': _text(record, 'modality', 100),
+        'object_description': _text(record, 'object_description'),
+        'estimated_value': _float(record, 'estimated_value'),
+        'deadline': _datetime(record, 'deadline'),
+        'user_id': _int(record, 'user_id', 1),
+        # Datas originais preservadas na migração de bases existentes
+        'created_at': _datetime(record, 'created_at') or datetime.utcnow()
+    }
+    if values['status'] not in Case.get_status_options():
+        raise ValueError(f"Status inválido: {values['status']}")
+    if values['priority'] not in Case.get_priority_options():
+        raise ValueError(f"Prioridade inválida: {values['priority']}")
+
+    documents = record.get('documents') or []
+    if not isinstance(documents, list):
+        raise ValueError('Campo documents deve ser uma lista')
+    try:
+        documents = [validate_document(document) for document in documents]
+    except ValueError as e:
+        raise ValueError(f'Documento inválido: {e}')
+    return values, documents
+
+def validate_document(record):
+    """Converter um registro em valores de Document (o caso é resolvido depois, em lote)"""
+    if not isinstance(record, dict):
+        raise ValueError('Documento deve ser um objeto JSON')
+    for field in ('title', 'document_type'):
+        if not record.get(field):
+            raise ValueError(f'Campo {field} é obrigatório')
+
+    content = record.get('content')
+    content = None if content is None else str(content)
+    size, digest = content_metadata(content)
+    values = {
+        'title': _text(record, 'title', 200),
+        'content': content,
+        'content_size': size,
+        'content_hash': digest,
+        'document_type': _text(record, 'document_type', 50),
+        'status': _text(record, 'status', 50) or 'Rascunho',
+        'file_path': _text(record, 'file_path', 500, default=None),
+        'user_id': _int(record, 'user_id', 1),
+        'case_id': _int(record, 'case_id'),
+        'created_at': _datetime(record, 'created_at') or datetime.utcnow()
+    }
+    if values['document_type'] not in Document.get_document_types():
+        raise ValueError(f"Tipo de documento inválido: {values['document_type']}")
+    if values['status'] not in Document.get_status_options():
+        raise ValueError(f"Status inválido: {values['status']}")
+    return values
+
+def new_report(dry_run=False):
+    return {
+        'dry_run': dry_run,
+        'received': 0,
+        'created': 0,
+        'documents_created': 0,
+        'skipped': 0,
+        'failed': 0,
+        'batches': 0,
+        'errors': [],
+        'errors_truncated': False
+    }
+
+def _add_error(report, line, message, key=None):
+    report['failed'] += 1
+    if len(report['errors']) >= MAX_REPORTED_ERRORS:
+        report['errors_truncated'] = True
+        return
+    error = {'line': line, 'error': message}
+    if key is not None:
+        error['key'] = key
+    report['errors'].append(error)
+
+def _insert_documents(connection, rows):
+    """Inserir documentos em lote; retorna os itens para o índice vetorial"""
+    if not rows:
+        return []
+    table = Document.__table__
+    # RETURNING sem ordem garantida (mantém o INSERT em lote no SQLite): o texto é
+    # recuperado pelo hash, que identifica o conteúdo de forma única
+    contents = {row['content_hash']: row['content'] for row in rows}
+    inserted = connection.execute(
+        insert(table).returning(table.c.id, table.c.case_id, table.c.document_type, table.c.content_hash), rows
+    ).all()
+    return [
+        (document_id, case_id, document_type, contents.get(content_hash) or '')
+        for document_id, case_id, document_type, content_hash in inserted
+    ]
+
+def _index_documents(upserts):
+    # Inserções em lote não passam pelos eventos da sessão: o índice vetorial é avisado aqui
+    if not upserts:
+        return
+    from src.services.vector_index import get_semantic_index
+    get_semantic_index().submit(upserts, [])
+
+def import_cases(records, batch_size=BATCH_SIZE, on_conflict='error', dry_run=False):
+    """Importar casos (e documentos aninhados) validando e gravando um lote por transação"""
+    report = new_report(dry_run)
+    seen_numbers = set()
+
+    for batch in batched(records, batch_size):
+        valid = []
+        for line, record in batch:
+            report['received'] += 1
+            if isinstance(record, Exception):
+                _add_error(report, line, str(record))
+                continue
+            try:
+                values, documents = validate_case(record)
+            except ValueError as e:
+                _add_error(report, line, str(e), record.get('number'))
+                continue
+            if values['number'] in seen_numbers:
+                _add_error(report, line, 'Número do caso repetido no arquivo', values['number'])
+                continue
+            seen_numbers.add(values['number'])
+            valid.append((line, values, documents))
+
+        if valid:
+            _import_case_batch(valid, report, on_conflict, dry_run)
+        report['batches'] += 1
+
+    return report
+
+def _import_case_batch(valid, report, on_conflict, dry_run):
+    table = Case.__table__
+    numbers = [values['number'] for _, values, _ in valid]
+
+    # Uma nova tentativa cobre números gravados por outra requisição entre a checagem e o INSERT
+    for attempt in range(2):
+        outcome = {'created': 0, 'documents_created': 0, 'skipped': 0, 'errors': []}
+        upserts = []
+        try:
+            with db.engine.begin() as connection:
+                # Unicidade do lote inteiro em uma única consulta
+                existing = set(connection.execute(select(table.c.number).where(table.c.number.in_(numbers))).scalars())
+                rows = []
+                for line, values, documents in valid:
+                    if values['number'] not in existing:
+                        rows.append((values, documents))
+                    elif on_conflict == 'skip':
+                        outcome['skipped'] += 1
+                    else:
+                        outcome['errors'].append((line, 'Número do caso já existe', values['number']))
+
+                if rows and not dry_run:
+                    case_ids = dict(connection.execute(
+                        insert(table).returning(table.c.number, table.c.id),
+                        [values for values, _ in rows]
+                    ).all())
+                    document_rows = [
+                        {**document, 'case_id': case_ids[values['number']]}
+                        for values, documents in rows
+                        for document in documents
+                    ]
+                    upserts = _insert_documents(connection, document_rows)
+                    # INSERT em lote não dispara os eventos do ORM: contadores atualizados aqui
+                    apply_case_deltas(connection, [values for values, _ in rows])
+
+                outcome['created'] = len(rows)
+                outcome['documents_created'] = sum(len(documents) for _, documents in rows)
+        except IntegrityError:
+            if attempt == 0:
+                continue
+            raise
+        break
+
+    _index_documents(upserts)
+    if upserts or (outcome['created'] and not dry_run):
+        invalidate(tables=('cases', 'documents'))
+    report['created'] += outcome['created']
+    report['documents_created'] += outcome['documents_created']
+    report['skipped'] += outcome['skipped']
+    for line, message, key in outcome['errors']:
+        _add_error(report, line, message, key)
+
+def import_documents(records, batch_size=BATCH_SIZE, dry_run=False):
+    """Importar documentos; cada registro indica case_id ou case_number"""
+    report = new_report(dry_run)
+    cases = Case.__table__
+
+    for batch in batched(records, batch_size):
+        valid = []
+        for line, record in batch:
+            report['received'] += 1
+            if isinstance(record, Exception):
+                _add_error(report, line, str(record))
+                continue
+            try:
+                values = validate_document(record)
+                case_number = _text(record, 'case_number', 50, default=None)
+                if values['case_id'] is None and not case_number:
+                    raise ValueError('Informe case_id ou case_number')
+            except ValueError as e:
+                _add_error(report, line, str(e), record.get('title'))
+                continue
+            valid.append((line, values, case_number))
+
+        if valid:
+            with db.engine.begin() as connection:
+                # Casos do lote resolvidos com uma consulta por chave
+                numbers = {number for _, values, number in valid if values['case_id'] is None}
+                ids = {values['case_id'] for _, values, _ in valid if values['case_id'] is not None}
+                by_number = dict(connection.execute(
+                    select(cases.c.number, cases.c.id).where(cases.c.number.in_(numbers))
+                ).all()) if numbers else {}
+                known_ids = set(connection.execute(
+                    select(cases.c.id).where(cases.c.id.in_(ids))
+                ).scalars()) if ids else set()
+
+                rows = []
+                for line, values, number in valid:
+                    case_id = values['case_id'] if values['case_id'] is not None else by_number.get(number)
+                    if case_id is None or (values['case_id'] is not None and case_id not in known_ids):
+                        _add_error(report, line, 'Caso não encontrado', values['case_id'] or number)
+                        continue
+                    rows.append({**values, 'case_id': case_id})
+
+                upserts = [] if dry_run else _insert_documents(connection, rows)
+                report['documents_created'] += len(rows)
+            _index_documents(upserts)
+            if upserts:
+                # documents_count dos casos que receberam documentos
+                invalidate(tables=('documents',), entities={('cases', row['case_id']) for row in rows})
+        report['batches'] += 1
+
+    return report
+
+def export_cases(fmt='ndjson', include_documents=True, include_content=True, status=None, batch_size=BATCH_SIZE):
+    """Gerar a exportação de casos em NDJSON (com documentos) ou CSV, um lote por vez.
+
+    Os lotes seguem o id (keyset): nenhuma transação de leitura fica aberta
+    enquanto o cliente consome a resposta, e a sessão é esvaziada a cada lote.
+    """
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CASE_EXPORT_FIELDS)
+        yield buffer.getvalue()
+
+    last_id = 0
+    while True:
+        query = Case.query.filter(Case.id > last_id)
+        if status:
+            query = query.filter(Case.status == status)
+        cases = query.order_by(Case.id).limit(batch_size).all()
+        if not cases:
+            return
+        last_id = cases[-1].id
+
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for case in cases:
+                data = case.to_dict(fields=CASE_EXPORT_FIELDS)
+                writer.writerow(['' if data[field] is None else data[field] for field in CASE_EXPORT_FIELDS])
+            yield buffer.getvalue()
+        else:
+            documents_by_case = {}
+            if include_documents:
+                query = Document.query.filter(Document.case_id.in_([case.id for case in cases]))
+                if include_content:
+                    query = query.options(undefer(Document.content))
+                fields = DOCUMENT_EXPORT_FIELDS if include_content else [f for f in DOCUMENT_EXPORT_FIELDS if f != 'content']
+                for document in query.order_by(Document.case_id, Document.id):
+                    documents_by_case.setdefault(document.case_id, []).append(document.to_dict(fields=fields))
+
+            lines = []
+            for case in cases:
+                data = case.to_dict(fields=CASE_EXPORT_FIELDS)
+                if include_documents:
+                    data['documents'] = documents_by_case.get(case.id, [])
+                lines.append(json.dumps(data, ensure_ascii=False) + '\n')
+            yield ''.join(lines)
+
+        db.session.expunge_all()
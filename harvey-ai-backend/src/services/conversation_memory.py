@@ -0,0 +1,123 @@
+import logging
+from src.models.user import db
+from src.models.conversation import ConversationMessage
+from src.services.llm_cache import cached_chat_completion
+from src.services.tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# Mensagens mais recentes enviadas na íntegra a cada turno
+WINDOW_MESSAGES = 8
+
+# Quantas mensagens antigas entram no resumo de cada vez (o resumo é atualizado, não refeito)
+SUMMARY_CHUNK_MESSAGES = 4
+
+SUMMARY_MODEL = 'gpt-3.5-turbo'
+SUMMARY_MAX_TOKENS = 400
+SUMMARY_ROUTE = 'chat.summary'
+
+# Limite por mensagem ao incorporá-la ao resumo (respostas longas não encarecem a atualização)
+SUMMARY_MESSAGE_MAX_TOKENS = 1500
+
+SUMMARY_PROMPT = """
+Você mantém o resumo de uma conversa entre um usuário e Harvey, assistente jurídico
+especializado em licitações públicas (Lei 14.133/2021). Atualize o resumo existente
+incorporando as novas mensagens. Preserve fatos do caso, prazos, valores, artigos citados,
+decisões tomadas e pendências; descarte cumprimentos e repetições. Responda apenas com o
+resumo atualizado, em tópicos curtos.
+"""
+
+ROLE_LABELS = {'user': 'Usuário', 'assistant': 'Harvey'}
+
+def _pending(conversation):
+    # Mensagens ainda não incorporadas ao resumo, ordenadas por id
+    return conversation.messages.filter(ConversationMessage.id > (conversation.summarized_until or 0))
+
+def update_summary(client, conversation, use_cache=True):
+    """Incorporar ao resumo as mensagens mais antigas que saíram da janela.
+    
+    Cada atualização envia só o resumo atual e um bloco fixo de mensagens, então
+    o custo por turno não cresce com o tamanho da conversa. Retorna quantas
+    mensagens foram resumidas.
+    """
+    if _pending(conversation).count() < WINDOW_MESSAGES + SUMMARY_CHUNK_MESSAGES:
+        return 0
+    
+    batch = _pending(conversation).limit(SUMMARY_CHUNK_MESSAGES).all()
+    transcript = '\n\n'.join(
+        f"{ROLE_LABELS.get(message.role, message.role)}: {truncate_to_tokens(message.content, SUMMARY_MESSAGE_MAX_TOKENS, SUMMARY_MODEL)}"
+        for message in batch
+    )
+    
+    try:
+        summary, _, _ = cached_chat_completion(
+            client,
+            SUMMARY_ROUTE,
+            use_cache=use_cache,
+            task='summary',
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Resumo atual:\n{conversation.summary or '(vazio)'}\n\nNovas mensagens:\n{transcript}"}
+            ],
+            max_tokens=SUMMARY_MAX_TOKENS,
+            temperature=0.2
+        )
+    except Exception as e:
+        # Sem resumo neste turno: as mensagens continuam na janela até a próxima tentativa
+        logger.warning('Falha ao resumir a conversa %s: %s', conversation.id, e)
+        return 0
+    
+    conversation.summary = summary
+    conversation.summarized_until = batch[-1].id
+    return len(batch)
+
+def case_context(case):
+    lines = [f'Caso em discussão: {case.number} - {case.title}']
+    if case.organ:
+        lines.append(f'Órgão: {case.organ}')
+    if case.modality:
+        lines.append(f'Modalidade: {case.modality}')
+    if case.object_description:
+        lines.append(f'Objeto: {case.object_description}')
+    return '\n'.join(lines)
+
+def build_conversation_messages(conversation, system_prompt, user_message):
+    """Prompt do turno: sistema (+ caso e resumo), mensagens não resumidas e a nova mensagem"""
+    system = system_prompt
+    if conversation.case_id and conversation.case is not None:
+        system += '\n\n' + case_context(conversation.case)
+    if conversation.summary:
+        system += f'\n\nResumo da conversa até aqui:\n{conversation.summary}'
+    
+    # Todas as mensagens fora do resumo (limitadas mesmo se o resumo falhar várias vezes seguidas)
+    window = (
+        _pending(conversation).order_by(None).order_by(ConversationMessage.id.desc())
+        .limit(WINDOW_MESSAGES + SUMMARY_CHUNK_MESSAGES).all()[::-1]
+    )
+    return (
+        [{"role": "system", "content": system}]
+        + [{"role": message.role, "content": message.content} for message in window]
+        + [{"role": "user", "content": user_message}]
+    ), len(window)
+
+def prepare_conversation_turn(client, conversation, system_prompt, user_message, use_cache=True):
+    """Atualizar o resumo se a janela encheu e montar as mensagens do turno"""
+    summarized = update_summary(client, conversation, use_cache)
+    messages, window_size = build_conversation_messages(conversation, system_prompt, user_message)
+    return messages, {
+        'window_messages': window_size,
+        'summarized_messages': max((conversation.message_count or 0) - window_size, 0),
+        'summary_updated': summarized > 0
+    }
+
+def save_conversation_turn(conversation, user_message, reply, model):
+    """Gravar pergunta e resposta do turno (e o resumo atualizado) em uma transação"""
+    db.session.add(ConversationMessage(
+        conversation_id=conversation.id, role='user', content=user_message, tokens=count_tokens(user_message, model)
+    ))
+    db.session.add(ConversationMessage(
+        conversation_id=conversation.id, role='assistant', content=reply, tokens=count_tokens(reply, model)
+    ))
+    conversation.message_count = (conversation.message_count or 0) + 2
+    db.session.commit()
@@ -0,0 +1,182 @@
+"""Lotes de análises de editais: fila por prazo e prioridade do caso, limites de taxa e custo.
+
+Os editais saem da fila pelo prazo (Case.deadline) mais próximo e, no mesmo
+prazo, pela prioridade do caso; cada um reserva no limitador de taxa as
+requisições e tokens estimados antes de ir ao modelo. Os resultados são
+entregues na ordem em que terminam.
+"""
+import heapq
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from src.services.model_catalog import estimate_cost
+
+# Editais analisados ao mesmo tempo em um lote (cada um pode ter trechos em paralelo)
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 16))
+BATCH_MAX_EDITAIS = int(os.getenv('BATCH_MAX_EDITAIS', 100))
+
+PRIORITY_RANK = {'Alta': 0, 'Média': 1, 'Baixa': 2}
+
+def schedule_key(item):
+    """Dia do prazo mais próximo primeiro (sem prazo vai para o fim), depois prioridade, hora do prazo e ordem de envio"""
+    deadline = item.get('deadline') or datetime.max
+    return (item.get('deadline') is None, deadline.date(), PRIORITY_RANK.get(item.get('priority'), 1), deadline, item['index'])
+
+def analysis_calls(result):
+    """Chamadas ao modelo de uma análise (modelo e tokens), sem acertos de cache, trechos reaproveitados ou com erro"""
+    if result.get('mode') != 'chunked':
+        if result['cache'].get('hit'):
+            return []
+        return [{
+            'model': result['model_used'],
+            'prompt_tokens': result.get('prompt_tokens', 0),
+            'completion_tokens': result.get('completion_tokens', 0)
+        }]
+    return [
+        stats for stats in result['chunks'] + result['reduce']
+        if stats.get('model') and not stats.get('cached') and not stats.get('reused') and not stats.get('error')
+    ]
+
+def summarize_costs(calls):
+    """Tokens e custo em USD por modelo"""
+    models = {}
+    for call in calls:
+        entry = models.setdefault(call['model'], {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0})
+        entry['calls'] += 1
+        entry['prompt_tokens'] += call['prompt_tokens']
+        entry['completion_tokens'] += call['completion_tokens']
+        entry['cost_usd'] += estimate_cost(call['model'], call['prompt_tokens'], call['completion_tokens'])
+    for entry in models.values():
+        entry['cost_usd'] = round(entry['cost_usd'], 6)
+    return models
+
+class BatchReport:
+    """Totais do lote: vazão (editais e tokens por minuto), espera nos limites e custo"""
+
+    def __init__(self, total):
+        self.total = total
+        self.started = time.perf_counter()
+        self.calls = []
+        self.counts = {'succeeded': 0, 'failed': 0}
+        self.tokens = 0
+        self.wait_seconds = 0.0
+
+    def add(self, event, calls=()):
+        self.counts['succeeded' if event['status'] == 'ok' else 'failed'] += 1
+        self.tokens += event.get('tokens_used') or 0
+        self.wait_seconds += (event.get('wait_ms') or 0) / 1000
+        self.calls.extend(calls)
+
+    def summary(self, limiter=None):
+        elapsed = time.perf_counter() - self.started
+        minutes = max(elapsed, 1e-6) / 60
+        by_model = summarize_costs(self.calls)
+        done = self.counts['succeeded'] + self.counts['failed']
+        return {
+            'total': self.total,
+            **self.counts,
+            'elapsed_seconds': round(elapsed, 3),
+            'editais_per_minute': round(done / minutes, 2),
+            'tokens_used': self.tokens,
+            'tokens_per_minute': round(self.tokens / minutes),
+            'model_calls': len(self.calls),
+            'rate_limit_wait_seconds': round(self.wait_seconds, 3),
+            'cost_usd': round(sum(entry['cost_usd'] for entry in by_model.values()), 6),
+            'by_model': by_model,
+            'rate_limits': limiter.snapshot() if limiter else None
+        }
+
+def _describe(item):
+    return {
+        'index': item['index'],
+        'case_id': item.get('case_id'),
+        'edital_document_id': item.get('edital_document_id'),
+        'deadline': item['deadline'].isoformat() if item.get('deadline') else None,
+        'priority': item.get('priority')
+    }
+
+def run_batch(items, handler, estimate, limiter, workers=BATCH_WORKERS):
+    """Executar o lote e gerar eventos (nome, dados): 'queued', um 'result' por edital e 'done'.
+
+    handler(item) devolve o resultado da análise; estimate(item) devolve
+    (requisições, tokens) a reservar. Itens com 'error' (edital não
+    encontrado, por exemplo) são reportados sem ir à fila. Se o consumidor
+    parar de ler, os editais ainda na fila são descartados.
+    """
+    report = BatchReport(len(items))
+    pending = [(schedule_key(item), item) for item in items if not item.get('error')]
+    heapq.heapify(pending)
+    scheduled = len(pending)
+    pool_size = max(1, min(workers, scheduled))
+    yield 'queued', {
+        'total': len(items),
+        'workers': pool_size,
+        'order': [_describe(item) for _, item in sorted(pending, key=lambda entry: entry[0])],
+        'rate_limits': limiter.snapshot()
+    }
+
+    for item in items:
+        if item.get('error'):
+            event = {**_describe(item), 'status': 'error', 'error': item['error']}
+            report.add(event)
+            yield 'result', event
+
+    results = queue.Queue()
+    cancelled = threading.Event()
+    dispatch = threading.Lock()
+    position = 0
+
+    def worker():
+        nonlocal position
+        while not cancelled.is_set():
+            # Retirar da fila e reservar no limitador juntos: a ordem de despacho segue a fila
+            with dispatch:
+                if not pending:
+                    return
+                item = heapq.heappop(pending)[1]
+                position += 1
+                event = {**_describe(item), 'position': position}
+                try:
+                    requests, tokens = estimate(item)
+                except Exception as e:
+                    requests, tokens, event['error'] = 0, 0, f'Erro na estimativa: {str(e)}'
+                waited = limiter.acquire(requests, tokens, cancelled) if requests else 0.0
+                if waited is None:
+                    return
+            event.update(wait_ms=round(waited * 1000, 1), reserved_tokens=limiter.clamp(requests, tokens)[1])
+
+            calls = []
+            started = time.perf_counter()
+            try:
+                if 'error' in event:
+                    raise RuntimeError(event['error'])
+                result = handler(item)
+                calls = analysis_calls(result)
+                event.update(status='ok', **result)
+                event['cost_usd'] = round(sum(entry['cost_usd'] for entry in summarize_costs(calls).values()), 6)
+            except Exception as e:
+                event.update(status='error', error=str(e), tokens_used=0)
+            finally:
+                if requests:
+                    limiter.settle(tokens, event.get('tokens_used') or 0)
+            event['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            results.put((event, calls))
+
+    executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='edital-batch')
+    try:
+        futures = [executor.submit(worker) for _ in range(pool_size)]
+        for _ in range(scheduled):
+            event, calls = results.get()
+            report.add(event, calls)
+            yield 'result', event
+        for future in futures:
+            future.result()
+        yield 'done', report.summary(limiter)
+    finally:
+        cancelled.set()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,163 @@
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+
+# Títulos de seção típicos de editais: "CLÁUSULA 5ª", "ANEXO II", "ITEM 3", "CAPÍTULO I"...
+KEYWORD_HEADING = re.compile(
+    r'^[ \t]*(?:CL[ÁA]USULA|ANEXO|ITEM|SE[ÇC][ÃA]O|CAP[ÍI]TULO|T[ÍI]TULO)\b[^\n]{0,150}$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Títulos numerados em caixa alta: "1. DO OBJETO", "7.2 - DA HABILITAÇÃO"
+NUMBERED_HEADING = re.compile(
+    r'^[ \t]*\d{1,2}(?:\.\d{1,2})?\.?[ \t]*[-–)]?[ \t]+[A-ZÁÉÍÓÚÂÊÔÃÕÇ][A-ZÁÉÍÓÚÂÊÔÃÕÇ0-9 ,/()\-–]{3,150}$',
+    re.MULTILINE
+)
+
+# Linhas de paginação: "Página 3 de 40", "Pág. 3", "- 3 -", "Fls. 12", "3/40"
+PAGE_LINE = re.compile(
+    r'^(?:p[áa]g(?:ina)?\.?\s*\d+(?:\s*(?:de|/)\s*\d+)?|-\s*\d+\s*-|fls?\.?\s*\d+|\d+\s*/\s*\d+)$',
+    re.IGNORECASE
+)
+
+# Linhas de sumário com pontilhado: "5. DO OBJETO ........ 12"
+TOC_LINE = re.compile(r'\.{4,}\s*\d*$')
+
+# Cabeçalhos/rodapés: linhas curtas que se repetem a cada página
+REPEATED_LINE_MIN_COUNT = 3
+REPEATED_LINE_CHARS = (8, 120)
+
+# ~3.000 tokens por trecho, deixando espaço para prompt e resposta
+DEFAULT_MAX_CHUNK_CHARS = 12000
+
+@dataclass
+class EditalSection:
+    key: str
+    title: str
+    text: str
+
+    @property
+    def content_hash(self):
+        normalized = ' '.join(self.text.split())
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+@dataclass
+class EditalChunk:
+    index: int
+    title: str
+    text: str
+    section_keys: list = field(default_factory=list)
+
+def _is_heading(line):
+    return bool(KEYWORD_HEADING.match(line) or NUMBERED_HEADING.match(line))
+
+def compact_edital_text(text):
+    """Remover ruído de editais extraídos de PDF antes de enviá-los ao modelo.
+    
+    Tira paginação, sumário, cabeçalhos e rodapés repetidos (mantendo a primeira
+    ocorrência) e espaços redundantes. Títulos de seção nunca são removidos.
+    """
+    lines = [re.sub(r'[ \t\u00a0]+', ' ', line).strip() for line in (text or '').splitlines()]
+    min_chars, max_chars = REPEATED_LINE_CHARS
+    counts = Counter(line for line in lines if min_chars <= len(line) <= max_chars)
+    
+    kept, seen_repeated = [], set()
+    for line in lines:
+        if PAGE_LINE.match(line) or TOC_LINE.search(line):
+            continue
+        if counts.get(line, 0) >= REPEATED_LINE_MIN_COUNT and not _is_heading(line):
+            if line in seen_repeated:
+                continue
+            seen_repeated.add(line)
+        kept.append(line)
+    
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(kept)).strip()
+
+def _heading_positions(text):
+    positions = {}
+    for pattern in (KEYWORD_HEADING, NUMBERED_HEADING):
+        for match in pattern.finditer(text):
+            positions.setdefault(match.start(), match.group(0).strip())
+    return sorted(positions.items())
+
+def _section_key(title, seen):
+    ascii_title = unicodedata.normalize('NFKD', title).encode('ascii', 'ignore').decode('ascii')
+    base = re.sub(r'[^a-z0-9]+', '-', ascii_title.lower()).strip('-')[:60] or 'secao'
+    seen[base] = seen.get(base, 0) + 1
+    return base if seen[base] == 1 else f'{base}-{seen[base]}'
+
+def split_sections(text):
+    """Dividir o edital em seções pelos títulos de cláusulas, anexos e itens"""
+    text = text or ''
+    headings = _heading_positions(text)
+    seen = {}
+    sections = []
+    
+    # Preâmbulo antes do primeiro título
+    first_start = headings[0][0] if headings else len(text)
+    preamble = text[:first_start].strip()
+    if preamble:
+        sections.append(EditalSection(_section_key('preambulo', seen), 'Preâmbulo', preamble))
+    
+    for i, (start, title) in enumerate(headings):
+        end = headings[i + 1][0] if i + 1 < len(headings) else len(text)
+        body = text[start:end].strip()
+        if body:
+            sections.append(EditalSection(_section_key(title, seen), title, body))
+    
+    return sections
+
+def _split_oversized(text, max_chars):
+    """Quebrar um texto maior que o limite em parágrafos e, se preciso, em cortes fixos"""
+    pieces = []
+    current = ''
+    for paragraph in re.split(r'\n\s*\n', text):
+        while len(paragraph) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            pieces.append(current)
+            current = ''
+        current = f'{current}\n\n{paragraph}' if current else paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+def build_chunks(sections, max_chars=DEFAULT_MAX_CHUNK_CHARS):
+    """Agrupar seções consecutivas em trechos de até max_chars caracteres"""
+    chunks = []
+    titles, keys, parts, size = [], [], [], 0
+    
+    def flush():
+        nonlocal titles, keys, parts, size
+        if parts:
+            title = titles[0] if len(titles) == 1 else f'{titles[0]} … {titles[-1]}'
+            chunks.append(EditalChunk(len(chunks), title, '\n\n'.join(parts), keys))
+        titles, keys, parts, size = [], [], [], 0
+    
+    for section in sections:
+        if len(section.text) > max_chars:
+            flush()
+            pieces = _split_oversized(section.text, max_chars)
+            for n, piece in enumerate(pieces, start=1):
+                title = f'{section.title} (parte {n}/{len(pieces)})' if len(pieces) > 1 else section.title
+                chunks.append(EditalChunk(len(chunks), title, piece, [section.key]))
+            continue
+        if size + len(section.text) > max_chars:
+            flush()
+        titles.append(section.title)
+        keys.append(section.key)
+        parts.append(section.text)
+        size += len(section.text) + 2
+    
+    flush()
+    return chunks
+
+def chunk_edital(text, max_chars=DEFAULT_MAX_CHUNK_CHARS):
+    """Dividir o edital em trechos respeitando a estrutura de seções"""
+    return build_chunks(split_sections(text), max_chars)
@@ -0,0 +1,55 @@
+import json
+import os
+
+from src.models.case import Case
+from src.models.edital_analysis import EditalAnalysis
+from src.models.user import db
+from src.services.edital_pipeline import findings_fingerprint
+
+# Análises guardadas por caso (as mais antigas deixam de servir de base)
+HISTORY_PER_CASE = int(os.getenv('EDITAL_HISTORY_PER_CASE', 5))
+# Análises sem caso (reenvio só por base_analysis_id): teto global, as mais antigas são descartadas
+HISTORY_WITHOUT_CASE = int(os.getenv('EDITAL_HISTORY_WITHOUT_CASE', 100))
+
+def find_base_analysis(company_data, case_id=None, base_analysis_id=None):
+    """Análise anterior compatível (a indicada ou a última do caso), como snapshot, ou None"""
+    query = EditalAnalysis.query.filter_by(fingerprint=findings_fingerprint(company_data))
+    if base_analysis_id:
+        record = query.filter_by(id=base_analysis_id).first()
+    elif case_id:
+        record = query.filter_by(case_id=case_id).order_by(EditalAnalysis.id.desc()).first()
+    else:
+        return None
+    return record.snapshot() if record else None
+
+def record_edital_analysis(result, company_data, case_id=None, edital_document_id=None):
+    """Gravar seções e achados da análise em trechos; retorna o id para reenvios (base_analysis_id)"""
+    if case_id and db.session.get(Case, case_id) is None:
+        case_id = None
+    record = EditalAnalysis(
+        case_id=case_id,
+        edital_document_id=edital_document_id,
+        fingerprint=findings_fingerprint(company_data),
+        content_hash=result['content_hash'],
+        sections=json.dumps(result['sections'], ensure_ascii=False),
+        units=json.dumps(result['units'], ensure_ascii=False),
+        analysis=result['analysis'],
+        tokens_used=result['tokens_used']
+    )
+    db.session.add(record)
+    db.session.flush()
+
+    stale = (
+        EditalAnalysis.query
+        .filter(EditalAnalysis.case_id == case_id if case_id else EditalAnalysis.case_id.is_(None))
+        .order_by(EditalAnalysis.id.desc())
+        .offset(HISTORY_PER_CASE if case_id else HISTORY_WITHOUT_CASE)
+        .with_entities(EditalAnalysis.id)
+    )
+    EditalAnalysis.query.filter(EditalAnalysis.id.in_(stale.scalar_subquery())).delete(synchronize_session=False)
+    db.session.commit()
+    return record.id
+
+def without_history_fields(result):
+    """Tirar da resposta os dados só usados para gravar a base (seções e achados por trecho)"""
+    return {key: value for key, value in result.items() if key not in ('content_hash', 'sections', 'units')}
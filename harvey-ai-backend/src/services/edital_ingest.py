@@ -0,0 +1,232 @@
+"""Extração de texto de editais enviados por upload (PDF, DOCX ou TXT).
+
+A extração roda em um processo à parte (python -m src.services.edital_ingest),
+página a página, e o texto normalizado vai para um arquivo: a memória do
+servidor não cresce com o tamanho do edital.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import unicodedata
+from collections import Counter
+
+from src.services.edital_chunker import KEYWORD_HEADING, NUMBERED_HEADING, PAGE_LINE
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_UPLOAD_DIR = os.path.join(BACKEND_DIR, 'src', 'database', 'uploads')
+
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_MB', 50)) * 1024 * 1024
+# Extrações simultâneas (um processo cada) e tempo máximo de cada uma
+INGEST_PROCESSES = int(os.getenv('INGEST_PROCESSES', 2))
+INGEST_TIMEOUT = float(os.getenv('INGEST_TIMEOUT', 600))
+
+FILE_KINDS = {'.pdf': 'pdf', '.docx': 'docx', '.txt': 'txt'}
+
+# Cabeçalhos e rodapés: linhas nas bordas da página que se repetem na maior parte das páginas
+EDGE_LINES = 3
+REPEATED_EDGE_RATIO = 0.5
+MIN_PAGES_FOR_EDGES = 3
+
+# Parágrafos por "página" em DOCX e TXT, que não têm paginação própria
+BLOCK_LINES = 200
+
+PAGE_BREAK = '\f\n'
+
+# Numeração de página no fim da linha ("... - Página 3 de 90", "Fls. 12") ou linha só com o número
+PAGINATION_HINT = re.compile(
+    r'(?:\b(?:p[áa]g(?:ina)?|fls?|folha)\.?\s*\d+(?:\s*(?:de|/)\s*\d+)?|^[-–\s]*\d+[-–\s]*)$', re.IGNORECASE
+)
+
+_slots = threading.BoundedSemaphore(max(1, INGEST_PROCESSES))
+
+def upload_dir():
+    path = os.getenv('UPLOAD_DIR', DEFAULT_UPLOAD_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def file_kind(filename):
+    """Tipo de extração pela extensão do arquivo, ou None se não suportado"""
+    return FILE_KINDS.get(os.path.splitext(filename or '')[1].lower())
+
+class UploadFile:
+    """Arquivo do upload gravado direto no disco, com o SHA-256 calculado durante a escrita"""
+
+    def __init__(self, directory):
+        self._file = tempfile.NamedTemporaryFile('wb+', dir=directory, prefix='upload-', suffix='.part', delete=False)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+def upload_stream_factory(total_content_length, content_type, filename=None, content_length=None):
+    """stream_factory do parser multipart: cada arquivo vai para UPLOAD_DIR em vez da memória"""
+    return UploadFile(upload_dir())
+
+def store_upload(upload_file, kind):
+    """Mover o arquivo recebido para <sha256>.<tipo>; envios repetidos ocupam um só arquivo"""
+    upload_file.close()
+    path = os.path.join(upload_dir(), f'{upload_file.sha256.hexdigest()}.{kind}')
+    os.replace(upload_file.name, path)
+    return path
+
+def discard_upload(upload_file):
+    upload_file.close()
+    if os.path.exists(upload_file.name):
+        os.remove(upload_file.name)
+
+def _iter_pdf_pages(path):
+    try:
+        import pypdf
+    except ImportError:
+        raise RuntimeError('Extração de PDF requer o pacote pypdf')
+    reader = pypdf.PdfReader(path)
+    for page in reader.pages:
+        yield page.extract_text() or ''
+
+def _iter_docx_blocks(path):
+    try:
+        import docx
+        from docx.oxml.ns import qn
+        from docx.table import Table
+        from docx.text.paragraph import Paragraph
+    except ImportError:
+        raise RuntimeError('Extração de DOCX requer o pacote python-docx')
+    document = docx.Document(path)
+    lines = []
+    # Parágrafos e tabelas na ordem do documento (cabeçalhos e rodapés ficam em outras partes)
+    for element in document.element.body.iterchildren():
+        if element.tag == qn('w:p'):
+            lines.append(Paragraph(element, document).text)
+        elif element.tag == qn('w:tbl'):
+            for row in Table(element, document).rows:
+                lines.append(' | '.join(cell.text.strip() for cell in row.cells))
+        if len(lines) >= BLOCK_LINES:
+            yield '\n'.join(lines)
+            lines = []
+    if lines:
+        yield '\n'.join(lines)
+
+def _iter_text_blocks(path):
+    with open(path, encoding='utf-8-sig', errors='replace') as source:
+        lines = []
+        for line in source:
+            lines.append(line.rstrip('\n'))
+            if len(lines) >= BLOCK_LINES:
+                yield '\n'.join(lines)
+                lines = []
+        if lines:
+            yield '\n'.join(lines)
+
+PAGE_READERS = {'pdf': _iter_pdf_pages, 'docx': _iter_docx_blocks, 'txt': _iter_text_blocks}
+
+def normalize_page(text):
+    """Texto da página com ligaduras desfeitas, hifenização de fim de linha unida e espaços limpos"""
+    text = unicodedata.normalize('NFKC', text)
+    text = ''.join(char for char in text if char in '\n\t' or unicodedata.category(char)[0] != 'C')
+    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)
+    lines = [re.sub(r'[ \t]+', ' ', line).strip() for line in text.split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+def edge_signature(line):
+    # Em linhas de paginação os números viram #: "Edital 45/2024 - Página 3" e "... Página 4" se
+    # igualam. As demais só se repetem se forem idênticas (itens "5.1 ...", "6.1 ..." são corpo)
+    line = line.lower()
+    if PAGINATION_HINT.search(line):
+        return re.sub(r'\d+', '#', line)
+    return line
+
+def _edge_indexes(lines):
+    filled = [index for index, line in enumerate(lines) if line]
+    return set(filled[:EDGE_LINES] + filled[-EDGE_LINES:])
+
+def _is_heading(line):
+    return bool(KEYWORD_HEADING.match(line) or NUMBERED_HEADING.match(line))
+
+def extract_text(source, kind, output):
+    """Extrair e normalizar o texto em duas passadas sobre arquivos, sem guardar o documento em memória.
+
+    A primeira grava as páginas normalizadas e conta as assinaturas das linhas
+    de borda; a segunda remove cabeçalhos e rodapés repetidos e a paginação.
+    """
+    edge_counts = Counter()
+    pages = 0
+    with tempfile.TemporaryFile('w+', encoding='utf-8', newline='\n') as spool:
+        for raw in PAGE_READERS[kind](source):
+            page = normalize_page(raw)
+            lines = page.split('\n')
+            edge_counts.update({edge_signature(lines[index]) for index in _edge_indexes(lines)})
+            spool.write(page + '\n' + PAGE_BREAK)
+            pages += 1
+
+        threshold = math.inf
+        if kind == 'pdf' and pages >= MIN_PAGES_FOR_EDGES:
+            threshold = max(MIN_PAGES_FOR_EDGES, math.ceil(pages * REPEATED_EDGE_RATIO))
+
+        spool.seek(0)
+        removed = chars = 0
+        with open(output, 'w', encoding='utf-8') as target:
+            page_lines = []
+            for line in spool:
+                if line != PAGE_BREAK:
+                    page_lines.append(line.rstrip('\n'))
+                    continue
+                edges = _edge_indexes(page_lines)
+                kept = []
+                for index, text in enumerate(page_lines):
+                    repeated = index in edges and edge_counts[edge_signature(text)] >= threshold
+                    if (repeated or PAGE_LINE.match(text)) and not _is_heading(text):
+                        removed += 1
+                        continue
+                    kept.append(text)
+                page_text = '\n'.join(kept).strip()
+                if page_text:
+                    if chars:
+                        target.write('\n\n')
+                        chars += 2
+                    target.write(page_text)
+                    chars += len(page_text)
+                page_lines = []
+
+    return {'kind': kind, 'pages': pages, 'chars': chars, 'removed_lines': removed}
+
+class ExtractionError(Exception):
+    """Arquivo que não pôde ser lido (corrompido, protegido ou de tipo inválido)"""
+
+def run_extraction(source, kind, output):
+    """Executar extract_text em um processo filho; a memória usada é devolvida ao fim de cada arquivo"""
+    with _slots:
+        result = subprocess.run(
+            [sys.executable, '-m', 'src.services.edital_ingest', source, kind, output],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            timeout=INGEST_TIMEOUT
+        )
+    if result.returncode != 0:
+        lines = (result.stderr or '').strip().splitlines()
+        raise ExtractionError(lines[-1] if lines else f'Extração terminou com código {result.returncode}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='Extrair o texto normalizado de um edital')
+    parser.add_argument('source')
+    parser.add_argument('kind', choices=sorted(PAGE_READERS))
+    parser.add_argument('output')
+    args = parser.parse_args()
+    print(json.dumps(extract_text(args.source, args.kind, args.output)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.services.edital_chunker import DEFAULT_MAX_CHUNK_CHARS, EditalChunk, build_chunks, split_sections
+from src.services.llm_cache import cache_enabled_for, cached_chat_completion
+from src.services.tokens import count_message_tokens
+
+MAP_MODEL = 'gpt-4'
+REDUCE_MODEL = 'gpt-4'
+MAX_CONCURRENCY = 4
+# Teto do max_concurrency pedido pelo cliente (trechos enviados ao modelo ao mesmo tempo)
+CHUNK_MAX_CONCURRENCY = int(os.getenv('CHUNK_MAX_CONCURRENCY', 8))
+MAP_MAX_TOKENS = 700
+REDUCE_MAX_TOKENS = 2000
+
+# Limite de achados parciais enviados de uma vez na etapa de consolidação
+MAX_REDUCE_INPUT_CHARS = 16000
+
+MAP_PROMPT = """
+Você é um especialista em licitações públicas brasileiras (Lei 14.133/2021).
+Você receberá UM TRECHO de um edital maior. Liste de forma objetiva apenas os achados
+deste trecho, citando a cláusula ou item correspondente, nas categorias:
+
+1. Vícios e Irregularidades
+2. Oportunidades de Impugnação
+3. Estratégias Recomendadas
+4. Riscos Identificados
+
+Se não houver achados em uma categoria, escreva "Nenhum achado". Não repita o texto do edital.
+"""
+
+CONDENSE_PROMPT = """
+Consolide os achados parciais abaixo, extraídos de trechos de um mesmo edital, mantendo as
+quatro categorias (Vícios e Irregularidades, Oportunidades de Impugnação, Estratégias
+Recomendadas, Riscos Identificados). Remova duplicidades e preserve as referências a cláusulas.
+"""
+
+REDUCE_INSTRUCTIONS = """
+Você NÃO receberá o edital completo, e sim os achados de cada trecho analisado separadamente.
+Consolide esses achados em um único relatório com as quatro seções acima, eliminando
+duplicidades e preservando as referências às cláusulas, anexos e itens do edital.
+Se houver trechos não analisados, informe no relatório que essas partes do edital não foram avaliadas.
+"""
+
+# Trechos inalterados entre reenvios do edital são servidos pelo cache
+CACHE_ROUTE = 'analysis.edital.chunk'
+
+# Map e reduce preferem MAP_MODEL/REDUCE_MODEL, com failover nos demais modelos de análise
+ROUTING_TASK = 'analysis'
+
+def _complete(client, model, system_prompt, user_content, max_tokens, use_cache=True):
+    started = time.perf_counter()
+    content, usage, cache_info = cached_chat_completion(
+        client,
+        CACHE_ROUTE,
+        use_cache=use_cache,
+        task=ROUTING_TASK,
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ],
+        max_tokens=max_tokens,
+        temperature=0.3
+    )
+    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+    return content, usage, latency_ms, cache_info['hit']
+
+def analyze_chunk(client, chunk, company_data, model=MAP_MODEL, use_cache=True):
+    """Etapa map: analisar um trecho do edital isoladamente"""
+    user_content = (
+        f"Dados da empresa: {company_data}\n\n"
+        f"Trecho {chunk.index + 1} ({chunk.title}):\n{chunk.text}"
+    )
+    stats = {'index': chunk.index, 'title': chunk.title, 'chars': len(chunk.text)}
+    try:
+        findings, usage, latency_ms, cached = _complete(
+            client, model, MAP_PROMPT, user_content, MAP_MAX_TOKENS, use_cache
+        )
+    except Exception as e:
+        stats.update({'error': str(e), 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'latency_ms': None})
+        return None, stats
+    
+    stats.update(usage, latency_ms=latency_ms, cached=cached)
+    return findings, stats
+
+def _call_usage(usage):
+    # Modelo e tokens de entrada/saída de cada chamada, para o custo da análise
+    return {key: usage[key] for key in ('model', 'prompt_tokens', 'completion_tokens', 'total_tokens')}
+
+def _format_findings(findings):
+    return '\n\n'.join(f'### {title}\n{text}' for title, text in findings)
+
+def _condense(client, findings, model, reduce_stats, use_cache=True):
+    """Reduzir achados em lotes até caberem em uma única chamada de consolidação"""
+    while len(_format_findings(findings)) > MAX_REDUCE_INPUT_CHARS and len(findings) > 1:
+        batches, current, size = [], [], 0
+        for item in findings:
+            item_size = len(item[0]) + len(item[1])
+            if current and size + item_size > MAX_REDUCE_INPUT_CHARS:
+                batches.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += item_size
+        batches.append(current)
+        if len(batches) == len(findings):
+            break
+        
+        condensed = []
+        for batch in batches:
+            if len(batch) == 1:
+                condensed.append(batch[0])
+                continue
+            text, usage, latency_ms, cached = _complete(
+                client, model, CONDENSE_PROMPT, _format_findings(batch), MAP_MAX_TOKENS, use_cache
+            )
+            reduce_stats.append({'step': 'condense', **_call_usage(usage), 'latency_ms': latency_ms, 'cached': cached})
+            condensed.append((f'{batch[0][0]} … {batch[-1][0]}', text))
+        findings = condensed
+    return findings
+
+def estimate_chunked_usage(edital_content, company_data, max_chunk_chars=DEFAULT_MAX_CHUNK_CHARS, map_model=MAP_MODEL):
+    """Requisições e tokens (entrada + saída máxima) de uma análise em trechos sem base anterior"""
+    chunks = build_chunks(split_sections(edital_content), max_chunk_chars)
+    map_tokens = sum(
+        count_message_tokens([
+            {"role": "system", "content": MAP_PROMPT},
+            {"role": "user", "content": f"Dados da empresa: {company_data}\n\nTrecho {chunk.index + 1} ({chunk.title}):\n{chunk.text}"}
+        ], map_model) + MAP_MAX_TOKENS
+        for chunk in chunks
+    )
+    # Consolidação: no máximo a saída de cada trecho como entrada, mais o relatório
+    reduce_tokens = len(chunks) * MAP_MAX_TOKENS + REDUCE_MAX_TOKENS
+    return len(chunks) + 1, map_tokens + reduce_tokens
+
+def findings_fingerprint(company_data, map_model=MAP_MODEL):
+    """Achados de uma análise anterior só valem para os mesmos dados da empresa, prompt e modelo"""
+    payload = json.dumps([company_data, map_model, MAP_PROMPT], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _reusable_groups(previous_units):
+    # Sequência de hashes de seção -> trechos anteriores (várias partes quando a seção foi quebrada)
+    runs = []
+    for unit in previous_units:
+        key = tuple(unit['section_hashes'])
+        if runs and len(key) == 1 and runs[-1][0] == key:
+            runs[-1][1].append(unit)
+        else:
+            runs.append((key, [unit]))
+    
+    groups = {}
+    for key, units in runs:
+        if key and all(unit.get('findings') for unit in units):
+            groups.setdefault(key, units)
+    by_first_hash = {}
+    for key in sorted(groups, key=len, reverse=True):
+        by_first_hash.setdefault(key[0], []).append(key)
+    return groups, by_first_hash
+
+def plan_chunks(sections, previous_units=(), max_chunk_chars=DEFAULT_MAX_CHUNK_CHARS):
+    """Trechos do edital, com os achados anteriores dos trechos cujas seções não mudaram.
+    
+    Sequências de seções idênticas às de um trecho da análise anterior mantêm o
+    agrupamento e os achados; as demais (alteradas, novas ou que dividiam o
+    trecho com uma alteração) formam trechos novos. Retorna [(trecho, unidade
+    anterior ou None)].
+    """
+    groups, by_first_hash = _reusable_groups(previous_units)
+    hashes = [section.content_hash for section in sections]
+    planned, pending = [], []
+    
+    def flush():
+        planned.extend((chunk, None) for chunk in build_chunks(pending, max_chunk_chars))
+        pending.clear()
+    
+    position = 0
+    while position < len(sections):
+        match = next(
+            (key for key in by_first_hash.get(hashes[position], ())
+             if tuple(hashes[position:position + len(key)]) == key),
+            None
+        )
+        if match is None:
+            pending.append(sections[position])
+            position += 1
+            continue
+        flush()
+        keys = [section.key for section in sections[position:position + len(match)]]
+        planned.extend((EditalChunk(0, unit['title'], '', keys), unit) for unit in groups[match])
+        position += len(match)
+    flush()
+    
+    return [
+        (EditalChunk(index, chunk.title, chunk.text, chunk.section_keys), unit)
+        for index, (chunk, unit) in enumerate(planned)
+    ]
+
+def diff_sections(previous_sections, sections):
+    """Seções alteradas, novas e removidas em relação à análise anterior (por chave do título)"""
+    previous = {section['key']: section for section in previous_sections}
+    current = {section['key'] for section in sections}
+    changed = [section['title'] for section in sections if section['key'] in previous and previous[section['key']]['hash'] != section['hash']]
+    added = [section['title'] for section in sections if section['key'] not in previous]
+    return {
+        'unchanged': len(sections) - len(changed) - len(added),
+        'changed': changed,
+        'added': added,
+        'removed': [section['title'] for key, section in previous.items() if key not in current]
+    }
+
+def run_chunked_analysis(client, edital_content, company_data, report_prompt,
+                         max_concurrency=MAX_CONCURRENCY, max_chunk_chars=DEFAULT_MAX_CHUNK_CHARS,
+                         map_model=MAP_MODEL, reduce_model=REDUCE_MODEL, use_cache=True, previous=None):
+    """Analisar um edital grande em trechos paralelos e consolidar no relatório final.
+    
+    Com previous (snapshot de EditalAnalysis), só os trechos com seções
+    alteradas vão ao modelo; os demais reaproveitam os achados anteriores. O
+    resultado traz sections e units para gravar a base da próxima reanálise.
+    """
+    started = time.perf_counter()
+    sections = split_sections(edital_content)
+    if not sections:
+        raise ValueError('Edital sem conteúdo para análise')
+    
+    planned = plan_chunks(sections, previous['units'] if previous else (), max_chunk_chars)
+    pending = [chunk for chunk, unit in planned if unit is None]
+    analyzed = {}
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(pending)))) as executor:
+            results = executor.map(lambda chunk: analyze_chunk(client, chunk, company_data, map_model, use_cache), pending)
+            analyzed = dict(zip((chunk.index for chunk in pending), results))
+    
+    section_hashes = {section.key: section.content_hash for section in sections}
+    chunk_stats, units, findings = [], [], []
+    for chunk, unit in planned:
+        if unit is None:
+            text, stats = analyzed[chunk.index]
+        else:
+            text = unit['findings']
+            stats = {
+                'index': chunk.index, 'title': chunk.title, 'chars': unit.get('chars', 0), 'reused': True,
+                'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'latency_ms': None
+            }
+        chunk_stats.append(stats)
+        units.append({
+            'title': chunk.title,
+            'section_hashes': [section_hashes[key] for key in chunk.section_keys],
+            'chars': stats['chars'],
+            'findings': text
+        })
+        if text:
+            findings.append((chunk.title, text))
+    if not findings:
+        raise RuntimeError(chunk_stats[0].get('error') or 'Falha na análise dos trechos do edital')
+    # Trechos cuja chamada falhou ficam fora dos achados: o relatório e a resposta dizem quais são
+    failed_sections = [stats['title'] for stats in chunk_stats if stats.get('error')]
+    
+    section_list = [{'key': section.key, 'title': section.title, 'hash': section.content_hash} for section in sections]
+    content_hash = hashlib.sha256('\n'.join(section['hash'] for section in section_list).encode('utf-8')).hexdigest()
+    
+    reduce_stats = []
+    if previous and not pending and previous.get('analysis') and previous.get('content_hash') == content_hash:
+        # Edital idêntico ao da análise anterior: o relatório consolidado também é reaproveitado
+        analysis = previous['analysis']
+    else:
+        findings = _condense(client, findings, reduce_model, reduce_stats, use_cache)
+        reduce_input = f"Dados da empresa: {company_data}\n\nAchados por trecho do edital:\n\n{_format_findings(findings)}"
+        if failed_sections:
+            reduce_input += '\n\nTrechos não analisados (falha na chamada ao modelo):\n' + '\n'.join(f'- {title}' for title in failed_sections)
+        analysis, usage, latency_ms, cached = _complete(
+            client,
+            reduce_model,
+            f'{report_prompt}\n{REDUCE_INSTRUCTIONS}',
+            reduce_input,
+            REDUCE_MAX_TOKENS,
+            use_cache
+        )
+        reduce_stats.append({'step': 'reduce', **_call_usage(usage), 'latency_ms': latency_ms, 'cached': cached})
+    
+    titles = {section.key: section.title for section in sections}
+    reanalyzed = list(dict.fromkeys(titles[key] for chunk in pending for key in chunk.section_keys))
+    called = [stats for stats in chunk_stats if not stats.get('reused')] + reduce_stats
+    
+    return {
+        'analysis': analysis,
+        'chunks': chunk_stats,
+        'reduce': reduce_stats,
+        'failed_chunks': len(failed_sections),
+        'failed_sections': failed_sections,
+        'tokens_used': sum(stats['total_tokens'] for stats in chunk_stats) + sum(stats['total_tokens'] for stats in reduce_stats),
+        'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+        'cache': {
+            'enabled': cache_enabled_for(CACHE_ROUTE, use_cache),
+            'hits': sum(1 for stats in called if stats.get('cached')),
+            'misses': sum(1 for stats in called if not stats.get('cached'))
+        },
+        'incremental': {
+            'base_analysis_id': previous['id'] if previous else None,
+            'sections': diff_sections(previous['sections'] if previous else [], section_list),
+            'reanalyzed_sections': reanalyzed,
+            'reused_chunks': len(planned) - len(pending),
+            'analyzed_chunks': len(pending),
+            'reused_report': not reduce_stats
+        },
+        'content_hash': content_hash,
+        'sections': section_list,
+        'units': units
+    }
@@ -0,0 +1,588 @@
+"""Triagem local de editais por regras, sem chamar o modelo.
+
+Palavras-gatilho das cláusulas restritivas são buscadas de uma vez com
+Aho-Corasick (pyahocorasick; sem o pacote, uma regex única com as mesmas
+palavras) sobre o texto em minúsculas e sem acentos; cada ocorrência é
+confirmada por uma verificação na frase. Prazos, datas, valores e citações
+da Lei 14.133/2021 são extraídos por regex compiladas.
+"""
+import bisect
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from src.services.edital_chunker import KEYWORD_HEADING, NUMBERED_HEADING, split_sections
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+SEVERITY_ORDER = {'alta': 0, 'media': 1, 'baixa': 2}
+
+# Ocorrências guardadas por regra e itens extraídos por tipo
+MAX_FINDINGS_PER_RULE = 5
+MAX_EXTRACTED_ITEMS = 20
+EXCERPT_CHARS = 240
+
+# Índices contábeis acima de 1,0 exigem justificativa; acima deste valor são considerados anormais
+LIQUIDITY_USUAL_LIMIT = 1.0
+LIQUIDITY_ABNORMAL_LIMIT = 1.5
+
+# Art. 55: prazos mínimos (dias úteis) entre a divulgação do edital e a apresentação das propostas
+MIN_PROPOSAL_BUSINESS_DAYS = {'bens': 8, 'servicos': 10, 'obras': 10}
+
+def _fold_table():
+    # Latin-1 -> minúscula sem acento, um byte por caractere (º, ª e ° viram o, a e o)
+    table = bytearray(range(256))
+    for code in range(256):
+        char = chr(code)
+        base = unicodedata.normalize('NFKD', char).encode('ascii', 'ignore').decode('ascii').lower()
+        if len(base) == 1:
+            table[code] = ord(base)
+        elif len(char.lower()) == 1 and ord(char.lower()) < 256:
+            table[code] = ord(char.lower())
+    table[ord('°')] = ord('o')
+    return bytes(table)
+
+_FOLD_TABLE = _fold_table()
+
+def fold(text):
+    """Minúsculas sem acentos, com o mesmo comprimento do original (posições se mantêm).
+
+    Caracteres fora do Latin-1 (travessões, aspas tipográficas) viram "?".
+    """
+    return text.replace('≥', '>').encode('latin-1', 'replace').translate(_FOLD_TABLE).decode('latin-1')
+
+NUMBER_WORDS = {
+    'um': 1, 'uma': 1, 'dois': 2, 'duas': 2, 'tres': 3, 'quatro': 4, 'cinco': 5, 'seis': 6,
+    'sete': 7, 'oito': 8, 'nove': 9, 'dez': 10
+}
+
+PERCENT = re.compile(r'(\d{1,3}(?:[.,]\d+)?)\s*%')
+DURATION_UNITS = r'(dias?\s+uteis|dia\s+util|dias?\s+corridos|dias?|horas?|meses|mes)'
+DAYS = re.compile(r'(\d{1,3})\s*(?:\([^)]{0,30}\)\s*)?' + DURATION_UNITS)
+SIMILAR_ALLOWED = re.compile(r'\bou\s+(?:similar|equivalente)|\b(?:similar|equivalente)\s+ou\s+(?:superior|melhor)|\bde\s+referencia\b')
+SIMILAR_DENIED = re.compile(
+    r'\bnao\s+(?:sera|serao|sendo)\s+(?:aceit|admitid)[oa]s?\s+(?:produtos?\s+|marcas?\s+)?(?:similar|similares|equivalentes?)'
+    r'|\bvedad[ao]s?\b.{0,40}\bsimilar'
+)
+LIQUIDITY_VALUE = re.compile(
+    r'(?:igual\s+ou\s+superior\s+a|igual\s+ou\s+maior\s+(?:a|que|do\s+que)|maior\s+ou\s+igual\s+a|superior\s+a|'
+    r'maior\s+(?:que|do\s+que)|minimo\s+de|>=|>)\s*\(?\s*(\d+(?:[.,]\d+)?)'
+)
+MINIMUM_COUNT = re.compile(
+    r'(?:no\s+minimo|minimo\s+de|pelo\s+menos|ao\s+menos)\s+(\d+|' + '|'.join(NUMBER_WORDS) + r')\b'
+    r'\s*(?:\([^)]{0,20}\)\s*)?atestados'
+)
+EXPERIENCE_TIME = re.compile(r'(?:experiencia|atuacao|existencia|funcionamento)\s+(?:minima\s+)?(?:de\s+)?(?:no\s+minimo\s+)?(\d+)\s*\(?[^)]{0,20}\)?\s*anos?')
+
+def _number(value):
+    value = value.replace('.', '').replace(',', '.') if ',' in value else value
+    try:
+        return float(value)
+    except ValueError:
+        return NUMBER_WORDS.get(value)
+
+def _check_brand(sentence):
+    if SIMILAR_DENIED.search(sentence):
+        return 'não admite produto similar ou equivalente'
+    if SIMILAR_ALLOWED.search(sentence):
+        return None
+    return 'indica marca ou fabricante sem a expressão "ou similar/equivalente"'
+
+def _check_atestado_percent(sentence):
+    values = [_number(value) for value in PERCENT.findall(sentence)]
+    excessive = [value for value in values if value and value > 50]
+    if excessive:
+        return f'exige {max(excessive):g}% do quantitativo (limite legal: 50%)'
+    return None
+
+def _check_atestado_count(sentence):
+    if 'atestado' not in sentence:
+        return None
+    match = MINIMUM_COUNT.search(sentence)
+    if match and (_number(match.group(1)) or 0) >= 2:
+        return f'exige no mínimo {match.group(1)} atestados'
+    return None
+
+def _check_atestado_sum(sentence):
+    if re.search(r'\b(?:vedad[ao]|nao\s+(?:sera|serao)\s+(?:admitid|aceit|permitid)[ao]s?)\b.{0,40}\b(?:soma|somatorio)', sentence):
+        return 'veda o somatório de atestados'
+    return None
+
+def _check_experience_time(sentence):
+    match = EXPERIENCE_TIME.search(sentence)
+    if match:
+        return f'exige tempo mínimo de {match.group(1)} ano(s)'
+    return None
+
+def _check_liquidity(sentence):
+    values = [_number(value) for value in LIQUIDITY_VALUE.findall(sentence)]
+    values = [value for value in values if value and value < 100]
+    if not values or max(values) <= LIQUIDITY_USUAL_LIMIT:
+        return None
+    return f'índice mínimo de {max(values):g}'.replace('.', ',')
+
+def _liquidity_severity(detail):
+    value = float(detail.rsplit(' ', 1)[-1].replace(',', '.'))
+    return 'alta' if value > LIQUIDITY_ABNORMAL_LIMIT else 'media'
+
+def _percent_above(limit, label):
+    def check(sentence):
+        values = [_number(value) for value in PERCENT.findall(sentence)]
+        excessive = [value for value in values if value and value > limit]
+        if excessive:
+            return f'{label} de {max(excessive):g}% (limite legal: {limit:g}%)'
+        return None
+    return check
+
+def _check_impugnation_deadline(sentence):
+    for amount, unit in DAYS.findall(sentence):
+        if 'ute' in unit and int(amount) > 3:
+            return f'exige impugnação com {amount} dias úteis de antecedência (a lei admite até 3)'
+    return None
+
+def _check_appeal_deadline(sentence):
+    if not re.search(r'\b(?:razoes|recurso|recorrer)', sentence):
+        return None
+    for amount, unit in DAYS.findall(sentence):
+        if unit.startswith('dia') and int(amount) < 3:
+            return f'prazo recursal de {amount} dia(s) (a lei garante 3 dias úteis)'
+    return None
+
+def _check_delivery_deadline(sentence):
+    for amount, unit in DAYS.findall(sentence):
+        amount = int(amount)
+        if (unit.startswith('hora') and amount <= 48) or (unit.startswith('dia') and amount <= 2):
+            return f'prazo de {amount} {unit}'
+    return None
+
+@dataclass(frozen=True)
+class ScreeningRule:
+    key: str
+    category: str  # vicio ou risco
+    severity: str  # alta, media ou baixa
+    title: str
+    basis: str
+    keywords: tuple  # gatilhos em minúsculas e sem acento
+    check: object = None  # frase -> detalhe do achado, ou None para descartar
+
+RULES = (
+    ScreeningRule(
+        'marca', 'vicio', 'alta', 'Exigência de marca ou fabricante',
+        'Art. 41, I, da Lei 14.133/2021',
+        ('da marca', 'marca exclusiva', 'somente a marca', 'fabricante exclusivo', 'original do fabricante',
+         'originais do fabricante', 'nao sera aceito similar', 'nao serao aceitos similares',
+         'nao sera aceito produto similar', 'nao serao aceitos produtos similares', 'nao sendo aceitos similares'),
+        _check_brand
+    ),
+    ScreeningRule(
+        'atestado_percentual', 'vicio', 'alta', 'Atestado com quantitativo acima de 50%',
+        'Art. 67, § 2º, da Lei 14.133/2021',
+        ('atestado', 'atestados', 'capacidade tecnica', 'capacitacao tecnica'),
+        _check_atestado_percent
+    ),
+    ScreeningRule(
+        'atestado_quantidade', 'vicio', 'media', 'Número mínimo de atestados',
+        'Art. 67 da Lei 14.133/2021',
+        ('atestado', 'atestados'),
+        _check_atestado_count
+    ),
+    ScreeningRule(
+        'atestado_somatorio', 'vicio', 'media', 'Vedação ao somatório de atestados',
+        'Art. 67 da Lei 14.133/2021',
+        ('soma de atestados', 'somatorio de atestados', 'soma dos atestados', 'somatorio dos atestados'),
+        _check_atestado_sum
+    ),
+    ScreeningRule(
+        'experiencia_minima', 'vicio', 'media', 'Tempo mínimo de experiência ou de existência',
+        'Art. 67 da Lei 14.133/2021',
+        ('experiencia minima', 'experiencia de', 'tempo de experiencia', 'tempo minimo', 'anos de existencia',
+         'anos de atuacao', 'anos de funcionamento'),
+        _check_experience_time
+    ),
+    ScreeningRule(
+        'indice_liquidez', 'vicio', 'alta', 'Índice contábil não usual',
+        'Art. 69, § 5º, da Lei 14.133/2021',
+        ('liquidez geral', 'liquidez corrente', 'liquidez seca', 'solvencia geral', 'indice de liquidez',
+         'indices de liquidez', 'grau de endividamento'),
+        _check_liquidity
+    ),
+    ScreeningRule(
+        'patrimonio_liquido', 'vicio', 'alta', 'Capital ou patrimônio líquido mínimo acima de 10%',
+        'Art. 69, § 4º, da Lei 14.133/2021',
+        ('patrimonio liquido', 'capital social', 'capital minimo'),
+        _percent_above(10, 'exigência')
+    ),
+    ScreeningRule(
+        'garantia_proposta', 'vicio', 'media', 'Garantia de proposta acima de 1%',
+        'Art. 58, § 1º, da Lei 14.133/2021',
+        ('garantia de proposta', 'garantia da proposta', 'garantia de participacao'),
+        _percent_above(1, 'garantia')
+    ),
+    ScreeningRule(
+        'prazo_impugnacao', 'vicio', 'media', 'Prazo de impugnação mais restrito que o legal',
+        'Art. 164 da Lei 14.133/2021',
+        ('impugnacao', 'impugnacoes', 'impugnar'),
+        _check_impugnation_deadline
+    ),
+    ScreeningRule(
+        'prazo_recurso', 'vicio', 'alta', 'Prazo recursal inferior ao legal',
+        'Art. 165, I, da Lei 14.133/2021',
+        ('razoes recursais', 'razoes do recurso', 'prazo para recurso', 'prazo recursal', 'interposicao de recurso'),
+        _check_appeal_deadline
+    ),
+    ScreeningRule(
+        'prazo_entrega', 'risco', 'media', 'Prazo de entrega ou execução exíguo',
+        'Art. 5º da Lei 14.133/2021 (competitividade e razoabilidade)',
+        ('prazo de entrega', 'prazo maximo de entrega', 'prazo para entrega', 'entregar em ate', 'entregues em ate',
+         'prazo de execucao', 'prazo para inicio'),
+        _check_delivery_deadline
+    ),
+    ScreeningRule(
+        'lei_revogada', 'risco', 'alta', 'Fundamentação em lei revogada',
+        'Art. 193, II, da Lei 14.133/2021 (Leis 8.666/1993, 10.520/2002 e 12.462/2011 revogadas)',
+        ('lei 8.666', 'lei no 8.666', 'lei n 8.666', 'lei n. 8.666', 'lei federal 8.666', 'lei federal no 8.666',
+         'lei 10.520', 'lei no 10.520', 'lei n 10.520', 'lei federal no 10.520', 'lei 12.462', 'lei no 12.462')
+    ),
+)
+
+RULES_BY_KEY = {rule.key: rule for rule in RULES}
+
+def _build_matcher():
+    keywords = {}
+    for rule in RULES:
+        for keyword in rule.keywords:
+            keywords.setdefault(keyword, []).append(rule.key)
+
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for keyword, rule_keys in keywords.items():
+            automaton.add_word(keyword, (len(keyword), tuple(rule_keys)))
+        automaton.make_automaton()
+
+        def find(folded):
+            for end, (length, rule_keys) in automaton.iter(folded):
+                yield end - length + 1, end + 1, rule_keys
+        return 'aho-corasick', find
+
+    pattern = re.compile('|'.join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True)))
+
+    def find(folded):
+        for match in pattern.finditer(folded):
+            yield match.start(), match.end(), tuple(keywords[match.group(0)])
+    return 'regex', find
+
+MATCHER, _find_keywords = _build_matcher()
+
+def _is_word(char):
+    return char.isalnum() or char == '_'
+
+def _follows_word(folded, position):
+    return position > 0 and _is_word(folded[position - 1])
+
+def _sentence_bounds(text, start, end):
+    # Frase = linha (parágrafo) do gatilho, limitada a EXCERPT_CHARS de cada lado
+    left = max(text.rfind('\n', 0, start) + 1, start - EXCERPT_CHARS)
+    right = text.find('\n', end)
+    right = min(len(text) if right == -1 else right, end + EXCERPT_CHARS)
+    return left, right
+
+def _excerpt(text, left, right):
+    excerpt = ' '.join(text[left:right].split())
+    return excerpt if len(excerpt) <= EXCERPT_CHARS else excerpt[:EXCERPT_CHARS - 1] + '…'
+
+class _SectionIndex:
+    """Título da seção que contém uma posição do texto"""
+
+    def __init__(self, text):
+        headings = {}
+        for pattern in (KEYWORD_HEADING, NUMBERED_HEADING):
+            for match in pattern.finditer(text):
+                headings.setdefault(match.start(), match.group(0).strip())
+        self.starts = sorted(headings)
+        self.titles = [headings[start] for start in self.starts]
+
+    def title_at(self, position):
+        index = bisect.bisect_right(self.starts, position) - 1
+        return self.titles[index] if index >= 0 else 'Preâmbulo'
+
+def _find_rule_violations(text, folded, sections):
+    findings = []
+    seen = set()
+    counts = {}
+    for start, end, rule_keys in _find_keywords(folded):
+        if _follows_word(folded, start) or (end < len(folded) and _is_word(folded[end])):
+            continue
+        left, right = _sentence_bounds(text, start, end)
+        for key in rule_keys:
+            if (key, left) in seen or counts.get(key, 0) >= MAX_FINDINGS_PER_RULE:
+                continue
+            seen.add((key, left))
+            rule = RULES_BY_KEY[key]
+            detail = rule.check(folded[left:right]) if rule.check else None
+            if rule.check and detail is None:
+                continue
+            counts[key] = counts.get(key, 0) + 1
+            findings.append({
+                'rule': rule.key,
+                'category': rule.category,
+                'severity': _liquidity_severity(detail) if key == 'indice_liquidez' else rule.severity,
+                'title': rule.title,
+                'detail': detail,
+                'basis': rule.basis,
+                'section': sections.title_at(start),
+                'position': start,
+                'excerpt': _excerpt(text, left, right)
+            })
+    findings.sort(key=lambda finding: (SEVERITY_ORDER[finding['severity']], finding['position']))
+    return findings
+
+MONTHS = {
+    'janeiro': 1, 'fevereiro': 2, 'marco': 3, 'abril': 4, 'maio': 5, 'junho': 6, 'julho': 7,
+    'agosto': 8, 'setembro': 9, 'outubro': 10, 'novembro': 11, 'dezembro': 12
+}
+# Expressões iniciadas por literal (sem \b na frente) usam a busca rápida de prefixo do re;
+# o limite de palavra é conferido depois
+DATE = re.compile(
+    r'(\d{1,2})(?:\s*/\s*(\d{1,2})\s*/\s*(\d{4}|\d{2})\b'
+    r'|\s+de\s+(' + '|'.join(MONTHS) + r')\s+de\s+(\d{4})\b)'
+)
+TIME = re.compile(r'\W{0,12}(?:as\s+)?(\d{1,2})\s*(?:h|:)\s*(\d{2})?')
+RELATIVE_DEADLINE = re.compile(r'prazo\b[^.;\n]{0,60}?\b(?:de|em|ate)\s+(\d{1,3})\s*(?:\([^)]{0,30}\)\s*)?' + DURATION_UNITS)
+
+# Rótulos de datas e prazos, pelo contexto que os antecede na frase
+DEADLINE_LABELS = (
+    ('impugnacao', ('impugnacao', 'impugnar')),
+    ('esclarecimentos', ('esclarecimento',)),
+    ('abertura', ('abertura', 'sessao publica', 'inicio da disputa', 'disputa de lances')),
+    ('propostas', ('proposta',)),
+    ('publicacao', ('publicacao', 'divulgacao', 'publicado', 'divulgado')),
+    ('entrega', ('entrega',)),
+    ('vigencia', ('vigencia',)),
+    ('recurso', ('recurso', 'recursa')),
+)
+
+LABEL_NAMES = {
+    'impugnacao': 'Impugnação', 'esclarecimentos': 'Esclarecimentos', 'abertura': 'Abertura',
+    'propostas': 'Propostas', 'publicacao': 'Publicação', 'entrega': 'Entrega', 'vigencia': 'Vigência',
+    'recurso': 'Recurso'
+}
+
+def _label(context):
+    best, best_position = None, -1
+    for label, words in DEADLINE_LABELS:
+        for word in words:
+            position = context.rfind(word)
+            if position > best_position:
+                best, best_position = label, position
+    return best
+
+def _extract_deadlines(text, folded, sections):
+    dates = []
+    for match in DATE.finditer(folded):
+        if _follows_word(folded, match.start()):
+            continue
+        try:
+            if match.group(2):
+                year = int(match.group(3))
+                parsed = date(year + 2000 if year < 100 else year, int(match.group(2)), int(match.group(1)))
+            else:
+                parsed = date(int(match.group(5)), MONTHS[match.group(4)], int(match.group(1)))
+        except ValueError:
+            continue
+        left, right = _sentence_bounds(text, match.start(), match.end())
+        time_match = TIME.match(folded, match.end(), right)
+        dates.append({
+            'date': parsed.isoformat(),
+            'time': f'{int(time_match.group(1)):02d}:{time_match.group(2) or "00"}' if time_match and int(time_match.group(1)) < 24 else None,
+            'label': _label(folded[max(left, match.start() - 160):match.start()]),
+            'section': sections.title_at(match.start()),
+            'excerpt': _excerpt(text, left, right)
+        })
+        if len(dates) >= MAX_EXTRACTED_ITEMS * 2:
+            break
+
+    periods = []
+    for match in RELATIVE_DEADLINE.finditer(folded):
+        if _follows_word(folded, match.start()):
+            continue
+        if len(periods) >= MAX_EXTRACTED_ITEMS:
+            break
+        left, right = _sentence_bounds(text, match.start(), match.end())
+        periods.append({
+            'amount': int(match.group(1)),
+            'unit': ' '.join(text[match.start(2):match.end(2)].lower().split()),
+            'label': _label(folded[left:match.end()]),
+            'section': sections.title_at(match.start()),
+            'excerpt': _excerpt(text, left, right)
+        })
+    return dates, periods
+
+MONEY = re.compile(r'r\$\s*(\d{1,3}(?:\.\d{3})+(?:,\d{2})?|\d+(?:,\d{2})?)')
+VALUE_LABELS = (
+    ('estimado', ('valor estimado', 'valor total estimado', 'valor global estimado', 'estimativa')),
+    ('maximo', ('valor maximo', 'preco maximo', 'valor de referencia')),
+    ('global', ('valor global', 'valor total')),
+    ('unitario', ('valor unitario', 'preco unitario')),
+    ('garantia', ('garantia',)),
+    ('capital', ('capital', 'patrimonio')),
+)
+
+def _extract_values(text, folded, sections):
+    values = []
+    for match in MONEY.finditer(folded):
+        amount = float(match.group(1).replace('.', '').replace(',', '.'))
+        context = folded[max(0, match.start() - 120):match.start()]
+        label = None
+        best_position = -1
+        for name, words in VALUE_LABELS:
+            for word in words:
+                position = context.rfind(word)
+                if position > best_position:
+                    label, best_position = name, position
+        left, right = _sentence_bounds(text, match.start(), match.end())
+        values.append({
+            'amount': amount,
+            'label': label,
+            'section': sections.title_at(match.start()),
+            'excerpt': _excerpt(text, left, right)
+        })
+    labelled = [value for value in values if value['label'] in ('estimado', 'maximo', 'global')]
+    estimated = max((value['amount'] for value in labelled), default=None)
+    return values[:MAX_EXTRACTED_ITEMS], estimated
+
+ARTICLE = re.compile(
+    r'art(?:igo)?s?\.?\s*(\d{1,3})\s*(?:o|º|°)?\b'
+    r'(?:\s*,?\s*(?:(§\s*\d+\s*(?:o|º|°)?|paragrafo\s+unico)|(?:inciso\s+)?([ivxlc]+)\b(?!\w)))?'
+)
+LAW_NUMBER = re.compile(r'\b(lei|decreto)\b(?:\s+(?:federal|complementar|estadual|municipal))?\s*(?:n\.?o?\.?\s*)?(\d{1,3}(?:\.\d{3})?)')
+
+# Leis de licitação revogadas pela 14.133 (8.666/1993, 10.520/2002 e 12.462/2011)
+REVOKED_LAWS = ('8.666', '10.520', '12.462')
+
+def _extract_citations(text, folded):
+    articles = {}
+    for match in ARTICLE.finditer(folded):
+        if _follows_word(folded, match.start()):
+            continue
+        number = int(match.group(1))
+        # Lei ou decreto logo antes ("Lei 8.666/93, art. 43") ou nos 100 caracteres seguintes;
+        # sem nenhum, vale a lei de regência do edital (14.133)
+        preceding = list(LAW_NUMBER.finditer(folded, max(0, match.start() - 40), match.start()))
+        law = preceding[-1] if preceding else LAW_NUMBER.search(folded, match.end(), match.end() + 100)
+        if (law and (law.group(1) == 'decreto' or law.group(2) != '14.133')) or not 1 <= number <= 194:
+            continue
+        reference = f'art. {number}'
+        if match.group(2):
+            reference += ', ' + ' '.join(text[match.start(2):match.end(2)].split())
+        elif match.group(3):
+            reference += ', ' + match.group(3).upper()
+        article = articles.setdefault(number, {'article': number, 'references': [], 'count': 0})
+        article['count'] += 1
+        if reference not in article['references']:
+            article['references'].append(reference)
+    return {
+        'lei_14133': [articles[number] for number in sorted(articles)],
+        'lei_14133_mentions': folded.count('14.133'),
+        'revoked_law_mentions': sum(folded.count(number) for number in REVOKED_LAWS)
+    }
+
+def _business_days(start, end):
+    days = 0
+    current = start
+    while current < end:
+        current += timedelta(days=1)
+        if current.weekday() < 5:
+            days += 1
+    return days
+
+def _object_kind(folded):
+    head = folded[:5000]
+    if re.search(r'\bobras?\b|\bengenharia\b', head):
+        return 'obras'
+    if re.search(r'\bservicos?\b', head) and not re.search(r'\baquisi[cç]|\bfornecimento\b|\bcompra\b', head):
+        return 'servicos'
+    return 'bens'
+
+def _check_proposal_period(dates, folded):
+    """Art. 55: dias úteis entre a divulgação do edital e a abertura das propostas"""
+    published = [item['date'] for item in dates if item['label'] == 'publicacao']
+    opening = [item for item in dates if item['label'] in ('abertura', 'propostas')]
+    if not published or not opening:
+        return None
+    start, session = date.fromisoformat(min(published)), opening[0]
+    days = _business_days(start, date.fromisoformat(session['date']))
+    kind = _object_kind(folded)
+    if days <= 0 or days >= MIN_PROPOSAL_BUSINESS_DAYS[kind]:
+        return None
+    return {
+        'rule': 'prazo_propostas',
+        'category': 'vicio',
+        'severity': 'alta',
+        'title': 'Prazo para apresentação de propostas inferior ao mínimo legal',
+        'detail': f'{days} dias úteis entre a divulgação e a abertura (mínimo de {MIN_PROPOSAL_BUSINESS_DAYS[kind]} para {kind})',
+        'basis': 'Art. 55 da Lei 14.133/2021',
+        'section': session['section'],
+        'position': None,
+        'excerpt': session['excerpt']
+    }
+
+def screen_edital(text):
+    """Triagem completa do edital: achados por regra, prazos, valores e citações da Lei 14.133/2021"""
+    started = time.perf_counter()
+    text = text or ''
+    folded = fold(text)
+    sections = _SectionIndex(text)
+
+    findings = _find_rule_violations(text, folded, sections)
+    dates, periods = _extract_deadlines(text, folded, sections)
+    proposal_period = _check_proposal_period(dates, folded)
+    if proposal_period:
+        findings.insert(0, proposal_period)
+    values, estimated_value = _extract_values(text, folded, sections)
+
+    return {
+        'findings': findings,
+        'deadlines': {'dates': dates, 'periods': periods},
+        'values': values,
+        'estimated_value': estimated_value,
+        'citations': _extract_citations(text, folded),
+        'stats': {
+            'chars': len(text),
+            'findings': len(findings),
+            'high_severity': sum(1 for finding in findings if finding['severity'] == 'alta'),
+            'matcher': MATCHER,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+    }
+
+def format_brl(amount):
+    return f'R$ {amount:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.')
+
+def format_screening_hints(screening, max_findings=15):
+    """Resumo da triagem para o prompt: orienta o modelo sobre onde olhar"""
+    lines = []
+    for finding in screening['findings'][:max_findings]:
+        detail = f": {finding['detail']}" if finding['detail'] else ''
+        lines.append(f"- [{finding['severity']}] {finding['title']} ({finding['section']}){detail} — \"{finding['excerpt']}\"")
+    for item in screening['deadlines']['dates'][:8]:
+        if item['label']:
+            lines.append(f"- Data ({item['label']}): {item['date']}{' ' + item['time'] if item['time'] else ''}")
+    if screening['estimated_value']:
+        lines.append(f"- Valor estimado: {format_brl(screening['estimated_value'])}")
+    if not lines:
+        return ''
+    return 'Triagem automática por regras (confirme ou descarte cada ponto e aponte outros):\n' + '\n'.join(lines)
+
+def focus_edital_text(text, screening):
+    """Só as seções com achados, datas ou valores da triagem (e o preâmbulo), na ordem do edital"""
+    sections = split_sections(text)
+    flagged = {finding['section'] for finding in screening['findings']}
+    flagged |= {item['section'] for item in screening['deadlines']['dates'] + screening['deadlines']['periods']}
+    flagged |= {item['section'] for item in screening['values']}
+    kept = [section.text for index, section in enumerate(sections) if index == 0 or section.title in flagged]
+    return '\n\n'.join(kept)
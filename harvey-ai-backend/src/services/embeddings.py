@@ -0,0 +1,74 @@
+import hashlib
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+HASHING_DIM = 256
+OPENAI_EMBEDDING_MODEL = 'text-embedding-3-small'
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+class HashingEmbedder:
+    """Embedder local e determinístico (feature hashing de palavras e bigramas).
+    
+    Não depende de rede nem de modelo baixado, e o mesmo texto sempre gera o
+    mesmo vetor, em qualquer processo.
+    """
+    
+    def __init__(self, dim=HASHING_DIM):
+        self.dim = dim
+        self.name = f'hashing-{dim}-v1'
+    
+    def _features(self, tokens):
+        for token in tokens:
+            if len(token) > 2:
+                yield token, 1.0
+        for first, second in zip(tokens, tokens[1:]):
+            yield f'{first}_{second}', 0.5
+    
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(_normalize(text)):
+                digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dim] += sign * weight
+        # Escala sublinear para termos repetidos e normalização L2 (produto interno = cosseno)
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+class OpenAIEmbedder:
+    """Embeddings da OpenAI, usando o cliente compartilhado do processo"""
+    
+    def __init__(self, api_key, model=OPENAI_EMBEDDING_MODEL, dim=1536, batch_size=64):
+        self.api_key = api_key
+        self.model = model
+        self.dim = dim
+        self.batch_size = batch_size
+        self.name = f'openai-{model}'
+    
+    def embed(self, texts):
+        from src.services.openai_client import get_openai_client
+        
+        client = get_openai_client(self.api_key)
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+def get_embedder():
+    """Embedder configurado por EMBEDDER (hashing, padrão, ou openai)"""
+    if os.getenv('EMBEDDER', 'hashing') == 'openai' and os.getenv('OPENAI_API_KEY'):
+        return OpenAIEmbedder(os.getenv('OPENAI_API_KEY'))
+    return HashingEmbedder()
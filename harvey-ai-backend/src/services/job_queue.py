@@ -0,0 +1,353 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Fila local em SQLite, ao lado do app.db
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'jobs.db')
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_BASE = 5.0
+POLL_INTERVAL = 1.0
+
+# O worker renova a reserva do job a cada JOB_HEARTBEAT_SECONDS enquanto o handler roda;
+# jobs "running" sem renovação há mais que STALE_JOB_SECONDS são devolvidos à fila (worker morto)
+JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', 30))
+STALE_JOB_SECONDS = float(os.getenv('JOB_STALE_SECONDS', 4 * JOB_HEARTBEAT_SECONDS))
+
+# Reenvios com a mesma chave devolvem o job existente por este tempo (segundos desde a criação);
+# sem Idempotency-Key, a chave é o hash do payload e vale só para cliques repetidos
+IDEMPOTENCY_KEY_TTL = int(os.getenv('JOB_IDEMPOTENCY_TTL', 24 * 3600))
+PAYLOAD_DEDUP_TTL = int(os.getenv('JOB_PAYLOAD_DEDUP_TTL', 10 * 60))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    progress INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after REAL NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    worker_id TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_after ON jobs (status, run_after);
+"""
+
+JOB_STATUSES = ['queued', 'running', 'succeeded', 'failed']
+
+class PermanentJobError(Exception):
+    """Falha que não adianta repetir (dados inválidos, caso inexistente, etc.)"""
+
+# Funções que executam cada tipo de job: handler(app, payload, report_progress) -> dict
+# O handler abre app_context apenas nos trechos que acessam o banco
+JOB_HANDLERS = {}
+
+def register_job_handler(kind, handler):
+    JOB_HANDLERS[kind] = handler
+
+def _iso(timestamp):
+    if timestamp is None:
+        return None
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(timestamp))
+
+def _row_to_dict(row):
+    return {
+        'id': row['id'],
+        'kind': row['kind'],
+        'status': row['status'],
+        'progress': row['progress'],
+        'message': row['message'],
+        'attempts': row['attempts'],
+        'max_attempts': row['max_attempts'],
+        'result': json.loads(row['result']) if row['result'] else None,
+        'error': row['error'],
+        'created_at': _iso(row['created_at']),
+        'updated_at': _iso(row['updated_at']),
+        'started_at': _iso(row['started_at']),
+        'finished_at': _iso(row['finished_at'])
+    }
+
+def default_idempotency_key(kind, payload):
+    """Mesmo tipo + mesmo payload = mesmo job (dentro de PAYLOAD_DEDUP_TTL)"""
+    raw = json.dumps({'kind': kind, 'payload': payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class JobQueue:
+    """Fila de jobs persistida em SQLite, segura para vários workers e processos"""
+    
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        # Filas criadas antes da coluna worker_id
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'worker_id' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN worker_id TEXT')
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+    
+    def enqueue(self, kind, payload, idempotency_key=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Enfileirar um job. Retorna (job, criado); reenvios idênticos dentro do TTL devolvem o job existente"""
+        ttl = IDEMPOTENCY_KEY_TTL if idempotency_key else PAYLOAD_DEDUP_TTL
+        idempotency_key = idempotency_key or default_idempotency_key(kind, payload)
+        conn = self._connection()
+        now = time.time()
+        
+        existing = conn.execute('SELECT * FROM jobs WHERE idempotency_key = ?', (idempotency_key,)).fetchone()
+        if existing is not None and existing['status'] != 'failed' and existing['created_at'] >= now - ttl:
+            return _row_to_dict(existing), False
+        
+        job_id = uuid.uuid4().hex
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Um job que falhou definitivamente ou expirou libera a chave (o histórico continua em /jobs)
+            conn.execute(
+                "UPDATE jobs SET idempotency_key = NULL WHERE idempotency_key = ? AND (status = 'failed' OR created_at < ?)",
+                (idempotency_key, now - ttl)
+            )
+            conn.execute(
+                'INSERT OR IGNORE INTO jobs (id, kind, payload, idempotency_key, max_attempts, run_after, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), idempotency_key, max_attempts, now, now, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        
+        row = conn.execute('SELECT * FROM jobs WHERE idempotency_key = ?', (idempotency_key,)).fetchone()
+        self._wakeup.set()
+        return _row_to_dict(row), row['id'] == job_id
+    
+    def get(self, job_id):
+        row = self._connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+    
+    def list(self, status=None, limit=50):
+        query, params = 'SELECT * FROM jobs', []
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        return [_row_to_dict(row) for row in self._connection().execute(query, params)]
+    
+    def claim(self, worker_id=None):
+        """Reservar atomicamente o próximo job disponível para o worker"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? ORDER BY created_at LIMIT 1", (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, progress = 0, "
+                "started_at = ?, updated_at = ?, error = NULL, worker_id = ? WHERE id = ?",
+                (now, now, worker_id, row['id'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return {'id': row['id'], 'kind': row['kind'], 'payload': json.loads(row['payload']), 'attempts': row['attempts'] + 1}
+    
+    def heartbeat(self, job_id, worker_id):
+        """Renovar a reserva; False se o job já não é deste worker (devolvido à fila e pego por outro)"""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running' AND worker_id IS ?",
+            (time.time(), job_id, worker_id)
+        )
+        return cursor.rowcount > 0
+    
+    def progress(self, job_id, progress, message=None, worker_id=None):
+        self._connection().execute(
+            "UPDATE jobs SET progress = ?, message = COALESCE(?, message), updated_at = ? "
+            "WHERE id = ? AND status = 'running' AND worker_id IS ?",
+            (int(progress), message, time.time(), job_id, worker_id)
+        )
+    
+    def complete(self, job_id, result, worker_id=None):
+        now = time.time()
+        self._connection().execute(
+            "UPDATE jobs SET status = 'succeeded', progress = 100, result = ?, finished_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'running' AND worker_id IS ?",
+            (json.dumps(result, ensure_ascii=False), now, now, job_id, worker_id)
+        )
+    
+    def fail(self, job_id, error, retry=True, worker_id=None):
+        """Registrar falha; o job volta à fila com backoff enquanto houver tentativas"""
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'running' AND worker_id IS ?",
+            (job_id, worker_id)
+        ).fetchone()
+        if row is None:
+            return
+        if retry and row['attempts'] < row['max_attempts']:
+            delay = random.uniform(0, RETRY_BACKOFF_BASE * (2 ** row['attempts']))
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, updated_at = ? WHERE id = ?",
+                (error, now + delay, now, job_id)
+            )
+            self._wakeup.set()
+        else:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                (error, now, now, job_id)
+            )
+    
+    def requeue_stale(self, older_than=STALE_JOB_SECONDS):
+        """Devolver à fila jobs cuja reserva não foi renovada (worker morto)"""
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = 'queued', run_after = ?, updated_at = ?, worker_id = NULL "
+            "WHERE status = 'running' AND updated_at < ?",
+            (now, now, now - older_than)
+        )
+        return cursor.rowcount
+    
+    def wait_for_work(self, timeout=POLL_INTERVAL):
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+class JobWorkerPool:
+    """Threads que consomem a fila e executam os handlers registrados"""
+    
+    def __init__(self, app, queue, num_workers=2):
+        self.app = app
+        self.queue = queue
+        self.num_workers = num_workers
+        self._stop = threading.Event()
+        self._threads = []
+        self._pool_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self._last_sweep = 0.0
+    
+    def start(self):
+        self._sweep()
+        for n in range(self.num_workers):
+            thread = threading.Thread(target=self._run, args=(f'{self._pool_id}-{n}',), name=f'job-worker-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def _sweep(self):
+        """Devolver à fila jobs de workers mortos (no início e periodicamente, enquanto ocioso)"""
+        self._last_sweep = time.monotonic()
+        try:
+            requeued = self.queue.requeue_stale()
+        except sqlite3.OperationalError:
+            return
+        if requeued:
+            logger.warning('%d job(s) sem heartbeat devolvido(s) à fila', requeued)
+    
+    def stop(self, timeout=5):
+        self._stop.set()
+        self.queue._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    def _run(self, worker_id):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker_id)
+            except sqlite3.OperationalError:
+                job = None
+            if job is None:
+                if time.monotonic() - self._last_sweep >= STALE_JOB_SECONDS:
+                    self._sweep()
+                self.queue.wait_for_work()
+                continue
+            self.run_job(job, worker_id)
+    
+    def _heartbeat(self, job, worker_id, done):
+        while not done.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                if not self.queue.heartbeat(job['id'], worker_id):
+                    logger.warning('Job %s (%s) perdeu a reserva do worker %s', job['id'], job['kind'], worker_id)
+                    return
+            except sqlite3.OperationalError as e:
+                logger.warning('Falha ao renovar a reserva do job %s: %s', job['id'], e)
+    
+    def run_job(self, job, worker_id=None):
+        handler = JOB_HANDLERS.get(job['kind'])
+        if handler is None:
+            self.queue.fail(job['id'], f"Tipo de job desconhecido: {job['kind']}", retry=False, worker_id=worker_id)
+            return
+        
+        def report_progress(progress, message=None):
+            self.queue.progress(job['id'], progress, message, worker_id=worker_id)
+        
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(job, worker_id, done), name=f'job-heartbeat-{job["id"][:8]}', daemon=True
+        )
+        heartbeat.start()
+        try:
+            result = handler(self.app, job['payload'], report_progress)
+        except PermanentJobError as e:
+            self.queue.fail(job['id'], str(e), retry=False, worker_id=worker_id)
+        except Exception as e:
+            logger.exception('Job %s (%s) falhou', job['id'], job['kind'])
+            self.queue.fail(job['id'], f'{type(e).__name__}: {e}', worker_id=worker_id)
+        else:
+            self.queue.complete(job['id'], result or {}, worker_id=worker_id)
+        finally:
+            done.set()
+
+_queue = None
+_pool = None
+_lock = threading.Lock()
+
+def get_job_queue():
+    """Instância única da fila no processo"""
+    global _queue
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = JobQueue(os.getenv('JOB_QUEUE_PATH', DEFAULT_QUEUE_PATH))
+    return _queue
+
+def start_job_workers(app, num_workers=None):
+    """Iniciar o pool de workers (JOB_WORKERS=0 desliga, ex.: quando há workers dedicados)"""
+    global _pool
+    if num_workers is None:
+        num_workers = int(os.getenv('JOB_WORKERS', 2))
+    if num_workers <= 0:
+        return None
+    queue = get_job_queue()
+    with _lock:
+        if _pool is None:
+            _pool = JobWorkerPool(app, queue, num_workers)
+            _pool.start()
+    return _pool
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.services.model_router import routed_chat_completion, select_models
+from src.services.openai_client import create_chat_completion
+from src.services.tokens import prepare_chat_request, record_usage
+
+# Cache fica ao lado do app.db, em src/database/
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'llm_cache.db')
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+# Expiração e descarte LRU rodam a cada N gravações (o limite pode ser excedido em até N-1 entradas)
+DEFAULT_EVICT_EVERY = 100
+# Conversas (temperature 0.7) não repetem a resposta: sem cache, salvo configuração explícita
+DEFAULT_DISABLED_ROUTES = 'chat'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    route TEXT NOT NULL,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens_used INTEGER DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_accessed REAL NOT NULL,
+    hit_count INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_llm_cache_last_accessed ON llm_cache (last_accessed);
+CREATE INDEX IF NOT EXISTS ix_llm_cache_created_at ON llm_cache (created_at);
+"""
+
+def make_cache_key(model, messages, temperature=None, max_tokens=None):
+    """Gerar chave determinística a partir de modelo, mensagens e parâmetros"""
+    payload = json.dumps({
+        'model': model,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LLMCache:
+    """Cache persistente (SQLite) de respostas do modelo, com TTL e descarte LRU"""
+    
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 evict_every=DEFAULT_EVICT_EVERY):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.evict_every = max(1, evict_every)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._writes = 0
+        
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+    
+    def _count(self, route, outcome):
+        counters = self._counters.setdefault(route, {'hits': 0, 'misses': 0})
+        counters[outcome] += 1
+        return dict(counters)
+    
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT content, tokens_used, created_at FROM llm_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[2] > self.ttl_seconds:
+                self._conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                return None
+            self._conn.execute(
+                'UPDATE llm_cache SET last_accessed = ?, hit_count = hit_count + 1 WHERE key = ?', (now, key)
+            )
+        return {'content': row[0], 'tokens_used': row[1]}
+    
+    def set(self, key, route, model, content, tokens_used=0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, route, model, content, tokens_used, created_at, last_accessed) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, route, model, content, tokens_used, now, now)
+            )
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self._evict()
+    
+    def _evict(self):
+        """Remover entradas expiradas e, acima do limite, as menos usadas recentemente"""
+        self._conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        (total,) = self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()
+        overflow = total - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                'DELETE FROM llm_cache WHERE key IN '
+                '(SELECT key FROM llm_cache ORDER BY last_accessed ASC LIMIT ?)',
+                (overflow,)
+            )
+    
+    def record(self, route, hit):
+        with self._lock:
+            return self._count(route, 'hits' if hit else 'misses')
+    
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM llm_cache')
+    
+    def stats(self):
+        with self._lock:
+            (entries,) = self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()
+            return {'entries': entries, 'routes': {route: dict(c) for route, c in self._counters.items()}}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """Instância única do cache no processo"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache(
+                    path=os.getenv('LLM_CACHE_PATH', DEFAULT_CACHE_PATH),
+                    ttl_seconds=int(os.getenv('LLM_CACHE_TTL', DEFAULT_TTL_SECONDS)),
+                    max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+                    evict_every=int(os.getenv('LLM_CACHE_EVICT_EVERY', DEFAULT_EVICT_EVERY))
+                )
+    return _cache
+
+def cache_enabled_for(route, use_cache=True):
+    """Cache pode ser desligado por requisição (use_cache) ou por rota (LLM_CACHE_DISABLED_ROUTES)"""
+    if not use_cache or os.getenv('LLM_CACHE_ENABLED', '1') == '0':
+        return False
+    disabled = {r.strip() for r in os.getenv('LLM_CACHE_DISABLED_ROUTES', DEFAULT_DISABLED_ROUTES).split(',') if r.strip()}
+    return route not in disabled
+
+def usage_to_dict(usage):
+    """Converter o objeto usage da OpenAI em dicionário (zeros quando ausente)"""
+    if not usage:
+        return {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    return {
+        'prompt_tokens': usage.prompt_tokens,
+        'completion_tokens': usage.completion_tokens,
+        'total_tokens': usage.total_tokens
+    }
+
+def begin_cached_request(route, use_cache, task, params):
+    """Orçamento de tokens e consulta ao cache antes da chamada ao modelo.
+    
+    Retorna (estado, resultado): resultado é a tupla final em um acerto de
+    cache e None quando é preciso chamar o modelo (com estado['params']).
+    """
+    cache = get_llm_cache() if cache_enabled_for(route, use_cache) else None
+    state = {'cache': cache, 'params': None, 'budget': None}
+    
+    if task is None:
+        state['params'], state['budget'] = prepare_chat_request(route, params)
+    elif cache is not None:
+        # A consulta ao cache usa o modelo que seria chamado primeiro
+        model = select_models(task, params.get('messages') or [], params.get('max_tokens'), params.get('model'))[0]
+        state['params'], state['budget'] = prepare_chat_request(route, {**params, 'model': model})
+    
+    if cache is None:
+        return state, None
+    
+    lookup = state['params']
+    entry = cache.get(make_cache_key(lookup.get('model'), lookup.get('messages'), lookup.get('temperature'), lookup.get('max_tokens')))
+    if entry is None:
+        return state, None
+    
+    counters = cache.record(route, hit=True)
+    usage = usage_to_dict(None)
+    record_usage(route, state['budget'], usage, cached=True)
+    usage.update(truncated_tokens=state['budget']['truncated_tokens'], model=lookup.get('model'))
+    return state, (entry['content'], usage, {'enabled': True, 'hit': True, **counters})
+
+def finish_cached_request(state, route, response, sent_params, budget, routing=None):
+    """Registrar uso, gravar no cache e montar (conteúdo, uso, informações do cache)"""
+    content = response.choices[0].message.content
+    usage = usage_to_dict(response.usage)
+    record_usage(route, budget, usage)
+    usage.update(truncated_tokens=budget['truncated_tokens'], model=sent_params.get('model'))
+    if routing is not None:
+        usage['routing'] = {key: routing[key] for key in ('attempts', 'failover', 'hedged')}
+    
+    cache = state['cache']
+    if cache is None:
+        return content, usage, {'enabled': False, 'hit': False}
+    
+    # Resposta de um modelo de failover fica sob a chave desse modelo: não substitui a do principal
+    cache.set(
+        make_cache_key(sent_params.get('model'), sent_params.get('messages'), sent_params.get('temperature'), sent_params.get('max_tokens')),
+        route, sent_params.get('model'), content, usage['total_tokens']
+    )
+    counters = cache.record(route, hit=False)
+    return content, usage, {'enabled': True, 'hit': False, **counters}
+
+def cached_chat_completion(client, route, use_cache=True, task=None, **params):
+    """Chamar o modelo consultando o cache antes.
+    
+    Retorna (conteúdo, uso de tokens, informações do cache). Em um acerto de
+    cache nenhum token é consumido. O pedido passa antes pelo orçamento de
+    tokens do modelo (max_tokens ajustado e, se preciso, entrada cortada).
+    Com task, o modelo vem do roteamento (params['model'] é só a preferência)
+    e usage['model'] indica quem respondeu.
+    """
+    state, cached = begin_cached_request(route, use_cache, task, params)
+    if cached is not None:
+        return cached
+    
+    # Com tarefa, o roteador escolhe o modelo (failover/hedging); sem ela, chamada direta
+    if task is None:
+        response = create_chat_completion(client, **state['params'])
+        return finish_cached_request(state, route, response, state['params'], state['budget'])
+    response, sent_params, budget, routing = routed_chat_completion(client, route, task, **params)
+    return finish_cached_request(state, route, response, sent_params, budget, routing)
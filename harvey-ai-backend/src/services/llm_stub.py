@@ -0,0 +1,143 @@
+"""Servidor local que imita a API de chat da OpenAI, para testar roteamento sem custo.
+
+Uso: python -m src.services.llm_stub --port 8089 --latency gpt-4=3000 --rate-limit gpt-4=0.5
+e depois OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub no backend.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.services.tokens import count_message_tokens, estimate_tokens
+
+DEFAULT_LATENCY_MS = 100
+
+class StubConfig:
+    """Latência (ms) e probabilidade de 429/500 por modelo; a chave 'default' vale para os demais"""
+    
+    def __init__(self, latency=None, rate_limit=None, errors=None, jitter=0.2):
+        self.latency = {'default': DEFAULT_LATENCY_MS, **(latency or {})}
+        self.rate_limit = rate_limit or {}
+        self.errors = errors or {}
+        self.jitter = jitter
+        self.calls = {}
+        self._lock = threading.Lock()
+    
+    def _value(self, table, model, default=0):
+        return table.get(model, table.get('default', default))
+    
+    def delay(self, model):
+        base = self._value(self.latency, model) / 1000
+        return max(0.0, base * random.uniform(1 - self.jitter, 1 + self.jitter))
+    
+    def outcome(self, model):
+        with self._lock:
+            self.calls[model] = self.calls.get(model, 0) + 1
+        draw = random.random()
+        if draw < self._value(self.rate_limit, model):
+            return 429
+        if draw < self._value(self.rate_limit, model) + self._value(self.errors, model):
+            return 500
+        return 200
+
+def _reply_text(body):
+    question = body['messages'][-1].get('content') or ''
+    return f"[{body['model']}] Resposta simulada ({estimate_tokens(question)} tokens de entrada)."
+
+class StubHandler(BaseHTTPRequestHandler):
+    config = StubConfig()
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.endswith('/chat/completions'):
+            return self._json(404, {'error': {'message': 'Rota não simulada', 'type': 'invalid_request_error'}})
+        
+        model = body.get('model', 'default')
+        time.sleep(self.config.delay(model))
+        status = self.config.outcome(model)
+        if status == 429:
+            return self._json(429, {'error': {'message': 'Rate limit simulado', 'type': 'rate_limit_error'}}, {'retry-after': '1'})
+        if status == 500:
+            return self._json(500, {'error': {'message': 'Erro simulado', 'type': 'server_error'}})
+        
+        text = _reply_text(body)
+        usage = {
+            'prompt_tokens': count_message_tokens(body.get('messages', []), model),
+            'completion_tokens': estimate_tokens(text)
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        
+        if not body.get('stream'):
+            return self._json(200, {
+                'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': usage
+            })
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        for word in text.split(' '):
+            chunk = {
+                'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]
+            }
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+        final = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model, 'choices': [], 'usage': usage}
+        self.wfile.write(f'data: {json.dumps(final)}\n\ndata: [DONE]\n\n'.encode('utf-8'))
+
+class StubServer(ThreadingHTTPServer):
+    # Fila de conexões grande para testes com centenas de chamadas simultâneas
+    request_queue_size = 1024
+    daemon_threads = True
+
+def start_stub_server(port=0, config=None):
+    """Iniciar o servidor em uma thread; retorna o servidor (porta em server.server_port)"""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config or StubConfig()})
+    server = StubServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _pairs(values, cast=float):
+    # "gpt-4=3000" -> {'gpt-4': 3000.0}; sem modelo, vale como padrão
+    result = {}
+    for value in values or []:
+        model, _, number = value.rpartition('=')
+        result[model or 'default'] = cast(number)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor simulado da API de chat da OpenAI')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', action='append', help='modelo=ms (ou só ms para o padrão)')
+    parser.add_argument('--rate-limit', action='append', help='modelo=probabilidade de 429')
+    parser.add_argument('--errors', action='append', help='modelo=probabilidade de 500')
+    parser.add_argument('--jitter', type=float, default=0.2)
+    args = parser.parse_args()
+    
+    config = StubConfig(_pairs(args.latency), _pairs(args.rate_limit), _pairs(args.errors), args.jitter)
+    server = start_stub_server(args.port, config)
+    print(f'Servidor simulado em http://127.0.0.1:{server.server_port}/v1')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# Modelos oferecidos em /chat/models, com janela de contexto, limite de saída em tokens
+# e preço em USD por milhão de tokens de entrada e de saída
+AVAILABLE_MODELS = [
+    {
+        'id': 'gpt-4',
+        'name': 'GPT-4',
+        'description': 'Modelo mais avançado, melhor para análises complexas',
+        'context_window': 8192,
+        'max_output_tokens': 4096,
+        'pricing': {'input': 30, 'output': 60}
+    },
+    {
+        'id': 'gpt-4-turbo',
+        'name': 'GPT-4 Turbo',
+        'description': 'Versão otimizada do GPT-4, mais rápida',
+        'context_window': 128000,
+        'max_output_tokens': 4096,
+        'pricing': {'input': 10, 'output': 30}
+    },
+    {
+        'id': 'gpt-3.5-turbo',
+        'name': 'GPT-3.5 Turbo',
+        'description': 'Modelo rápido e eficiente para uso geral',
+        'context_window': 16385,
+        'max_output_tokens': 4096,
+        'pricing': {'input': 0.5, 'output': 1.5}
+    }
+]
+
+# Modelos fora da lista (ex.: informados pelo cliente) recebem limites conservadores
+# e o preço do modelo mais caro, para que o custo nunca fique subestimado
+DEFAULT_MODEL_INFO = {'context_window': 8192, 'max_output_tokens': 4096, 'pricing': {'input': 30, 'output': 60}}
+
+def get_model_info(model):
+    for info in AVAILABLE_MODELS:
+        if info['id'] == model:
+            return info
+    return {'id': model, 'name': model, 'description': '', **DEFAULT_MODEL_INFO}
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Custo em USD de uma chamada pelos preços de tabela do modelo"""
+    pricing = get_model_info(model)['pricing']
+    return (prompt_tokens * pricing['input'] + completion_tokens * pricing['output']) / 1_000_000
@@ -0,0 +1,326 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import openai
+
+from src.services.openai_client import MAX_RETRIES, RETRYABLE_ERRORS, CallScope, call_cancelled, create_chat_completion
+from src.services.tokens import fits_in_context, prepare_chat_request
+
+logger = logging.getLogger(__name__)
+
+# Modelos por tipo de tarefa, em ordem de preferência; os seguintes servem de failover
+ROUTING_TABLE = {
+    'chat': ['gpt-3.5-turbo', 'gpt-4-turbo'],
+    'summary': ['gpt-3.5-turbo', 'gpt-4-turbo'],
+    'analysis': ['gpt-4', 'gpt-4-turbo', 'gpt-3.5-turbo'],
+    'recurso': ['gpt-4', 'gpt-4-turbo', 'gpt-3.5-turbo']
+}
+
+# Modelo que recebeu limite de taxa fica no fim da fila por este tempo (ou o Retry-After)
+RATE_LIMIT_COOLDOWN = float(os.getenv('LLM_RATE_LIMIT_COOLDOWN', 30))
+
+# Hedging (desligado por padrão, dobra o custo das chamadas lentas): após o p95 do modelo
+# (com piso), uma segunda chamada vai ao próximo candidato
+HEDGING_ENABLED = os.getenv('LLM_HEDGING', '0') == '1'
+HEDGE_MIN_SECONDS = float(os.getenv('LLM_HEDGE_MIN_MS', 2000)) / 1000
+HEDGE_DEFAULT_SECONDS = float(os.getenv('LLM_HEDGE_DEFAULT_MS', 20000)) / 1000
+HEDGE_MIN_SAMPLES = 20
+
+# Latências recentes guardadas por modelo para p50/p95
+LATENCY_WINDOW = 200
+
+_lock = threading.Lock()
+_latencies = {}
+_cooldown_until = {}
+_stats = {}
+
+def routing_table(task):
+    """Modelos da tarefa; MODEL_ROUTING_<TAREFA>=modelo1,modelo2 substitui a tabela padrão"""
+    override = os.getenv(f'MODEL_ROUTING_{task.upper()}')
+    if override:
+        return [model.strip() for model in override.split(',') if model.strip()]
+    return list(ROUTING_TABLE.get(task, ROUTING_TABLE['chat']))
+
+def primary_model(task):
+    return routing_table(task)[0]
+
+def _count(model, **increments):
+    stats = _stats.setdefault(model, {
+        'calls': 0, 'errors': 0, 'rate_limited': 0, 'timeouts': 0,
+        'failovers': 0, 'hedges': 0, 'hedge_wins': 0
+    })
+    for key, value in increments.items():
+        stats[key] += value
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def latency_percentiles(model):
+    """p50/p95 (segundos) das chamadas recentes do modelo, ou None sem amostras"""
+    with _lock:
+        samples = list(_latencies.get(model, ()))
+    if not samples:
+        return None
+    return {'p50': _percentile(samples, 0.5), 'p95': _percentile(samples, 0.95), 'samples': len(samples)}
+
+def hedge_delay(model):
+    """Espera antes do hedge: p95 observado do modelo (padrão fixo até haver amostras suficientes)"""
+    percentiles = latency_percentiles(model)
+    if percentiles is None or percentiles['samples'] < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_SECONDS
+    return max(percentiles['p95'], HEDGE_MIN_SECONDS)
+
+def _cooling(model):
+    return _cooldown_until.get(model, 0) > time.time()
+
+def select_models(task, messages, max_tokens=None, preferred=None):
+    """Candidatos em ordem: modelo pedido e os da tarefa, primeiro os que comportam a entrada.
+    
+    Modelos em espera por limite de taxa vão para o fim da fila; se nenhum
+    comportar a entrada, o pedido segue e o orçamento de tokens corta o texto.
+    """
+    models = routing_table(task)
+    if preferred:
+        models = [preferred] + [model for model in models if model != preferred]
+    
+    fitting = [model for model in models if fits_in_context(messages, model, max_tokens or 0)]
+    ordered = fitting + [model for model in models if model not in fitting]
+    with _lock:
+        return [model for model in ordered if not _cooling(model)] + [model for model in ordered if _cooling(model)]
+
+def _timed_call(client, model, params, max_retries):
+    started = time.perf_counter()
+    try:
+        response = create_chat_completion(client, max_retries=max_retries, **params)
+    except Exception as e:
+        # Chamada interrompida por ter perdido o hedge não conta como erro do modelo
+        if not call_cancelled():
+            record_error(model, e)
+        raise
+    record_success(model, time.perf_counter() - started)
+    return response
+
+def record_success(model, elapsed):
+    with _lock:
+        _latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(elapsed)
+        _count(model, calls=1)
+
+def record_event(model, **increments):
+    with _lock:
+        _count(model, **increments)
+
+def record_error(model, error):
+    with _lock:
+        _count(
+            model,
+            errors=1,
+            rate_limited=int(isinstance(error, openai.RateLimitError)),
+            timeouts=int(isinstance(error, openai.APITimeoutError))
+        )
+        if isinstance(error, openai.RateLimitError):
+            retry_after = None
+            response = getattr(error, 'response', None)
+            if response is not None:
+                try:
+                    retry_after = float(response.headers.get('retry-after'))
+                except (TypeError, ValueError):
+                    retry_after = None
+            _cooldown_until[model] = time.time() + (retry_after or RATE_LIMIT_COOLDOWN)
+
+def log_failover(route, model, error, next_model):
+    record_event(model, failovers=1)
+    logger.warning('%s: %s falhou (%s), failover para %s', route, model, type(error).__name__, next_model)
+
+def prepare_for_model(route, model, params):
+    return prepare_chat_request(route, {**params, 'model': model})
+
+def _hedged_call(client, route, params, model, attempt_params, hedge_model, hedge_is_last):
+    """Chamar o candidato na thread da requisição e, se passar do p95, o próximo em outra thread.
+    
+    O prazo do hedge conta a partir do início real da chamada. Vale a primeira
+    resposta; a chamada perdedora é interrompida (CallScope) em vez de seguir
+    em segundo plano. Retorna (desfecho, houve hedge, dados): ('primary', _,
+    resposta), ('hedge', _, (params, orçamento, resposta)) ou ('error', _, último erro).
+    """
+    lock = threading.Lock()
+    primary_scope = CallScope()
+    state = {'settled': False, 'hedge': None}
+    delay = hedge_delay(model)
+    
+    def run_hedge(scope, future, hedge_params):
+        with scope.active():
+            try:
+                response = _timed_call(client, hedge_model, hedge_params, MAX_RETRIES if hedge_is_last else 0)
+            except Exception as e:
+                future.set_exception(e)
+                return
+        future.set_result(response)
+        # Hedge respondeu primeiro: a chamada principal é interrompida
+        primary_scope.cancel()
+    
+    def launch_hedge():
+        with lock:
+            if state['settled']:
+                return
+            hedge_params, hedge_budget = prepare_for_model(route, hedge_model, params)
+            scope, future = CallScope(), Future()
+            state['hedge'] = (scope, future, hedge_params, hedge_budget)
+        record_event(model, hedges=1)
+        logger.info('%s: %s sem resposta após %.1fs, hedge com %s', route, model, delay, hedge_model)
+        threading.Thread(target=run_hedge, args=(scope, future, hedge_params), name='llm-hedge', daemon=True).start()
+    
+    timer = threading.Timer(delay, launch_hedge)
+    timer.daemon = True
+    timer.start()
+    primary_error = None
+    try:
+        with primary_scope.active():
+            response = _timed_call(client, model, attempt_params, 0)
+    except Exception as e:
+        primary_error = e
+    finally:
+        timer.cancel()
+        with lock:
+            state['settled'] = True
+            hedge = state['hedge']
+    
+    if primary_error is None:
+        if hedge is not None:
+            hedge[0].cancel()
+        return 'primary', hedge is not None, response
+    if hedge is None:
+        return 'error', False, primary_error
+    
+    # Principal interrompido pelo hedge vencedor ou com falha: vale a resposta do hedge
+    scope, future, hedge_params, hedge_budget = hedge
+    try:
+        response = future.result()
+    except Exception as e:
+        return 'error', True, e if primary_scope.cancelled else primary_error
+    record_event(hedge_model, hedge_wins=1)
+    return 'hedge', True, (hedge_params, hedge_budget, response)
+
+def routed_chat_completion(client, route, task, **params):
+    """Chamar o modelo escolhido pelo roteamento, com failover e hedging.
+    
+    Limite de taxa, timeout e falhas transitórias passam imediatamente ao
+    próximo candidato (só o último faz novas tentativas com backoff). Se o
+    candidato atual passar do seu p95 sem responder (com LLM_HEDGING=1), o
+    seguinte é chamado em paralelo, vale a primeira resposta e a outra chamada
+    é interrompida. Retorna (resposta, params enviados,
+    orçamento de tokens, informações do roteamento).
+    """
+    candidates = select_models(task, params.get('messages') or [], params.get('max_tokens'), params.get('model'))
+    routing = {'task': task, 'candidates': candidates, 'attempts': 0, 'failover': False, 'hedged': False}
+    last_error = None
+    
+    index = 0
+    while index < len(candidates):
+        model = candidates[index]
+        is_last = index == len(candidates) - 1
+        attempt_params, budget = prepare_for_model(route, model, params)
+        routing['attempts'] += 1
+        
+        if is_last or not HEDGING_ENABLED:
+            # Sem candidato para hedge: chamada na própria thread da requisição
+            try:
+                response = _timed_call(client, model, attempt_params, MAX_RETRIES if is_last else 0)
+            except RETRYABLE_ERRORS as e:
+                last_error = e
+                if is_last:
+                    raise
+                log_failover(route, model, e, candidates[index + 1])
+                index += 1
+                continue
+            routing.update(model=model, failover=index > 0)
+            return response, attempt_params, budget, routing
+        
+        hedge_model = candidates[index + 1]
+        outcome, hedged, result = _hedged_call(
+            client, route, params, model, attempt_params, hedge_model, index + 1 == len(candidates) - 1
+        )
+        if hedged:
+            routing.update(hedged=True, attempts=routing['attempts'] + 1)
+        if outcome == 'primary':
+            routing.update(model=model, failover=index > 0)
+            return result, attempt_params, budget, routing
+        if outcome == 'hedge':
+            hedge_params, hedge_budget, response = result
+            routing.update(model=hedge_model, failover=True)
+            return response, hedge_params, hedge_budget, routing
+        
+        last_error = result
+        if not isinstance(last_error, RETRYABLE_ERRORS):
+            raise last_error
+        step = 2 if hedged else 1
+        if index + step >= len(candidates):
+            raise last_error
+        log_failover(route, model, last_error, candidates[index + step])
+        index += step
+    
+    raise last_error
+
+def open_routed_stream(client, route, task, **params):
+    """Abrir uma resposta em streaming com failover até o primeiro byte (sem hedging).
+    
+    Retorna (stream, params enviados, orçamento, informações do roteamento).
+    """
+    candidates = select_models(task, params.get('messages') or [], params.get('max_tokens'), params.get('model'))
+    routing = {'task': task, 'candidates': candidates, 'attempts': 0, 'failover': False, 'hedged': False}
+    
+    for index, model in enumerate(candidates):
+        is_last = index == len(candidates) - 1
+        attempt_params, budget = prepare_for_model(route, model, params)
+        routing['attempts'] += 1
+        started = time.perf_counter()
+        try:
+            stream = create_chat_completion(
+                client,
+                max_retries=MAX_RETRIES if is_last else 0,
+                **attempt_params,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+        except RETRYABLE_ERRORS as e:
+            record_error(model, e)
+            if is_last:
+                raise
+            log_failover(route, model, e, candidates[index + 1])
+            continue
+        except Exception as e:
+            record_error(model, e)
+            raise
+        # Tempo até o primeiro byte entra na latência do modelo (base do atraso do hedge)
+        record_success(model, time.perf_counter() - started)
+        
+        routing.update(model=model, failover=index > 0)
+        return stream, attempt_params, budget, routing
+
+def get_routing_stats():
+    """Chamadas, erros, failovers, hedges e latência p50/p95 por modelo"""
+    with _lock:
+        models = set(_stats) | set(_latencies)
+        stats = {model: dict(_stats.get(model, {})) for model in models}
+        cooling = {model: round(until - time.time(), 1) for model, until in _cooldown_until.items() if until > time.time()}
+    
+    for model in stats:
+        percentiles = latency_percentiles(model)
+        if percentiles:
+            stats[model].update(
+                latency_p50_ms=round(percentiles['p50'] * 1000, 1),
+                latency_p95_ms=round(percentiles['p95'] * 1000, 1),
+                latency_samples=percentiles['samples']
+            )
+        stats[model]['hedge_after_ms'] = round(hedge_delay(model) * 1000, 1)
+    
+    return {
+        'hedging': HEDGING_ENABLED,
+        'routes': {task: routing_table(task) for task in ROUTING_TABLE},
+        'models': stats,
+        'cooldown_seconds': cooling
+    }
@@ -0,0 +1,334 @@
+import hashlib
+import os
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import httpcore
+import httpx
+import openai
+
+from src.utils.metrics import observe_llm_call
+
+# Pool de conexões HTTP (keep-alive) compartilhado por todas as requisições do processo
+POOL_MAX_CONNECTIONS = int(os.getenv('OPENAI_POOL_MAX_CONNECTIONS', 20))
+POOL_MAX_KEEPALIVE = int(os.getenv('OPENAI_POOL_MAX_KEEPALIVE', 10))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_POOL_KEEPALIVE_EXPIRY', 60))
+CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', 10))
+REQUEST_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 120))
+
+# Novas tentativas com backoff exponencial e jitter
+MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 3))
+BACKOFF_BASE = float(os.getenv('OPENAI_BACKOFF_BASE', 1.0))
+BACKOFF_MAX = float(os.getenv('OPENAI_BACKOFF_MAX', 20.0))
+
+# Chaves diferentes não podem crescer o registro indefinidamente
+MAX_CLIENTS = int(os.getenv('OPENAI_MAX_CLIENTS', 16))
+
+# Conexões interrompíveis (CallScope) só quando o hedging do model_router está ligado
+INTERRUPTIBLE_CALLS = os.getenv('LLM_HEDGING', '0') == '1'
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError
+)
+
+_clients = OrderedDict()
+_pools = {}
+_lock = threading.Lock()
+_metrics = {
+    'clients_created': 0,
+    'clients_reused': 0,
+    'clients_evicted': 0,
+    'requests': 0,
+    'retries': 0,
+    'rate_limited': 0,
+    'failures': 0
+}
+
+_call_scope = threading.local()
+
+class CallScope:
+    """Chamada ao modelo que outra thread pode interromper (ex.: a perdedora de um hedge).
+    
+    Enquanto a thread lê a resposta dentro de active(), o socket fica
+    registrado aqui; cancel() o desliga e a leitura termina com erro de conexão.
+    """
+    
+    def __init__(self):
+        self.cancelled = False
+        self._streams = set()
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def active(self):
+        _call_scope.current = self
+        try:
+            yield self
+        finally:
+            _call_scope.current = None
+    
+    def attach(self, stream):
+        with self._lock:
+            if self.cancelled:
+                return False
+            self._streams.add(stream)
+            return True
+    
+    def detach(self, stream):
+        with self._lock:
+            self._streams.discard(stream)
+    
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            streams = list(self._streams)
+        for stream in streams:
+            stream.abort()
+
+def call_cancelled():
+    """A chamada da thread atual foi interrompida por CallScope.cancel()"""
+    scope = getattr(_call_scope, 'current', None)
+    return scope is not None and scope.cancelled
+
+class _ScopedStream(httpcore.NetworkStream):
+    # Conexão do pool que registra o socket no CallScope da thread durante cada leitura
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def read(self, max_bytes, timeout=None):
+        scope = getattr(_call_scope, 'current', None)
+        if scope is None:
+            return self._stream.read(max_bytes, timeout)
+        if not scope.attach(self):
+            raise httpcore.ReadError('Chamada cancelada')
+        try:
+            return self._stream.read(max_bytes, timeout)
+        finally:
+            scope.detach(self)
+    
+    def write(self, buffer, timeout=None):
+        self._stream.write(buffer, timeout)
+    
+    def close(self):
+        self._stream.close()
+    
+    def start_tls(self, ssl_context, server_hostname=None, timeout=None):
+        return _ScopedStream(self._stream.start_tls(ssl_context, server_hostname, timeout))
+    
+    def get_extra_info(self, info):
+        return self._stream.get_extra_info(info)
+    
+    def abort(self):
+        # shutdown (e não close) acorda a thread bloqueada na leitura
+        sock = self._stream.get_extra_info('socket')
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+class _ScopedBackend(httpcore.NetworkBackend):
+    def __init__(self):
+        self._backend = httpcore.SyncBackend()
+    
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        return _ScopedStream(self._backend.connect_tcp(host, port, timeout, local_address, socket_options))
+    
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return _ScopedStream(self._backend.connect_unix_socket(path, timeout, socket_options))
+    
+    def sleep(self, seconds):
+        self._backend.sleep(seconds)
+
+# Erros do httpcore convertidos nos equivalentes do httpx (o SDK da OpenAI trata os do httpx)
+_HTTPCORE_ERRORS = {
+    httpcore.TimeoutException: httpx.TimeoutException,
+    httpcore.ConnectTimeout: httpx.ConnectTimeout,
+    httpcore.ReadTimeout: httpx.ReadTimeout,
+    httpcore.WriteTimeout: httpx.WriteTimeout,
+    httpcore.PoolTimeout: httpx.PoolTimeout,
+    httpcore.NetworkError: httpx.NetworkError,
+    httpcore.ConnectError: httpx.ConnectError,
+    httpcore.ReadError: httpx.ReadError,
+    httpcore.WriteError: httpx.WriteError,
+    httpcore.ProxyError: httpx.ProxyError,
+    httpcore.UnsupportedProtocol: httpx.UnsupportedProtocol,
+    httpcore.ProtocolError: httpx.ProtocolError,
+    httpcore.LocalProtocolError: httpx.LocalProtocolError,
+    httpcore.RemoteProtocolError: httpx.RemoteProtocolError
+}
+
+@contextmanager
+def _httpx_errors():
+    try:
+        yield
+    except tuple(_HTTPCORE_ERRORS) as e:
+        # Classe mais específica da hierarquia do erro que tem equivalente no httpx
+        mapped = next(_HTTPCORE_ERRORS[cls] for cls in type(e).__mro__ if cls in _HTTPCORE_ERRORS)
+        raise mapped(str(e)) from e
+
+class _PoolStream(httpx.SyncByteStream):
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def __iter__(self):
+        with _httpx_errors():
+            yield from self._stream
+    
+    def close(self):
+        if hasattr(self._stream, 'close'):
+            self._stream.close()
+
+class _PoolTransport(httpx.BaseTransport):
+    """Transporte do httpx sobre um httpcore.ConnectionPool próprio (contagem de conexões e backend de rede)"""
+    
+    def __init__(self, network_backend=None):
+        self.pool = httpcore.ConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            network_backend=network_backend
+        )
+    
+    def handle_request(self, request):
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions
+        )
+        with _httpx_errors():
+            response = self.pool.handle_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_PoolStream(response.stream),
+            extensions=response.extensions
+        )
+    
+    def close(self):
+        self.pool.close()
+
+def _registry_key(api_key):
+    # A chave da API não fica exposta nas métricas nem em memória como chave do dicionário
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+def _build_client(api_key):
+    """Cliente OpenAI e o pool de conexões dele"""
+    # Com hedging, as conexões são interrompíveis por CallScope
+    transport = _PoolTransport(_ScopedBackend() if INTERRUPTIBLE_CALLS else None)
+    http_client = httpx.Client(transport=transport, timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT))
+    # Retentativas ficam a cargo de create_chat_completion, com jitter
+    return openai.OpenAI(api_key=api_key, http_client=http_client, max_retries=0), transport.pool
+
+def get_openai_client(api_key):
+    """Obter o cliente OpenAI compartilhado para a API key, criando-o na primeira vez"""
+    key = _registry_key(api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            _metrics['clients_reused'] += 1
+            return client
+        
+        client, _pools[key] = _build_client(api_key)
+        _clients[key] = client
+        _metrics['clients_created'] += 1
+        
+        # O cliente removido só sai do registro: outras threads podem estar no meio de uma
+        # chamada com ele, e o pool de conexões é fechado quando a última referência cai
+        while len(_clients) > MAX_CLIENTS:
+            evicted, _ = _clients.popitem(last=False)
+            _pools.pop(evicted, None)
+            _metrics['clients_evicted'] += 1
+    return client
+
+@contextmanager
+def temporary_openai_client(api_key):
+    """Cliente avulso, fora do registro e fechado ao final (ex.: validar uma chave informada pelo usuário)"""
+    client, _ = _build_client(api_key)
+    try:
+        yield client
+    finally:
+        client.close()
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, error=None):
+    """Atraso com jitter total (full jitter), respeitando Retry-After quando enviado"""
+    retry_after = _retry_after(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+def create_chat_completion(client, max_retries=MAX_RETRIES, **params):
+    """chat.completions.create com novas tentativas em limite de taxa e falhas transitórias"""
+    attempt = 0
+    while True:
+        with _lock:
+            _metrics['requests'] += 1
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(**params)
+            observe_llm_call(params.get('model'), time.perf_counter() - started)
+            return response
+        except RETRYABLE_ERRORS as e:
+            if call_cancelled():
+                observe_llm_call(params.get('model'), time.perf_counter() - started, 'cancelled')
+                raise
+            observe_llm_call(
+                params.get('model'), time.perf_counter() - started,
+                'rate_limited' if isinstance(e, openai.RateLimitError) else 'error'
+            )
+            with _lock:
+                if isinstance(e, openai.RateLimitError):
+                    _metrics['rate_limited'] += 1
+                if attempt >= max_retries:
+                    _metrics['failures'] += 1
+                    raise
+                _metrics['retries'] += 1
+            time.sleep(backoff_delay(attempt, e))
+            attempt += 1
+        except Exception:
+            observe_llm_call(params.get('model'), time.perf_counter() - started, 'error')
+            raise
+
+def get_client_metrics():
+    """Métricas de reutilização do pool de clientes OpenAI"""
+    with _lock:
+        metrics = dict(_metrics)
+        pools = list(_pools.values())
+    
+    lookups = metrics['clients_created'] + metrics['clients_reused']
+    metrics['active_clients'] = len(pools)
+    metrics['reuse_ratio'] = round(metrics['clients_reused'] / lookups, 3) if lookups else 0.0
+    metrics['pooled_connections'] = sum(len(pool.connections) for pool in pools)
+    metrics['pool_limits'] = {
+        'max_connections': POOL_MAX_CONNECTIONS,
+        'max_keepalive_connections': POOL_MAX_KEEPALIVE,
+        'keepalive_expiry': POOL_KEEPALIVE_EXPIRY,
+        'timeout': REQUEST_TIMEOUT,
+        'connect_timeout': CONNECT_TIMEOUT
+    }
+    return metrics
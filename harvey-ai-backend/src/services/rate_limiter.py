@@ -0,0 +1,109 @@
+"""Limites por minuto de requisições (RPM) e tokens (TPM) da conta OpenAI.
+
+Como o limitador da OpenAI, os baldes começam cheios e são reabastecidos
+continuamente (limite / 60 por segundo). Uma chamada reserva as requisições e
+os tokens estimados (entrada + max_tokens) antes de ir ao modelo; ao terminar,
+a diferença para os tokens realmente consumidos é devolvida ou cobrada.
+"""
+import os
+import threading
+import time
+
+# Limites do GPT-4 em cada nível de uso (usage tier) da conta OpenAI
+RATE_LIMIT_TIERS = {
+    'tier-1': {'rpm': 500, 'tpm': 10000},
+    'tier-2': {'rpm': 5000, 'tpm': 40000},
+    'tier-3': {'rpm': 5000, 'tpm': 80000},
+    'tier-4': {'rpm': 10000, 'tpm': 300000},
+    'tier-5': {'rpm': 10000, 'tpm': 1000000}
+}
+DEFAULT_RATE_TIER = 'tier-3'
+
+# Espera máxima entre verificações (cancelamento do lote é percebido nesse intervalo)
+MAX_POLL_SECONDS = 1.0
+
+class RateLimiter:
+    """Baldes de requisições e tokens por minuto; reservas atendidas por ordem de chegada"""
+
+    def __init__(self, rpm, tpm, tier=None, clock=time.monotonic):
+        self.tier = tier
+        self.limits = {'requests': rpm, 'tokens': tpm}
+        self._levels = dict(self.limits)
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+        # Quem chegou primeiro reserva primeiro: a ordem do lote (prazo, prioridade) é mantida
+        self._turn = threading.Lock()
+        self._stats = {'reservations': 0, 'waits': 0, 'wait_seconds': 0.0, 'reserved_tokens': 0, 'used_tokens': 0}
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._updated
+        self._updated = now
+        for kind, limit in self.limits.items():
+            self._levels[kind] = min(limit, self._levels[kind] + elapsed * limit / 60)
+
+    def clamp(self, requests, tokens):
+        """Reserva possível: um pedido maior que o limite por minuto espera o balde cheio"""
+        return min(requests, self.limits['requests']), min(tokens, self.limits['tokens'])
+
+    def acquire(self, requests, tokens, cancelled=None):
+        """Esperar capacidade e reservar; retorna os segundos de espera ou None se cancelado"""
+        wanted = dict(zip(('requests', 'tokens'), self.clamp(requests, tokens)))
+        started = self._clock()
+        with self._turn:
+            while True:
+                with self._lock:
+                    self._refill()
+                    wait = max((wanted[kind] - self._levels[kind]) * 60 / self.limits[kind] for kind in wanted)
+                    if wait <= 0:
+                        for kind, amount in wanted.items():
+                            self._levels[kind] -= amount
+                        waited = self._clock() - started
+                        self._stats['reservations'] += 1
+                        self._stats['reserved_tokens'] += wanted['tokens']
+                        if waited > 0.001:
+                            self._stats['waits'] += 1
+                            self._stats['wait_seconds'] += waited
+                        return waited
+                if cancelled is None:
+                    time.sleep(min(wait, MAX_POLL_SECONDS))
+                elif cancelled.wait(min(wait, MAX_POLL_SECONDS)):
+                    return None
+
+    def settle(self, reserved_tokens, used_tokens):
+        """Ajustar o balde de tokens ao consumo real (acertos de cache devolvem a reserva inteira)"""
+        reserved_tokens = self.clamp(0, reserved_tokens)[1]
+        with self._lock:
+            self._refill()
+            self._levels['tokens'] = min(self.limits['tokens'], self._levels['tokens'] + reserved_tokens - used_tokens)
+            self._stats['used_tokens'] += used_tokens
+
+    def snapshot(self):
+        with self._lock:
+            self._refill()
+            return {
+                'tier': self.tier,
+                'rpm': self.limits['requests'],
+                'tpm': self.limits['tokens'],
+                'available_requests': int(self._levels['requests']),
+                'available_tokens': int(self._levels['tokens']),
+                **{key: round(value, 3) if isinstance(value, float) else value for key, value in self._stats.items()}
+            }
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Limitador único do processo: todos os lotes dividem os limites da mesma conta"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            tier = os.getenv('LLM_RATE_TIER', DEFAULT_RATE_TIER)
+            limits = RATE_LIMIT_TIERS.get(tier, RATE_LIMIT_TIERS[DEFAULT_RATE_TIER])
+            _limiter = RateLimiter(
+                int(os.getenv('LLM_RPM_LIMIT', limits['rpm'])),
+                int(os.getenv('LLM_TPM_LIMIT', limits['tpm'])),
+                tier=tier
+            )
+        return _limiter
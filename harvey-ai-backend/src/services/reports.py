@@ -0,0 +1,279 @@
+import html
+import io
+import re
+from sqlalchemy import func, tuple_
+from src.models.user import db
+from src.models.document import Document
+
+DOCUMENT_BATCH_SIZE = 200
+EXCERPT_CHARS = 600
+
+# Relatório como sequência de blocos; os renderizadores convertem cada bloco no formato pedido
+def heading(text, level=1):
+    return ('heading', level, text)
+
+def fields(items):
+    return ('fields', items)
+
+def paragraph(text):
+    return ('paragraph', text)
+
+def item(text):
+    return ('item', text)
+
+def quote(text):
+    return ('quote', text)
+
+def _date(value, pattern='%d/%m/%Y %H:%M'):
+    return value.strftime(pattern) if value else 'Não informado'
+
+class CaseDocuments:
+    """Documentos de um caso lidos em lotes por (created_at, id), sem carregar o texto inteiro.
+
+    Cada linha é uma tupla de colunas (não entra no identity map da sessão) e o
+    trecho opcional do conteúdo é cortado pelo próprio banco (substr).
+    """
+
+    def __init__(self, case_id, batch_size=DOCUMENT_BATCH_SIZE, excerpt_chars=0):
+        self.case_id = case_id
+        self.batch_size = batch_size
+        self.excerpt_chars = excerpt_chars
+
+    def stats(self):
+        """Total e quantidade por tipo em uma consulta agrupada"""
+        rows = (
+            db.session.query(Document.document_type, func.count(Document.id))
+            .filter(Document.case_id == self.case_id)
+            .group_by(Document.document_type)
+            .all()
+        )
+        by_type = dict(rows)
+        return {'total': sum(by_type.values()), 'by_type': by_type}
+
+    def __iter__(self):
+        columns = [
+            Document.id, Document.title, Document.document_type, Document.status,
+            Document.created_at, Document.updated_at, Document.content_size
+        ]
+        if self.excerpt_chars:
+            columns.append(func.substr(Document.content, 1, self.excerpt_chars).label('excerpt'))
+
+        last = None
+        while True:
+            query = db.session.query(*columns).filter(Document.case_id == self.case_id)
+            if last is not None:
+                query = query.filter(tuple_(Document.created_at, Document.id) > tuple_(*last))
+            rows = query.order_by(Document.created_at, Document.id).limit(self.batch_size).all()
+            if not rows:
+                return
+            yield from rows
+            last = (rows[-1].created_at, rows[-1].id)
+
+def case_header(case, title):
+    yield heading(f'{title}: {case.title}', 1)
+    yield heading('Informações Gerais', 2)
+    yield fields([
+        ('Número', case.number),
+        ('Status', case.status),
+        ('Prioridade', case.priority),
+        ('Órgão', case.organ or 'Não informado'),
+        ('Modalidade', case.modality or 'Não informada')
+    ])
+
+def summary_template(case, documents):
+    """Dados do caso e a lista de documentos com tipo, status e datas"""
+    yield from case_header(case, 'Relatório do Caso')
+    yield heading('Documentos Associados', 2)
+    yield paragraph(f"Total de documentos: {documents.stats()['total']}")
+    for doc in documents:
+        yield heading(doc.title, 3)
+        yield fields([
+            ('Tipo', doc.document_type),
+            ('Status', doc.status),
+            ('Criado em', _date(doc.created_at)),
+            ('Atualizado em', _date(doc.updated_at))
+        ])
+
+def detailed_template(case, documents):
+    """Resumo acrescido de distribuição por tipo, tamanho e trecho inicial de cada documento"""
+    documents.excerpt_chars = EXCERPT_CHARS
+    stats = documents.stats()
+
+    yield from case_header(case, 'Relatório Detalhado do Caso')
+    if case.object_description:
+        yield heading('Objeto', 2)
+        yield paragraph(case.object_description)
+    yield fields([
+        ('Valor estimado', f'R$ {case.estimated_value:,.2f}' if case.estimated_value is not None else 'Não informado'),
+        ('Prazo', _date(case.deadline))
+    ])
+
+    yield heading('Documentos por Tipo', 2)
+    for document_type, count in sorted(stats['by_type'].items()):
+        yield item(f'{document_type}: {count}')
+
+    yield heading('Documentos Associados', 2)
+    yield paragraph(f"Total de documentos: {stats['total']}")
+    for doc in documents:
+        yield heading(doc.title, 3)
+        yield fields([
+            ('Tipo', doc.document_type),
+            ('Status', doc.status),
+            ('Tamanho', f'{doc.content_size or 0} bytes'),
+            ('Criado em', _date(doc.created_at)),
+            ('Atualizado em', _date(doc.updated_at))
+        ])
+        if doc.excerpt:
+            excerpt = re.sub(r'\s+', ' ', doc.excerpt).strip()
+            if (doc.content_size or 0) > len(doc.excerpt.encode('utf-8')):
+                excerpt += ' (...)'
+            yield quote(excerpt)
+
+def timeline_template(case, documents):
+    """Linha do tempo do caso: criação, documentos agrupados por dia e prazo"""
+    yield from case_header(case, 'Linha do Tempo do Caso')
+    yield fields([
+        ('Criado em', _date(case.created_at)),
+        ('Prazo', _date(case.deadline))
+    ])
+    yield heading('Eventos', 2)
+
+    current_day = None
+    for doc in documents:
+        day = _date(doc.created_at, '%d/%m/%Y')
+        if day != current_day:
+            current_day = day
+            yield heading(day, 3)
+        yield item(f"{_date(doc.created_at, '%H:%M')} - {doc.document_type}: {doc.title} ({doc.status})")
+
+    if current_day is None:
+        yield paragraph('Nenhum documento registrado.')
+
+# Modelos disponíveis: nome -> função (case, documents) que gera blocos
+REPORT_TEMPLATES = {}
+
+def register_report_template(name, template):
+    REPORT_TEMPLATES[name] = template
+
+register_report_template('summary', summary_template)
+register_report_template('detailed', detailed_template)
+register_report_template('timeline', timeline_template)
+
+class MarkdownRenderer:
+    mimetype = 'text/markdown'
+    extension = 'md'
+
+    def render(self, blocks, title):
+        in_list = False
+        for block in blocks:
+            kind = block[0]
+            if in_list and kind != 'item':
+                yield '\n'
+            in_list = kind == 'item'
+            if kind == 'heading':
+                yield f"{'#' * block[1]} {block[2]}\n\n"
+            elif kind == 'fields':
+                yield ''.join(f'- **{label}:** {value}\n' for label, value in block[1]) + '\n'
+            elif kind == 'paragraph':
+                yield f'{block[1]}\n\n'
+            elif kind == 'item':
+                yield f'- {block[1]}\n'
+            elif kind == 'quote':
+                yield '> ' + block[1].replace('\n', '\n> ') + '\n\n'
+        if in_list:
+            yield '\n'
+
+class HtmlRenderer:
+    mimetype = 'text/html'
+    extension = 'html'
+
+    def render(self, blocks, title):
+        esc = html.escape
+        yield f'<!DOCTYPE html>\n<html lang="pt-BR">\n<head><meta charset="utf-8"><title>{esc(title)}</title></head>\n<body>\n'
+        in_list = False
+        for block in blocks:
+            kind = block[0]
+            if in_list and kind != 'item':
+                yield '</ul>\n'
+            elif not in_list and kind == 'item':
+                yield '<ul>\n'
+            in_list = kind == 'item'
+            if kind == 'heading':
+                yield f'<h{block[1]}>{esc(block[2])}</h{block[1]}>\n'
+            elif kind == 'fields':
+                yield '<ul>\n' + ''.join(
+                    f'<li><strong>{esc(label)}:</strong> {esc(str(value))}</li>\n' for label, value in block[1]
+                ) + '</ul>\n'
+            elif kind == 'paragraph':
+                yield f'<p>{esc(block[1])}</p>\n'
+            elif kind == 'item':
+                yield f'<li>{esc(block[1])}</li>\n'
+            elif kind == 'quote':
+                yield f'<blockquote>{esc(block[1])}</blockquote>\n'
+        if in_list:
+            yield '</ul>\n'
+        yield '</body>\n</html>\n'
+
+class DocxRenderer:
+    mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    extension = 'docx'
+
+    def render(self, blocks, title):
+        # python-docx monta o arquivo inteiro em memória; o .docx sai de uma vez ao final
+        try:
+            import docx
+        except ImportError:
+            raise RuntimeError('Exportação DOCX requer o pacote python-docx')
+
+        document = docx.Document()
+        document.core_properties.title = title
+        for block in blocks:
+            kind = block[0]
+            if kind == 'heading':
+                document.add_heading(block[2], level=min(block[1], 9))
+            elif kind == 'fields':
+                for label, value in block[1]:
+                    line = document.add_paragraph(style='List Bullet')
+                    line.add_run(f'{label}: ').bold = True
+                    line.add_run(str(value))
+            elif kind == 'paragraph':
+                document.add_paragraph(block[1])
+            elif kind == 'item':
+                document.add_paragraph(block[1], style='List Bullet')
+            elif kind == 'quote':
+                document.add_paragraph(block[1], style='Quote')
+
+        buffer = io.BytesIO()
+        document.save(buffer)
+        yield buffer.getvalue()
+
+REPORT_FORMATS = {
+    'markdown': MarkdownRenderer,
+    'html': HtmlRenderer,
+    'docx': DocxRenderer
+}
+
+# Formatos de texto, que podem ser gravados como conteúdo de um Document
+TEXT_FORMATS = ['markdown', 'html']
+
+def report_title(case):
+    return f'Relatório - {case.title}'
+
+def render_report(case, template='summary', fmt='markdown', batch_size=DOCUMENT_BATCH_SIZE):
+    """Gerar o relatório em partes (str para markdown/html, bytes para docx)"""
+    if template not in REPORT_TEMPLATES:
+        raise ValueError(f"Modelo de relatório inválido. Use: {', '.join(REPORT_TEMPLATES)}")
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Formato inválido. Use: {', '.join(REPORT_FORMATS)}")
+
+    blocks = REPORT_TEMPLATES[template](case, CaseDocuments(case.id, batch_size=batch_size))
+    return REPORT_FORMATS[fmt]().render(blocks, report_title(case))
+
+def build_report(case, template='summary', fmt='markdown'):
+    """Relatório completo em texto, montado em um buffer (sem concatenação repetida)"""
+    if fmt not in TEXT_FORMATS:
+        raise ValueError(f"Formato inválido para salvar. Use: {', '.join(TEXT_FORMATS)}")
+    buffer = io.StringIO()
+    for part in render_report(case, template, fmt):
+        buffer.write(part)
+    return buffer.getvalue()
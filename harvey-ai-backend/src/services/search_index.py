@@ -0,0 +1,132 @@
+import re
+from sqlalchemy import literal_column, select, text
+
+# Acentos são ignorados na indexação e na busca ("licitacao" encontra "licitação")
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Colunas indexadas e seus pesos no BM25 (maior peso = mais relevante)
+CASE_COLUMNS = ['number', 'title', 'organ', 'description', 'object_description']
+CASE_WEIGHTS = [10.0, 5.0, 2.0, 1.0, 1.0]
+DOCUMENT_COLUMNS = ['title', 'content']
+DOCUMENT_WEIGHTS = [5.0, 1.0]
+
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+
+_available = False
+
+def _fts_ddl(table, columns):
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    fts = f'{table}_fts'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', "
+        f"content_rowid='id', tokenize='{FTS_TOKENIZER}')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        # Só reindexa quando uma coluna indexada muda (status/prioridade não custam nada)
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+    ]
+
+def init_search_index(db):
+    """Criar tabelas FTS5 e gatilhos de sincronização (somente SQLite)"""
+    global _available
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        _available = False
+        return False
+    
+    with engine.begin() as conn:
+        existing = {row[0] for row in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('cases_fts', 'documents_fts')"
+        ))}
+        for table, columns in (('cases', CASE_COLUMNS), ('documents', DOCUMENT_COLUMNS)):
+            for statement in _fts_ddl(table, columns):
+                conn.execute(text(statement))
+            # Índice criado agora: popular com as linhas já existentes
+            if f'{table}_fts' not in existing:
+                conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+    
+    _available = True
+    return True
+
+def is_available():
+    return _available
+
+def rebuild_search_index(db):
+    """Reconstruir os índices a partir das tabelas de origem"""
+    with db.engine.begin() as conn:
+        for table in ('cases', 'documents'):
+            conn.execute(text(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')"))
+
+def build_match_query(term):
+    """Converter o texto digitado em consulta FTS5 segura (termos com prefixo, todos obrigatórios)"""
+    tokens = re.findall(r'\w+', term or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+def _weights(weights):
+    return ', '.join(str(w) for w in weights)
+
+def search_cases(db, term, limit=20, offset=0):
+    """Buscar casos por relevância (BM25) com trecho destacado"""
+    match = build_match_query(term)
+    if not match:
+        return []
+    
+    rows = db.session.execute(text(f"""
+        SELECT rowid AS id,
+               bm25(cases_fts, {_weights(CASE_WEIGHTS)}) AS rank,
+               highlight(cases_fts, 1, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}') AS title_highlight,
+               snippet(cases_fts, -1, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '…', 16) AS snippet
+        FROM cases_fts
+        WHERE cases_fts MATCH :match
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """), {'match': match, 'limit': limit, 'offset': offset})
+    return [dict(row._mapping) for row in rows]
+
+def search_documents(db, term, limit=20, offset=0, case_id=None, document_type=None):
+    """Buscar documentos (inclusive o texto completo) por relevância, com trecho destacado"""
+    match = build_match_query(term)
+    if not match:
+        return []
+    
+    filters = ''
+    params = {'match': match, 'limit': limit, 'offset': offset}
+    if case_id:
+        filters += ' AND d.case_id = :case_id'
+        params['case_id'] = case_id
+    if document_type:
+        filters += ' AND d.document_type = :document_type'
+        params['document_type'] = document_type
+    
+    rows = db.session.execute(text(f"""
+        SELECT documents_fts.rowid AS id,
+               bm25(documents_fts, {_weights(DOCUMENT_WEIGHTS)}) AS rank,
+               highlight(documents_fts, 0, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}') AS title_highlight,
+               snippet(documents_fts, 1, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '…', 24) AS snippet
+        FROM documents_fts
+        JOIN documents d ON d.id = documents_fts.rowid
+        WHERE documents_fts MATCH :match{filters}
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """), params)
+    return [dict(row._mapping) for row in rows]
+
+def matching_case_ids(term):
+    """Subconsulta com os ids de casos que casam com o termo, para filtros em queries ORM"""
+    match = build_match_query(term)
+    if not match:
+        return None
+    return (
+        select(literal_column('rowid'))
+        .select_from(text('cases_fts'))
+        .where(text('cases_fts MATCH :match').bindparams(match=match))
+    )
@@ -0,0 +1,172 @@
+import logging
+import re
+import threading
+from src.services.model_catalog import get_model_info
+from src.utils.metrics import count_llm_tokens
+
+logger = logging.getLogger(__name__)
+
+# Tokens extras por mensagem (papel e delimitadores) e do início da resposta
+TOKENS_PER_MESSAGE = 4
+REPLY_PRIMING_TOKENS = 3
+
+# Folga para a diferença entre a contagem local e a do servidor
+SAFETY_MARGIN_TOKENS = 64
+
+# Abaixo disso não vale reduzir a resposta: o texto de entrada é que é cortado
+MIN_OUTPUT_TOKENS = 256
+
+# Parte inicial preservada ao cortar um texto (o restante vem do final)
+TRUNCATE_HEAD_RATIO = 0.7
+TRUNCATION_MARKER = '\n\n[... trecho omitido por exceder o limite de tokens ...]\n\n'
+
+WORD_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+class TokenBudgetError(ValueError):
+    """Requisição que não cabe no contexto do modelo nem após o corte"""
+
+_encodings = {}
+
+def _encoding(model):
+    # tiktoken é opcional: sem ele, a contagem usa a estimativa local
+    if model not in _encodings:
+        try:
+            import tiktoken
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding('cl100k_base')
+        except ImportError:
+            _encodings[model] = None
+    return _encodings[model]
+
+def estimate_tokens(text):
+    """Estimativa offline, calibrada para ficar um pouco acima do BPE da OpenAI em português"""
+    return sum(1 + (len(piece) - 1) // 4 for piece in WORD_PATTERN.findall(text))
+
+def count_tokens(text, model='gpt-4'):
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+def count_message_tokens(messages, model='gpt-4'):
+    return REPLY_PRIMING_TOKENS + sum(
+        TOKENS_PER_MESSAGE + count_tokens(message.get('content') or '', model) for message in messages
+    )
+
+def truncate_to_tokens(text, max_tokens, model='gpt-4'):
+    """Cortar o meio do texto para caber em max_tokens, preservando início e fim"""
+    total = count_tokens(text, model)
+    if total <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(TRUNCATION_MARKER, model)
+    if budget <= 0:
+        return ''
+    
+    # Proporção de caracteres ajustada até caber (a contagem não é linear)
+    keep = int(len(text) * budget / total)
+    while keep > 0:
+        head = int(keep * TRUNCATE_HEAD_RATIO)
+        candidate = text[:head] + TRUNCATION_MARKER + text[len(text) - (keep - head):]
+        if count_tokens(candidate, model) <= max_tokens:
+            return candidate
+        keep = int(keep * 0.9)
+    return ''
+
+def fits_in_context(messages, model, max_tokens):
+    """Mensagens mais a resposta completa cabem no contexto do modelo, sem cortes"""
+    info = get_model_info(model)
+    return count_message_tokens(messages, model) + max_tokens + SAFETY_MARGIN_TOKENS <= info['context_window']
+
+def prepare_chat_request(route, params):
+    """Checar o orçamento de tokens antes da chamada ao modelo.
+    
+    Ajusta max_tokens ao espaço que sobra no contexto e, se ainda assim não
+    couber, corta a maior mensagem que não seja de sistema. Retorna
+    (params ajustados, orçamento).
+    """
+    model = params.get('model')
+    info = get_model_info(model)
+    messages = params.get('messages') or []
+    requested_output = min(params.get('max_tokens') or info['max_output_tokens'], info['max_output_tokens'])
+    prompt_tokens = count_message_tokens(messages, model)
+    available = info['context_window'] - SAFETY_MARGIN_TOKENS
+    
+    budget = {
+        'model': model,
+        'context_window': info['context_window'],
+        'prompt_tokens': prompt_tokens,
+        'max_tokens': requested_output,
+        'truncated_tokens': 0
+    }
+    
+    if prompt_tokens + requested_output > available:
+        output = max(available - prompt_tokens, MIN_OUTPUT_TOKENS)
+        output = min(output, requested_output)
+        excess = prompt_tokens + output - available
+        
+        if excess > 0:
+            candidates = [i for i, message in enumerate(messages) if message.get('role') != 'system']
+            if not candidates:
+                _record(route, rejected=True)
+                raise TokenBudgetError(f'Prompt de sistema excede o contexto do modelo {model}')
+            target = max(candidates, key=lambda i: len(messages[i].get('content') or ''))
+            content = messages[target].get('content') or ''
+            content_tokens = count_tokens(content, model)
+            if content_tokens - excess <= 0:
+                _record(route, rejected=True)
+                raise TokenBudgetError(f'Requisição excede o contexto do modelo {model} ({info["context_window"]} tokens)')
+            
+            messages = list(messages)
+            messages[target] = {**messages[target], 'content': truncate_to_tokens(content, content_tokens - excess, model)}
+            new_prompt_tokens = count_message_tokens(messages, model)
+            budget['truncated_tokens'] = prompt_tokens - new_prompt_tokens
+            budget['prompt_tokens'] = new_prompt_tokens
+            logger.warning('%s: prompt cortado em %d tokens para caber em %s', route, budget['truncated_tokens'], model)
+        
+        budget['max_tokens'] = output
+        params = {**params, 'messages': messages, 'max_tokens': output}
+    
+    return params, budget
+
+# Tokens por rota desde o início do processo
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _record(route, **increments):
+    with _stats_lock:
+        stats = _stats.setdefault(route, {
+            'calls': 0, 'cached': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+            'estimated_prompt_tokens': 0, 'truncated': 0, 'truncated_tokens': 0, 'rejected': 0
+        })
+        for key, value in increments.items():
+            stats[key] += int(value)
+
+def record_usage(route, budget, usage, cached=False):
+    """Registrar e logar os tokens de entrada e saída de uma chamada"""
+    _record(
+        route,
+        calls=1,
+        cached=cached,
+        prompt_tokens=usage.get('prompt_tokens', 0),
+        completion_tokens=usage.get('completion_tokens', 0),
+        estimated_prompt_tokens=budget['prompt_tokens'],
+        truncated=budget['truncated_tokens'] > 0,
+        truncated_tokens=budget['truncated_tokens']
+    )
+    count_llm_tokens(route, budget['model'], usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
+    logger.info(
+        '%s model=%s in=%d (estimado %d) out=%d cache=%s',
+        route, budget['model'], usage.get('prompt_tokens', 0), budget['prompt_tokens'],
+        usage.get('completion_tokens', 0), 'hit' if cached else 'miss'
+    )
+
+def get_token_stats():
+    with _stats_lock:
+        return {
+            'tokenizer': 'tiktoken' if _encoding('gpt-4') is not None else 'estimativa',
+            'routes': {route: dict(stats) for route, stats in _stats.items()}
+        }
@@ -0,0 +1,408 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Sem fcntl (Windows) o índice só é seguro com um processo escrevendo
+    fcntl = None
+
+import numpy as np
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import undefer
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'vectors')
+INITIAL_CAPACITY = 1024
+CHUNK_CHARS = 1200
+CHUNK_OVERLAP = 200
+
+# Colunas de metadados de cada vetor
+META_COLUMNS = ['document_id', 'case_id', 'chunk_no', 'start', 'end', 'type_code']
+
+# Tipos de documento usados para fundamentar novas minutas
+GROUNDING_TYPES = ('recurso', 'contrarrazao', 'analise')
+
+# Trechos abaixo dessa similaridade não ajudam a fundamentar e só aumentam o prompt
+MIN_GROUNDING_SCORE = 0.1
+
+def split_text(text, chunk_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """Dividir o texto em janelas sobrepostas, preferindo quebras de parágrafo e frase.
+    
+    Retorna lista de (início, fim) em caracteres.
+    """
+    text = text or ''
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_chars)
+        if end < len(text):
+            window = text[start:end]
+            cut = max(window.rfind('\n\n'), window.rfind('. '))
+            if cut > chunk_chars // 2:
+                end = start + cut + 1
+        if text[start:end].strip():
+            spans.append((start, end))
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return spans
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+class VectorIndex:
+    """Índice vetorial de busca exata (produto interno) em arquivos mapeados em memória.
+    
+    Arquivos em `directory`: vectors.f32 (capacidade x dim), meta.i64
+    (capacidade x 6), alive.u8 e manifest.json. Remoções marcam a linha como
+    inativa; compact() regrava os arquivos sem as linhas removidas.
+    
+    Vários processos (servidor WSGI, ASGI e workers da fila) usam os mesmos
+    arquivos: cada operação trava index.lock (flock) e relê o manifest antes
+    de ler ou gravar, para não escrever sobre linhas adicionadas por outro.
+    """
+    
+    def __init__(self, directory, dim, embedder_name):
+        self.directory = directory
+        self.dim = dim
+        self.embedder_name = embedder_name
+        self._lock = threading.RLock()
+        self._depth = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(self._path('index.lock'), 'a+')
+        
+        with self._locked(exclusive=True):
+            manifest = self._read_manifest()
+            if manifest and (manifest['dim'] != dim or manifest['embedder'] != embedder_name):
+                # Embedder trocado: vetores antigos são incompatíveis
+                manifest = None
+            
+            self.count = manifest['count'] if manifest else 0
+            self.capacity = manifest['capacity'] if manifest else INITIAL_CAPACITY
+            self.dead = manifest.get('dead', 0) if manifest else 0
+            self.backfill_pid = manifest.get('backfill_pid') if manifest else None
+            self._open(create=manifest is None)
+    
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+    
+    @contextmanager
+    def _locked(self, exclusive=False):
+        # RLock entre as threads do processo; flock entre processos, só na operação mais externa
+        with self._lock:
+            self._depth += 1
+            try:
+                if self._depth == 1 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    def _sync(self):
+        """Adotar contagem e capacidade gravadas por outro processo (reabrindo os arquivos se cresceram)"""
+        manifest = self._read_manifest()
+        if manifest is None:
+            return
+        self.count = manifest['count']
+        self.dead = manifest.get('dead', 0)
+        self.backfill_pid = manifest.get('backfill_pid')
+        if manifest['capacity'] != self.capacity:
+            self.capacity = manifest['capacity']
+            self._open()
+    
+    def _read_manifest(self):
+        try:
+            with open(self._path('manifest.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _write_manifest(self):
+        tmp = self._path('manifest.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({
+                'dim': self.dim,
+                'embedder': self.embedder_name,
+                'count': self.count,
+                'capacity': self.capacity,
+                'dead': self.dead,
+                'backfill_pid': self.backfill_pid
+            }, f)
+        os.replace(tmp, self._path('manifest.json'))
+    
+    def _open(self, create=False):
+        mode = 'w+' if create else 'r+'
+        self.vectors = np.memmap(self._path('vectors.f32'), dtype=np.float32, mode=mode, shape=(self.capacity, self.dim))
+        self.meta = np.memmap(self._path('meta.i64'), dtype=np.int64, mode=mode, shape=(self.capacity, len(META_COLUMNS)))
+        self.alive = np.memmap(self._path('alive.u8'), dtype=np.uint8, mode=mode, shape=(self.capacity,))
+        if create:
+            self._write_manifest()
+    
+    def _grow(self, needed):
+        new_capacity = self.capacity
+        while new_capacity < needed:
+            new_capacity *= 2
+        self.flush()
+        for name, dtype, width in (('vectors.f32', np.float32, self.dim), ('meta.i64', np.int64, len(META_COLUMNS)), ('alive.u8', np.uint8, 1)):
+            with open(self._path(name), 'r+b') as f:
+                f.truncate(new_capacity * width * np.dtype(dtype).itemsize)
+        self.capacity = new_capacity
+        self._open()
+        self._write_manifest()
+    
+    def add(self, vectors, meta_rows):
+        n = len(vectors)
+        if n == 0:
+            return
+        with self._locked(exclusive=True):
+            self._sync()
+            if self.count + n > self.capacity:
+                self._grow(self.count + n)
+            self.vectors[self.count:self.count + n] = vectors
+            self.meta[self.count:self.count + n] = np.asarray(meta_rows, dtype=np.int64)
+            self.alive[self.count:self.count + n] = 1
+            self.count += n
+            self._write_manifest()
+    
+    def remove_document(self, document_id):
+        with self._locked(exclusive=True):
+            self._sync()
+            rows = np.nonzero((self.meta[:self.count, 0] == document_id) & (self.alive[:self.count] == 1))[0]
+            if len(rows):
+                self.alive[rows] = 0
+                self.dead += len(rows)
+                self._write_manifest()
+            return len(rows)
+    
+    def search(self, query_vector, k=5, type_codes=None, exclude_case_id=None):
+        """Top-k por similaridade de cosseno. Retorna lista de (score, linha de metadados)"""
+        with self._locked():
+            self._sync()
+            if self.count == 0:
+                return []
+            scores = self.vectors[:self.count] @ query_vector.astype(np.float32)
+            mask = self.alive[:self.count] == 1
+            if type_codes is not None:
+                mask &= np.isin(self.meta[:self.count, 5], type_codes)
+            if exclude_case_id is not None:
+                mask &= self.meta[:self.count, 1] != exclude_case_id
+            scores = np.where(mask, scores, -np.inf)
+            
+            k = min(k, int(mask.sum()))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]), self.meta[i].tolist()) for i in top]
+    
+    def compact(self):
+        """Regravar os arquivos sem as linhas removidas"""
+        with self._locked(exclusive=True):
+            self._sync()
+            keep = np.nonzero(self.alive[:self.count] == 1)[0]
+            vectors = np.array(self.vectors[keep])
+            meta = np.array(self.meta[keep])
+            self.count = len(keep)
+            self.dead = 0
+            self.vectors[:self.count] = vectors
+            self.meta[:self.count] = meta
+            self.alive[:] = 0
+            self.alive[:self.count] = 1
+            self.flush()
+            self._write_manifest()
+    
+    def claim_backfill(self):
+        """Reservar a indexação completa inicial para este processo (só um processo a faz, uma vez)"""
+        with self._locked(exclusive=True):
+            self._sync()
+            if self.count or (self.backfill_pid and _process_alive(self.backfill_pid)):
+                return False
+            # Sem vetores e sem outro processo indexando (ou o que começou terminou sem gravar)
+            self.backfill_pid = os.getpid()
+            self._write_manifest()
+            return True
+    
+    def flush(self):
+        for array in (self.vectors, self.meta, self.alive):
+            array.flush()
+    
+    def stats(self):
+        with self._locked():
+            self._sync()
+        return {
+            'embedder': self.embedder_name,
+            'dim': self.dim,
+            'vectors': self.count - self.dead,
+            'removed': self.dead,
+            'capacity': self.capacity
+        }
+
+class SemanticIndex:
+    """Liga o índice vetorial aos documentos: fragmenta, gera embeddings e recupera contexto"""
+    
+    def __init__(self, embedder, directory=DEFAULT_INDEX_DIR):
+        self.embedder = embedder
+        self.index = VectorIndex(directory, embedder.dim, embedder.name)
+        # Um único worker serializa as escritas no índice fora da requisição
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vector-index')
+    
+    @staticmethod
+    def type_code(document_type):
+        from src.models.document import Document
+        
+        types = Document.get_document_types()
+        return types.index(document_type) if document_type in types else len(types)
+    
+    def index_document(self, document_id, case_id, document_type, content, replace=True):
+        """(Re)indexar um documento: remove vetores antigos e adiciona os novos"""
+        if replace:
+            self.index.remove_document(document_id)
+        spans = split_text(content)
+        if not spans:
+            return 0
+        vectors = self.embedder.embed([content[start:end] for start, end in spans])
+        code = self.type_code(document_type)
+        self.index.add(vectors, [
+            (document_id, case_id or 0, n, start, end, code) for n, (start, end) in enumerate(spans)
+        ])
+        if self.index.dead > max(1000, self.index.count // 3):
+            self.index.compact()
+        return len(spans)
+    
+    def remove_document(self, document_id):
+        return self.index.remove_document(document_id)
+    
+    def submit(self, upserts, deletes):
+        """Aplicar alterações em segundo plano (chamado após o commit)"""
+        def apply():
+            for document_id in deletes:
+                self.remove_document(document_id)
+            for item in upserts:
+                self.index_document(*item)
+            self.index.flush()
+        return self._executor.submit(apply)
+    
+    def search(self, query, k=5, document_types=GROUNDING_TYPES, exclude_case_id=None):
+        type_codes = [self.type_code(t) for t in document_types] if document_types else None
+        query_vector = self.embedder.embed([query])[0]
+        return self.index.search(query_vector, k=k, type_codes=type_codes, exclude_case_id=exclude_case_id)
+    
+    def rebuild(self, documents):
+        """Indexar em um índice vazio todos os documentos de um iterável de (id, case_id, tipo, conteúdo).
+        
+        Sem a remoção prévia de cada documento (uma varredura do índice por
+        documento): alterações feitas durante a indexação chegam pelo mesmo
+        worker (submit), depois dela, e substituem os vetores do documento.
+        """
+        for item in documents:
+            self.index_document(*item, replace=False)
+        self.index.flush()
+
+_semantic_index = None
+_lock = threading.Lock()
+
+def get_semantic_index():
+    global _semantic_index
+    if _semantic_index is None:
+        with _lock:
+            if _semantic_index is None:
+                from src.services.embeddings import get_embedder
+                
+                _semantic_index = SemanticIndex(get_embedder(), os.getenv('VECTOR_INDEX_DIR', DEFAULT_INDEX_DIR))
+    return _semantic_index
+
+def retrieve_context(query, k=4, document_types=GROUNDING_TYPES, exclude_case_id=None, max_chars=CHUNK_CHARS, min_score=None):
+    """Recuperar os k trechos de documentos anteriores mais parecidos com a consulta.
+    
+    Deve ser chamado dentro de app_context (o texto dos trechos vem do banco).
+    """
+    from src.models.document import Document
+    
+    hits = get_semantic_index().search(query, k=k, document_types=document_types, exclude_case_id=exclude_case_id)
+    if min_score is not None:
+        hits = [hit for hit in hits if hit[0] >= min_score]
+    if not hits:
+        return []
+    
+    documents = {
+        doc.id: doc
+        for doc in Document.query.options(undefer(Document.content)).filter(Document.id.in_({meta[0] for _, meta in hits})).all()
+    }
+    context = []
+    for score, (document_id, case_id, chunk_no, start, end, _) in hits:
+        document = documents.get(document_id)
+        if document is None or not document.content:
+            continue
+        context.append({
+            'document_id': document_id,
+            'case_id': case_id,
+            'title': document.title,
+            'document_type': document.document_type,
+            'chunk': chunk_no,
+            'score': round(score, 4),
+            'text': re.sub(r'\s+', ' ', document.content[start:end]).strip()[:max_chars]
+        })
+    return context
+
+def format_context(context):
+    """Formatar os trechos recuperados para inclusão no prompt"""
+    return '\n\n'.join(
+        f"[{i}] {item['title']} ({item['document_type']}):\n{item['text']}"
+        for i, item in enumerate(context, start=1)
+    )
+
+def init_semantic_index(app, db):
+    """Registrar a atualização incremental do índice e indexar documentos existentes na primeira vez"""
+    from src.models.document import Document
+    
+    semantic_index = get_semantic_index()
+    
+    @event.listens_for(db.session, 'after_flush')
+    def collect_document_changes(session, flush_context):
+        pending = session.info.setdefault('vector_index_pending', {'upserts': {}, 'deletes': set()})
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Document):
+                continue
+            # Atualizações que não mexem no texto (status, título) não reindexam
+            if obj in session.new or inspect(obj).attrs.content.history.has_changes():
+                pending['upserts'][obj.id] = (obj.id, obj.case_id, obj.document_type, obj.content or '')
+                pending['deletes'].discard(obj.id)
+        for obj in session.deleted:
+            if isinstance(obj, Document):
+                pending['upserts'].pop(obj.id, None)
+                pending['deletes'].add(obj.id)
+    
+    @event.listens_for(db.session, 'after_commit')
+    def apply_document_changes(session):
+        pending = session.info.pop('vector_index_pending', None)
+        if pending and (pending['upserts'] or pending['deletes']):
+            semantic_index.submit(list(pending['upserts'].values()), list(pending['deletes']))
+    
+    @event.listens_for(db.session, 'after_rollback')
+    def discard_document_changes(session):
+        session.info.pop('vector_index_pending', None)
+    
+    def build_existing():
+        with app.app_context():
+            rows = db.session.query(Document.id, Document.case_id, Document.document_type, Document.content).yield_per(500)
+            semantic_index.rebuild(rows)
+    
+    # Primeira execução com documentos já gravados: indexação completa em segundo plano
+    # (VECTOR_INDEX_BACKFILL=0 desliga, ex.: bancos de benchmark com milhões de documentos)
+    backfill = os.getenv('VECTOR_INDEX_BACKFILL', '1') != '0'
+    if backfill and db.session.query(Document.id).limit(1).first() and semantic_index.index.claim_backfill():
+        semantic_index._executor.submit(build_existing)
+    
+    return semantic_index
@@ -0,0 +1,58 @@
+import importlib.util
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from src.utils.database import database_url, engine_options, install_sqlite_pragmas
+
+# Drivers assíncronos equivalentes aos do modo WSGI
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg'
+}
+# Pacote de cada driver; asyncpg fica fora do requirements.txt, como o psycopg2-binary
+DRIVER_PACKAGES = {
+    'sqlite': 'aiosqlite',
+    'postgresql': 'asyncpg'
+}
+
+_engine = None
+_session_factory = None
+
+def async_database_url(url=None):
+    """Mesma DATABASE_URL do app Flask, com o driver assíncrono (aiosqlite ou asyncpg)"""
+    parsed = make_url(url or database_url())
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f'Banco {backend} sem driver assíncrono configurado')
+    package = DRIVER_PACKAGES[backend]
+    if importlib.util.find_spec(package) is None:
+        raise RuntimeError(f'Modo ASGI com {backend} requer o pacote {package} (pip install {package})')
+    return parsed.set(drivername=ASYNC_DRIVERS[backend])
+
+def get_async_engine():
+    """Engine assíncrono do banco principal (as réplicas de leitura ficam no modo WSGI)"""
+    global _engine
+    if _engine is None:
+        url = async_database_url()
+        options = engine_options(str(url))
+        if url.get_backend_name() == 'sqlite':
+            # aiosqlite repassa os argumentos ao sqlite3; a thread é dele
+            options = {'connect_args': {'timeout': options['connect_args']['timeout']}}
+        _engine = create_async_engine(url, **options)
+        if url.get_backend_name() == 'sqlite':
+            install_sqlite_pragmas(_engine.sync_engine)
+    return _engine
+
+def async_session():
+    """Nova AsyncSession (usar com async with); objetos continuam legíveis após o commit"""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(get_async_engine(), expire_on_commit=False)
+    return _session_factory()
+
+async def dispose_async_engine():
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_factory = None
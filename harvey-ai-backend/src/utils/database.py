@@ -0,0 +1,124 @@
+import os
+import random
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'app.db')
+
+# Prefixo das binds de réplicas de leitura (replica_0, replica_1, ...)
+REPLICA_BIND_PREFIX = 'replica_'
+
+# Métodos atendidos pelas réplicas; o cabeçalho força a leitura no primário
+READ_METHODS = ('GET', 'HEAD')
+CONSISTENCY_HEADER = 'X-Read-Consistency'
+
+def database_url():
+    """URL do banco principal: DATABASE_URL ou o SQLite local em src/database/app.db"""
+    url = os.getenv('DATABASE_URL', f'sqlite:///{DEFAULT_DATABASE_PATH}')
+    # Heroku/Railway ainda entregam o esquema antigo postgres://
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def replica_urls():
+    """Réplicas de leitura em DATABASE_REPLICA_URLS, separadas por vírgula"""
+    raw = os.getenv('DATABASE_REPLICA_URLS', '')
+    return [url.strip() for url in raw.split(',') if url.strip()]
+
+def engine_options(url):
+    """Opções do engine conforme o banco (pool no PostgreSQL, timeout de lock no SQLite)"""
+    backend = make_url(url).get_backend_name()
+    if backend == 'sqlite':
+        return {
+            'connect_args': {
+                'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 30000)) / 1000,
+                # Conexões do pool passam entre threads (workers da fila, streaming)
+                'check_same_thread': False
+            }
+        }
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        # Descarta conexões derrubadas pelo servidor antes de entregá-las à requisição
+        'pool_pre_ping': True
+    }
+
+def sqlite_pragmas():
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 30000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': -int(os.getenv('SQLITE_CACHE_KB', 64 * 1024)),
+        'temp_store': 'MEMORY'
+    }
+
+def install_sqlite_pragmas(engine):
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+def configure_database(app):
+    """Configurar banco principal, réplicas e opções de engine antes de db.init_app"""
+    url = database_url()
+    if make_url(url).get_backend_name() == 'sqlite':
+        path = make_url(url).database
+        if path and path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    app.config['SQLALCHEMY_BINDS'] = {
+        f'{REPLICA_BIND_PREFIX}{n}': {'url': replica, **engine_options(replica)}
+        for n, replica in enumerate(replica_urls())
+    }
+
+def init_engines(db):
+    """Aplicar pragmas nos engines SQLite (chamar dentro do app_context, após db.init_app)"""
+    for engine in db.engines.values():
+        if engine.dialect.name == 'sqlite':
+            install_sqlite_pragmas(engine)
+
+def reads_from_replica():
+    """Leituras de GET/HEAD vão para réplicas, salvo pedido explícito de consistência"""
+    return (
+        has_request_context()
+        and request.method in READ_METHODS
+        and request.headers.get(CONSISTENCY_HEADER, '').lower() != 'primary'
+    )
+
+class RoutingSession(Session):
+    """Sessão que envia as leituras das rotas GET para uma réplica.
+
+    Escritas, flushes e tudo o que vem depois de uma escrita na mesma sessão
+    continuam no primário (lê o que acabou de gravar).
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not self.info.get('wrote') and reads_from_replica():
+            replica = self._replica_engine()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_engine(self):
+        engines = self._db.engines
+        if 'replica' not in self.info:
+            # Uma réplica por sessão (por requisição): leituras da mesma página são consistentes
+            keys = [key for key in engines if isinstance(key, str) and key.startswith(REPLICA_BIND_PREFIX)]
+            self.info['replica'] = random.choice(keys) if keys else None
+        key = self.info['replica']
+        return engines[key] if key else None
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_wrote(session, flush_context):
+    session.info['wrote'] = True
@@ -0,0 +1,135 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.utils.database import reads_from_replica, replica_urls
+from src.utils.metrics import HTTP_CACHE_REQUESTS
+
+# JSON serializado das leituras mais consultadas (casos, documentos, opções), por processo
+HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', '1') != '0'
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv('HTTP_CACHE_MAX_ENTRIES', 2000))
+# Escritas de outros processos só são vistas após este prazo (segundos)
+HTTP_CACHE_TTL = float(os.getenv('HTTP_CACHE_TTL', 60))
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+# Versão por tabela: qualquer escrita muda a chave das listagens que dependem dela
+_table_versions = {}
+
+class _Entry:
+    __slots__ = ('etag', 'body', 'stored_at', 'generation')
+
+    def __init__(self, etag, body, generation):
+        self.etag = etag
+        self.body = body
+        self.stored_at = time.monotonic()
+        self.generation = generation
+
+def _versions(tables):
+    return tuple(_table_versions.get(table, 0) for table in tables)
+
+def _entity_key(table, entity_id):
+    return ('entity', table, entity_id)
+
+def _store(key, entry):
+    _entries[key] = entry
+    _entries.move_to_end(key)
+    while len(_entries) > HTTP_CACHE_MAX_ENTRIES:
+        _entries.popitem(last=False)
+
+def invalidate(tables=(), entities=()):
+    """Invalidar as listagens das tabelas e as entradas das entidades (tabela, id) gravadas"""
+    with _lock:
+        for table in set(tables) | {table for table, _ in entities}:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+        for table, entity_id in entities:
+            # Marca no lugar da entrada: uma leitura em andamento não grava o valor antigo
+            key = _entity_key(table, entity_id)
+            previous = _entries.get(key)
+            _store(key, _Entry(None, None, (previous.generation if previous else 0) + 1))
+
+def _make_etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+def _respond(entry, cache_control, outcome):
+    headers = {'ETag': f'"{entry.etag}"', 'Cache-Control': cache_control}
+    if entry.etag in request.if_none_match:
+        HTTP_CACHE_REQUESTS.inc(endpoint=request.url_rule.rule, outcome='not_modified')
+        return Response(status=304, headers=headers)
+    HTTP_CACHE_REQUESTS.inc(endpoint=request.url_rule.rule, outcome=outcome)
+    return Response(entry.body, mimetype='application/json', headers=headers)
+
+def cached_json(tables=(), entity=None, cache_control='no-cache'):
+    """Guardar o JSON de uma rota GET e responder If-None-Match com 304.
+
+    entity=(tabela, argumento da rota) guarda uma entrada por registro,
+    invalidada quando ele (ou um documento do caso) é gravado; sem entity, a
+    chave é a URL completa mais a versão das tabelas em tables. Só respostas
+    200 em JSON entram no cache; o ETag é o hash do corpo.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if not HTTP_CACHE_ENABLED:
+                return view(**kwargs)
+
+            with _lock:
+                if entity:
+                    key = _entity_key(entity[0], kwargs[entity[1]])
+                else:
+                    key = ('view', request.endpoint, request.full_path, _versions(tables))
+                entry = _entries.get(key)
+                if entry is not None and entry.body is not None and time.monotonic() - entry.stored_at < HTTP_CACHE_TTL:
+                    _entries.move_to_end(key)
+                    return _respond(entry, cache_control, 'hit')
+                generation = entry.generation if entry is not None else 0
+
+            response = view(**kwargs)
+            if isinstance(response, tuple) or response.status_code != 200 or response.mimetype != 'application/json':
+                return response
+
+            entry = _Entry(_make_etag(response.get_data()), response.get_data(), generation)
+            # Leitura de réplica pode estar atrasada: responde, mas não fixa no cache
+            if not (replica_urls() and reads_from_replica()):
+                with _lock:
+                    current = _entries.get(key)
+                    if (current.generation if current is not None else 0) == generation:
+                        _store(key, entry)
+            return _respond(entry, cache_control, 'miss')
+        return wrapper
+    return decorator
+
+def _tracked_changes(session):
+    # Tabelas e registros gravados desde o último commit da sessão
+    return session.info.setdefault('http_cache_changes', {'tables': set(), 'entities': set()})
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    changes = _tracked_changes(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table is None:
+            continue
+        changes['tables'].add(table)
+        if getattr(obj, 'id', None) is not None:
+            changes['entities'].add((table, obj.id))
+        # documents_count do caso muda quando um documento entra ou sai
+        if table == 'documents' and obj.case_id is not None and obj not in session.dirty:
+            changes['entities'].add(('cases', obj.case_id))
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop('http_cache_changes', None)
+    if changes:
+        invalidate(changes['tables'], changes['entities'])
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('http_cache_changes', None)
@@ -0,0 +1,216 @@
+import bisect
+import collections
+import logging
+import os
+import re
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Requisições acima deste tempo vão para o log com as consultas executadas (0 desliga)
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 0))
+SLOW_LOG_MAX_QUERIES = int(os.getenv('SLOW_LOG_MAX_QUERIES', 20))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Valores literais trocados por ? para agrupar consultas iguais (padrão N+1)
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+class Counter:
+    """Contador monotônico com rótulos"""
+    
+    type = 'counter'
+    
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount=1, **labels):
+        key = tuple((name, labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+class Histogram:
+    """Histograma cumulativo por rótulos, no formato de exposição do Prometheus"""
+    
+    type = 'histogram'
+    
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value, **labels):
+        key = tuple((name, labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            position = bisect.bisect_left(self.buckets, value)
+            if position < len(self.buckets):
+                series['counts'][position] += 1
+            series['sum'] += value
+            series['count'] += 1
+    
+    def samples(self):
+        with self._lock:
+            series = {key: {**value, 'counts': list(value['counts'])} for key, value in self._series.items()}
+        
+        result = []
+        for key, value in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, value['counts']):
+                cumulative += count
+                result.append((f'{self.name}_bucket', key + (('le', f'{bound:g}'),), cumulative))
+            result.append((f'{self.name}_bucket', key + (('le', '+Inf'),), value['count']))
+            result.append((f'{self.name}_sum', key, round(value['sum'], 6)))
+            result.append((f'{self.name}_count', key, value['count']))
+        return result
+
+REQUEST_LATENCY = Histogram(
+    'harvey_http_request_duration_seconds', 'Tempo até a resposta (cabeçalhos) por endpoint',
+    ('method', 'endpoint', 'status')
+)
+REQUEST_SIZE = Histogram(
+    'harvey_http_request_size_bytes', 'Tamanho do corpo das requisições', ('method', 'endpoint'), SIZE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'harvey_http_response_size_bytes', 'Tamanho das respostas com Content-Length conhecido', ('method', 'endpoint'), SIZE_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'harvey_db_queries_per_request', 'Consultas SQL por requisição', ('method', 'endpoint'), QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    'harvey_db_time_per_request_seconds', 'Tempo gasto em SQL por requisição', ('method', 'endpoint')
+)
+DB_QUERIES = Counter('harvey_db_queries_total', 'Consultas SQL executadas', ('context',))
+SLOW_REQUESTS = Counter('harvey_http_slow_requests_total', 'Requisições acima de SLOW_REQUEST_MS', ('endpoint',))
+LLM_LATENCY = Histogram(
+    'harvey_llm_request_duration_seconds', 'Latência das chamadas ao modelo (até a resposta ou o início do stream)',
+    ('model', 'outcome')
+)
+LLM_TOKENS = Counter('harvey_llm_tokens_total', 'Tokens consumidos por rota e modelo', ('route', 'model', 'kind'))
+HTTP_CACHE_REQUESTS = Counter(
+    'harvey_http_cache_requests_total', 'Leituras atendidas pelo cache HTTP (hit, miss, not_modified)', ('endpoint', 'outcome')
+)
+
+REGISTRY = [
+    REQUEST_LATENCY, REQUEST_SIZE, RESPONSE_SIZE, REQUEST_QUERIES, REQUEST_DB_TIME,
+    DB_QUERIES, SLOW_REQUESTS, LLM_LATENCY, LLM_TOKENS, HTTP_CACHE_REQUESTS
+]
+
+def observe_llm_call(model, seconds, outcome='ok'):
+    LLM_LATENCY.observe(seconds, model=model or 'desconhecido', outcome=outcome)
+
+def count_llm_tokens(route, model, prompt_tokens, completion_tokens):
+    model = model or 'desconhecido'
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, route=route, model=model, kind='prompt')
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, route=route, model=model, kind='completion')
+
+def render_metrics():
+    """Todas as métricas no formato texto do Prometheus (version 0.0.4)"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+def _endpoint():
+    # Regra da rota (ex.: /api/cases/<int:case_id>), não o caminho: cardinalidade limitada
+    return request.url_rule.rule if request.url_rule is not None else 'sem_rota'
+
+def _query_trace():
+    return g.get('_metrics_queries') if has_request_context() else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['_metrics_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('_metrics_started', None)
+    trace = _query_trace()
+    if trace is None:
+        DB_QUERIES.inc(context='background')
+        return
+    DB_QUERIES.inc(context='request')
+    trace.append((statement, time.perf_counter() - started if started else 0.0))
+
+def _log_slow_request(endpoint, elapsed, queries):
+    grouped = collections.Counter()
+    durations = collections.Counter()
+    for statement, duration in queries:
+        normalized = SQL_LITERALS.sub('?', ' '.join(statement.split()))
+        grouped[normalized] += 1
+        durations[normalized] += duration
+    
+    lines = [
+        f'{count}x {durations[statement] * 1000:.1f}ms {statement[:300]}'
+        for statement, count in grouped.most_common(SLOW_LOG_MAX_QUERIES)
+    ]
+    logger.warning(
+        'Requisição lenta %s %s (%s): %.1fms, %d consultas SQL (%.1fms)%s',
+        request.method, request.full_path.rstrip('?'), endpoint, elapsed * 1000, len(queries),
+        sum(duration for _, duration in queries) * 1000,
+        ''.join(f'\n  {line}' for line in lines)
+    )
+
+def init_metrics(app):
+    """Medir cada requisição: latência, consultas SQL, tempo de banco e tamanhos"""
+    
+    @app.before_request
+    def start_request_metrics():
+        g._metrics_started = time.perf_counter()
+        g._metrics_queries = []
+    
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('_metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = _endpoint()
+        queries = g.get('_metrics_queries') or []
+        
+        REQUEST_LATENCY.observe(elapsed, method=request.method, endpoint=endpoint, status=response.status_code)
+        REQUEST_QUERIES.observe(len(queries), method=request.method, endpoint=endpoint)
+        REQUEST_DB_TIME.observe(sum(duration for _, duration in queries), method=request.method, endpoint=endpoint)
+        if request.content_length:
+            REQUEST_SIZE.observe(request.content_length, method=request.method, endpoint=endpoint)
+        # Respostas em streaming não têm tamanho conhecido neste ponto
+        if response.content_length is not None:
+            RESPONSE_SIZE.observe(response.content_length, method=request.method, endpoint=endpoint)
+        
+        if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+            SLOW_REQUESTS.inc(endpoint=endpoint)
+            _log_slow_request(endpoint, elapsed, queries)
+        return response
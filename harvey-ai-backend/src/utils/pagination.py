@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import func, text, tuple_
+from src.models.user import db
+
+COUNT_MODES = ['none', 'exact', 'approx']
+MAX_PER_PAGE = 500
+
+def encode_cursor(item):
+    """Cursor opaco com a posição (created_at, id) do último item da página"""
+    raw = json.dumps([item.created_at.isoformat(), item.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError('Cursor inválido')
+
+def approximate_count(model):
+    """Estimativa barata do total de linhas de uma tabela (sem filtros)"""
+    table = model.__tablename__
+    if db.engine.dialect.name == 'postgresql':
+        estimate = db.session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE relname = :table'), {'table': table}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    # Limite superior pelo maior id (exato enquanto não houver exclusões)
+    return db.session.query(func.max(model.id)).scalar() or 0
+
+def keyset_paginate(query, model, cursor=None, per_page=10, count='none', filtered=False):
+    """Paginar por (created_at, id) decrescentes, sem OFFSET.
+    
+    Cada página custa o mesmo, qualquer que seja a profundidade. O total só é
+    calculado quando pedido (count='exact' ou 'approx').
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    
+    total = None
+    if count == 'exact':
+        total = query.order_by(None).count()
+    elif count == 'approx':
+        total = query.order_by(None).count() if filtered else approximate_count(model)
+    
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, item_id))
+    
+    items = query.limit(per_page + 1).all()
+    has_next = len(items) > per_page
+    items = items[:per_page]
+    
+    return items, {
+        'per_page': per_page,
+        'cursor': cursor,
+        'next_cursor': encode_cursor(items[-1]) if has_next else None,
+        'has_next': has_next,
+        'total': total
+    }
+
+def wants_keyset(args):
+    """Paginação por cursor quando o cliente envia cursor ou pede pagination=cursor"""
+    return 'cursor' in args or args.get('pagination') == 'cursor'
@@ -0,0 +1,30 @@
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+def ensure_columns(db):
+    """Adicionar colunas novas dos modelos a tabelas já existentes.
+    
+    create_all() não altera tabelas; colunas acrescentadas depois (sempre anuláveis)
+    entram via ALTER TABLE ADD COLUMN.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+
+def ensure_indexes(db):
+    """Criar índices declarados nos modelos que ainda não existem em tabelas antigas.
+    
+    create_all() só cria índices junto com tabelas novas.
+    """
+    engine = db.engine
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
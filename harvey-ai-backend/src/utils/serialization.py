@@ -0,0 +1,40 @@
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+from src.models.user import db
+from src.models.document import Document
+
+def parse_fields(raw, allowed):
+    """Interpretar ?fields=a,b,c. Retorna None (todos os campos) ou a lista pedida, sempre com id"""
+    if not raw:
+        return None
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    invalid = [field for field in fields if field not in allowed]
+    if invalid:
+        raise ValueError(f"Campos inválidos: {', '.join(invalid)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+def load_only_fields(model, fields):
+    """Opção de query que carrega somente as colunas pedidas (colunas grandes ficam de fora)"""
+    columns = model.__table__.columns
+    return load_only(*[getattr(model, field) for field in fields if field in columns])
+
+def document_counts(case_ids):
+    """Quantidade de documentos por caso em uma única consulta agrupada"""
+    if not case_ids:
+        return {}
+    rows = (
+        db.session.query(Document.case_id, func.count(Document.id))
+        .filter(Document.case_id.in_(case_ids))
+        .group_by(Document.case_id)
+        .all()
+    )
+    return dict(rows)
+
+def serialize_cases(cases, fields=None):
+    """Serializar uma página de casos sem carregar os documentos de cada um"""
+    counts = {}
+    if fields is None or 'documents_count' in fields:
+        counts = document_counts([case.id for case in cases])
+    return [case.to_dict(fields=fields, documents_count=counts.get(case.id, 0)) for case in cases]
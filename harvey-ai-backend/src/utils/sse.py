@@ -0,0 +1,18 @@
+import json
+
+# Cabeçalhos para evitar buffering de proxies (nginx) e caches intermediários
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+def format_sse(data, event=None):
+    """Formatar um evento Server-Sent Events com payload JSON"""
+    message = f'event: {event}\n' if event else ''
+    return f"{message}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def wants_event_stream(req, data=None):
+    """Verificar se o cliente pediu resposta em streaming (SSE)"""
+    if data and data.get('stream'):
+        return True
+    return req.accept_mimetypes.best == 'text/event-stream'
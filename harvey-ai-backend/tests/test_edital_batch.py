@@ -0,0 +1,132 @@
+"""Lote de editais: ordem por prazo e prioridade, custos e descarte da fila quando o consumidor para"""
+import threading
+import time
+from datetime import datetime
+
+from src.services.edital_batch import analysis_calls, run_batch, schedule_key
+from src.services.rate_limiter import RateLimiter
+
+def make_item(index, deadline=None, priority=None, **extra):
+    return {'index': index, 'deadline': deadline, 'priority': priority, 'case_id': None, 'edital_document_id': None, **extra}
+
+def single_result(tokens=100):
+    return {
+        'mode': 'single', 'analysis': 'ok', 'model_used': 'gpt-4', 'cache': {'hit': False},
+        'tokens_used': tokens, 'prompt_tokens': tokens - 20, 'completion_tokens': 20
+    }
+
+def batch_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('edital-batch') and thread.is_alive()]
+
+def wait_for_batch_threads(timeout=3):
+    deadline = time.time() + timeout
+    while batch_threads() and time.time() < deadline:
+        time.sleep(0.02)
+    return batch_threads()
+
+def test_schedule_key_orders_by_deadline_day_then_priority():
+    items = [
+        make_item(0),
+        make_item(1, datetime(2024, 5, 10, 17, 0), 'Baixa'),
+        make_item(2, datetime(2024, 5, 10, 9, 0), 'Baixa'),
+        make_item(3, datetime(2024, 5, 10, 18, 0), 'Alta'),
+        make_item(4, datetime(2024, 5, 3, 12, 0), 'Baixa'),
+        make_item(5, None, 'Alta'),
+        make_item(6, datetime(2024, 5, 10, 12, 0)),
+    ]
+    ordered = [item['index'] for item in sorted(items, key=schedule_key)]
+    # Dia mais próximo; no mesmo dia, prioridade (sem prioridade = Média) e depois a hora; sem prazo no fim, também por prioridade
+    assert ordered == [4, 3, 6, 2, 1, 5, 0]
+
+def test_analysis_calls_skip_cache_hits_and_reused_chunks():
+    assert analysis_calls({**single_result(), 'cache': {'hit': True}}) == []
+    chunked = {
+        'mode': 'chunked',
+        'chunks': [
+            {'model': 'gpt-4', 'prompt_tokens': 10, 'completion_tokens': 5},
+            {'model': 'gpt-4', 'prompt_tokens': 10, 'completion_tokens': 5, 'cached': True},
+            {'model': 'gpt-4', 'prompt_tokens': 0, 'completion_tokens': 0, 'reused': True},
+            {'model': 'gpt-4', 'error': 'timeout'},
+        ],
+        'reduce': [{'model': 'gpt-4-turbo', 'prompt_tokens': 30, 'completion_tokens': 9}]
+    }
+    assert [call['model'] for call in analysis_calls(chunked)] == ['gpt-4', 'gpt-4-turbo']
+
+def test_run_batch_dispatches_in_schedule_order_and_reports_errors():
+    items = [
+        make_item(0, datetime(2024, 6, 1), 'Média'),
+        make_item(1, error='Edital não encontrado'),
+        make_item(2, datetime(2024, 5, 1), 'Baixa'),
+        make_item(3, datetime(2024, 6, 1), 'Alta'),
+    ]
+    handled = []
+
+    def handler(item):
+        handled.append(item['index'])
+        return single_result()
+
+    events = list(run_batch(items, handler, lambda item: (1, 200), RateLimiter(100, 100000), workers=1))
+    names = [name for name, _ in events]
+    assert names == ['queued', 'result', 'result', 'result', 'result', 'done']
+    assert [entry['index'] for entry in events[0][1]['order']] == [2, 3, 0]
+    # Item com erro é reportado antes, sem ir à fila
+    assert events[1][1]['index'] == 1 and events[1][1]['status'] == 'error'
+    assert handled == [2, 3, 0]
+    assert [data['position'] for _, data in events[2:5]] == [1, 2, 3]
+
+    summary = events[-1][1]
+    assert summary['succeeded'] == 3 and summary['failed'] == 1
+    assert summary['model_calls'] == 3 and summary['tokens_used'] == 300
+    assert summary['by_model']['gpt-4']['calls'] == 3
+    # Reserva de 200 tokens acertada pelo uso real (100 por edital)
+    assert summary['rate_limits']['reserved_tokens'] == 600 and summary['rate_limits']['used_tokens'] == 300
+
+def test_handler_failure_is_reported_and_reservation_released():
+    limiter = RateLimiter(100, 1000)
+
+    def handler(item):
+        raise RuntimeError('modelo indisponível')
+
+    events = list(run_batch([make_item(0)], handler, lambda item: (1, 800), limiter, workers=1))
+    result = events[1][1]
+    assert result['status'] == 'error' and result['error'] == 'modelo indisponível'
+    assert events[-1][1]['failed'] == 1
+    # Sem consumo, a reserva inteira volta ao balde
+    assert limiter.snapshot()['available_tokens'] >= 999
+
+def test_closing_stream_discards_queued_editais():
+    handled = []
+    release = threading.Event()
+
+    def handler(item):
+        handled.append(item['index'])
+        release.wait(1)
+        return single_result()
+
+    batch = run_batch([make_item(index) for index in range(20)], handler, lambda item: (1, 10), RateLimiter(100, 100000), workers=2)
+    assert next(batch)[0] == 'queued'
+    assert next(batch)[0] == 'result'
+    # Cliente desconectou: os workers terminam o edital em andamento e não pegam outro
+    batch.close()
+    release.set()
+    assert wait_for_batch_threads() == []
+    assert len(handled) <= 4
+
+def test_closing_stream_cancels_worker_waiting_for_rate_limit():
+    # 1 requisição por minuto: o segundo edital esperaria ~60 s pelo limitador
+    limiter = RateLimiter(1, 100000)
+    handled = []
+
+    def handler(item):
+        handled.append(item['index'])
+        return single_result()
+
+    batch = run_batch([make_item(0), make_item(1)], handler, lambda item: (1, 10), limiter, workers=1)
+    assert next(batch)[0] == 'queued'
+    assert next(batch)[0] == 'result'
+    started = time.perf_counter()
+    batch.close()
+    assert wait_for_batch_threads() == []
+    assert time.perf_counter() - started < 3
+    assert handled == [0]
+    assert limiter.snapshot()['reservations'] == 1
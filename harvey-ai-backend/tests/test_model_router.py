@@ -0,0 +1,141 @@
+"""Roteamento de modelos contra o servidor simulado: failover, espera após 429 e hedging"""
+import threading
+import time
+
+import pytest
+
+from src.services import model_router, openai_client
+from src.services.llm_stub import StubConfig, start_stub_server
+from src.services.openai_client import temporary_openai_client
+
+MESSAGES = [{'role': 'user', 'content': 'Prazo para impugnação do edital?'}]
+
+@pytest.fixture(autouse=True)
+def router_state(monkeypatch):
+    """Estatísticas, latências e esperas zeradas; tabela de análise fixa"""
+    monkeypatch.setattr(model_router, '_stats', {})
+    monkeypatch.setattr(model_router, '_latencies', {})
+    monkeypatch.setattr(model_router, '_cooldown_until', {})
+    monkeypatch.setattr(model_router, 'HEDGING_ENABLED', False)
+    monkeypatch.setenv('MODEL_ROUTING_ANALYSIS', 'gpt-4,gpt-4-turbo,gpt-3.5-turbo')
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """Hedging ligado: o cliente criado depois usa conexões interrompíveis"""
+    monkeypatch.setattr(model_router, 'HEDGING_ENABLED', True)
+    monkeypatch.setattr(openai_client, 'INTERRUPTIBLE_CALLS', True)
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Iniciar o servidor simulado com a configuração dada e devolver (cliente, configuração)"""
+    servers, clients = [], []
+
+    def start(**config):
+        server = start_stub_server(0, StubConfig(jitter=0, **config))
+        servers.append(server)
+        monkeypatch.setenv('OPENAI_BASE_URL', f'http://127.0.0.1:{server.server_port}/v1')
+        context = temporary_openai_client('stub')
+        clients.append(context)
+        return context.__enter__(), server.RequestHandlerClass.config
+
+    yield start
+    for context in clients:
+        context.__exit__(None, None, None)
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def route(client):
+    started = time.perf_counter()
+    response, params, _, routing = model_router.routed_chat_completion(
+        client, 'test', 'analysis', messages=MESSAGES, max_tokens=50
+    )
+    return response, params, routing, time.perf_counter() - started
+
+def hedge_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'llm-hedge' and thread.is_alive()]
+
+def test_primary_answers_without_failover(stub):
+    client, config = stub(latency={'default': 10})
+    response, params, routing, _ = route(client)
+    assert params['model'] == 'gpt-4'
+    assert response.choices[0].message.content.startswith('[gpt-4]')
+    assert routing['failover'] is False and routing['attempts'] == 1
+    assert config.calls == {'gpt-4': 1}
+
+def test_rate_limit_fails_over_to_next_candidate(stub):
+    client, config = stub(latency={'default': 10}, rate_limit={'gpt-4': 1.0})
+    _, params, routing, _ = route(client)
+    assert params['model'] == 'gpt-4-turbo'
+    assert routing['failover'] is True and routing['attempts'] == 2
+    # Candidato que não é o último não repete a chamada: segue direto para o próximo
+    assert config.calls == {'gpt-4': 1, 'gpt-4-turbo': 1}
+    stats = model_router.get_routing_stats()['models']['gpt-4']
+    assert stats['rate_limited'] == 1 and stats['failovers'] == 1
+
+def test_server_errors_fail_over_through_the_table(stub):
+    client, _ = stub(latency={'default': 10}, errors={'gpt-4': 1.0, 'gpt-4-turbo': 1.0})
+    _, params, routing, _ = route(client)
+    assert params['model'] == 'gpt-3.5-turbo'
+    assert routing['attempts'] == 3
+
+def test_rate_limited_model_cools_down_at_end_of_queue(stub):
+    client, _ = stub(latency={'default': 10}, rate_limit={'gpt-4': 1.0})
+    route(client)
+    # O servidor simulado envia Retry-After: 1
+    assert 0 < model_router.get_routing_stats()['cooldown_seconds']['gpt-4'] <= 1
+    assert model_router.select_models('analysis', MESSAGES, 50) == ['gpt-4-turbo', 'gpt-3.5-turbo', 'gpt-4']
+
+    # Durante a espera, o modelo nem é chamado
+    _, params, routing, _ = route(client)
+    assert params['model'] == 'gpt-4-turbo' and routing['attempts'] == 1
+
+    model_router._cooldown_until['gpt-4'] = time.time() - 1
+    assert model_router.select_models('analysis', MESSAGES, 50)[0] == 'gpt-4'
+
+def test_hedge_wins_and_interrupts_slow_primary(stub, hedging, monkeypatch):
+    monkeypatch.setattr(model_router, 'HEDGE_DEFAULT_SECONDS', 0.2)
+    client, _ = stub(latency={'gpt-4': 3000, 'gpt-4-turbo': 100})
+    _, params, routing, elapsed = route(client)
+    assert params['model'] == 'gpt-4-turbo'
+    assert routing['hedged'] is True and routing['failover'] is True
+    # Resposta em ~0,3 s: a chamada de 3 s ao gpt-4 foi interrompida, não aguardada
+    assert elapsed < 1.5
+    stats = model_router.get_routing_stats()['models']
+    assert stats['gpt-4']['hedges'] == 1
+    assert stats['gpt-4']['errors'] == 0
+    assert stats['gpt-4-turbo']['hedge_wins'] == 1
+
+def test_primary_wins_and_hedge_is_cancelled(stub, hedging, monkeypatch):
+    monkeypatch.setattr(model_router, 'HEDGE_DEFAULT_SECONDS', 0.1)
+    client, _ = stub(latency={'gpt-4': 400, 'gpt-4-turbo': 3000})
+    _, params, routing, elapsed = route(client)
+    assert params['model'] == 'gpt-4'
+    assert routing['hedged'] is True and routing['failover'] is False
+    assert elapsed < 1.5
+    # O hedge perdedor é interrompido logo após a resposta principal
+    deadline = time.time() + 1
+    while hedge_threads() and time.time() < deadline:
+        time.sleep(0.02)
+    assert hedge_threads() == []
+    assert model_router.get_routing_stats()['models'].get('gpt-4-turbo', {}).get('errors', 0) == 0
+
+def test_fast_primary_does_not_hedge(stub, hedging, monkeypatch):
+    monkeypatch.setattr(model_router, 'HEDGE_DEFAULT_SECONDS', 1.0)
+    client, config = stub(latency={'default': 20})
+    _, params, routing, _ = route(client)
+    assert params['model'] == 'gpt-4' and routing['hedged'] is False
+    assert config.calls == {'gpt-4': 1}
+
+def test_stream_open_records_time_to_first_byte(stub):
+    client, _ = stub(latency={'default': 50}, rate_limit={'gpt-4': 1.0})
+    stream, params, _, routing = model_router.open_routed_stream(
+        client, 'test', 'analysis', messages=MESSAGES, max_tokens=50
+    )
+    assert ''.join(chunk.choices[0].delta.content or '' for chunk in stream if chunk.choices).startswith('[gpt-4-turbo]')
+    assert params['model'] == 'gpt-4-turbo' and routing['failover'] is True
+    stats = model_router.get_routing_stats()['models']
+    assert stats['gpt-4']['errors'] == 1
+    # Abertura do stream conta como chamada, com a latência até o primeiro byte
+    assert stats['gpt-4-turbo']['calls'] == 1 and stats['gpt-4-turbo']['latency_samples'] == 1
+    assert stats['gpt-4-turbo']['latency_p50_ms'] >= 50
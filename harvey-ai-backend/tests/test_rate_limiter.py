@@ -0,0 +1,84 @@
+"""Limitador de RPM/TPM com relógio simulado: reservas, espera pelo reabastecimento e acerto pelo uso real"""
+import threading
+
+import pytest
+
+from src.services.rate_limiter import RateLimiter
+
+class FakeClock:
+    """Relógio manual; usado como 'cancelled', cada espera avança o tempo em vez de dormir"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def wait(self, timeout):
+        self.now += timeout
+        return False
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def test_full_bucket_reserves_without_waiting(clock):
+    limiter = RateLimiter(60, 600, clock=clock)
+    assert limiter.acquire(1, 100, clock) == 0
+    snapshot = limiter.snapshot()
+    assert snapshot['available_requests'] == 59
+    assert snapshot['available_tokens'] == 500
+    assert snapshot['reservations'] == 1 and snapshot['waits'] == 0
+
+def test_waits_for_continuous_refill(clock):
+    # 600 tokens por minuto = 10 por segundo
+    limiter = RateLimiter(60, 600, clock=clock)
+    limiter.acquire(1, 600, clock)
+    waited = limiter.acquire(1, 300, clock)
+    assert waited == pytest.approx(30, abs=1e-6)
+    snapshot = limiter.snapshot()
+    assert snapshot['available_tokens'] == 0
+    assert snapshot['waits'] == 1 and snapshot['wait_seconds'] == pytest.approx(30)
+
+def test_request_limit_also_blocks(clock):
+    limiter = RateLimiter(2, 100000, clock=clock)
+    limiter.acquire(1, 10, clock)
+    limiter.acquire(1, 10, clock)
+    # 2 requisições por minuto: a próxima vaga abre em 30 s
+    assert limiter.acquire(1, 10, clock) == pytest.approx(30, abs=1e-6)
+
+def test_reservation_larger_than_limit_is_clamped(clock):
+    limiter = RateLimiter(60, 600, clock=clock)
+    assert limiter.clamp(1, 5000) == (1, 600)
+    assert limiter.acquire(1, 5000, clock) == 0
+    assert limiter.snapshot()['available_tokens'] == 0
+
+def test_settle_returns_unused_tokens(clock):
+    limiter = RateLimiter(60, 600, clock=clock)
+    limiter.acquire(1, 500, clock)
+    limiter.settle(500, 100)
+    snapshot = limiter.snapshot()
+    assert snapshot['available_tokens'] == 500
+    assert snapshot['reserved_tokens'] == 500 and snapshot['used_tokens'] == 100
+
+def test_settle_charges_tokens_over_the_reservation(clock):
+    limiter = RateLimiter(60, 600, clock=clock)
+    limiter.acquire(1, 100, clock)
+    limiter.settle(100, 400)
+    assert limiter.snapshot()['available_tokens'] == 200
+    # Balde negativo: a próxima reserva espera o consumo excedente ser reposto
+    limiter.settle(0, 400)
+    assert limiter.acquire(1, 100, clock) == pytest.approx(30, abs=1e-6)
+
+def test_settle_never_overfills_bucket(clock):
+    limiter = RateLimiter(60, 600, clock=clock)
+    limiter.settle(5000, 0)
+    assert limiter.snapshot()['available_tokens'] == 600
+
+def test_cancelled_wait_returns_none(clock):
+    limiter = RateLimiter(60, 600, clock=clock)
+    limiter.acquire(1, 600, clock)
+    cancelled = threading.Event()
+    cancelled.set()
+    assert limiter.acquire(1, 100, cancelled) is None
+    assert limiter.snapshot()['reservations'] == 1